@@ -91,6 +91,15 @@ class ModelPredictiveController(QLearner):
             optimal = optimal[0]
         return action
 
+    def recommend_many(self, states, **kwargs):
+        """
+        Recommends actions for an array of states. Returns an object array
+        since there may be no recommendation (None) for a state.
+        """
+        actions = np.empty(len(states), dtype=object)
+        actions[:] = [self.recommend(s) for s in states]
+        return actions
+
 
 
 def adaptive_path(tb, start, exploration, faultfunc, *args):
@@ -124,17 +133,21 @@ def adaptive_path(tb, start, exploration, faultfunc, *args):
     # initially learn w/o faults
     tb.learner.learn(coverage=1, ep_mode='bfs')
     faultfunc(tb, *args)
-    
+    policy = None               # recommended actions for all states
+
     while not tb.learner.goal(state) and n < tb.num_states:
         # exploring
         if tb.learner.random.rand() < exploration:
-            history, _ = tb.learner.learn(episodes=[state])
+            history, _ = tb.learner.learn(episodes=[state], history=True)
             traversed.extend(history[0])
             coords.extend([tb.state2coord(s) for s in history[0]])
             state = traversed[-1]
+            policy = None       # learning changes recommendations
         # exploiting
         else:
-            action = tb.learner.recommend(state)
+            if policy is None:
+                policy = tb.learner.recommend_many(np.arange(tb.num_states))
+            action = policy[state]
             # stop path if no recommendation
             if action is None:
                 break
@@ -324,8 +337,6 @@ if __name__ == '__main__':
                                  a[1]**2/naa,
                                  a[0]*a[1]/naa,
                                  a[0], a[1], s[0], s[1], 1])
-            def func(s, a, w):
-                return np.dot(w, dfunc(s, a, w))
             # set up testbench
             mode = FLearner.ONLINE if args.online else FLearner.OFFLINE
             tb = TestBench(size=args.topology, seed=seed, learner=None)
@@ -333,7 +344,7 @@ if __name__ == '__main__':
                         depth=args.maxdepth, steps=args.steps, policy=args.policy,
                         max_prob=args.greedyprob, mode=mode, rmatrix=tb.rmatrix,
                         tmatrix=tb.tmatrix, goal=tb.goals, seed=seed,
-                        func=func, dfunc=dfunc, funcdim=funcdim,
+                        func=None, dfunc=dfunc, funcdim=funcdim,
                         stateconverter=FlagGenerator(tb.size, tb.size),
                         actionconverter=FlagGenerator(2,2))
             tb.learner = learner
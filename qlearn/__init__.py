@@ -3,6 +3,11 @@ from .qlearner import QLearner
 from .flearner import FLearner
 from .slearner import SLearner
 from .testbench import TestBench
+from .sparse import SparseMatrix
+from .replay import ReplayBuffer
+from .profiler import Profiler
+from .features import Polynomial, RBF, TileCoding, Linear
 from .linsim import *
 
-np.seterr(all='raise')
+# Underflow to zero is expected with reduced precision (dtype) value tables.
+np.seterr(all='raise', under='ignore')
@@ -1 +1,9 @@
-from .variablenstep import variablenstep
\ No newline at end of file
+from .variablenstep import variablenstep
+from .batchnstep import batchnstep
+from .prioritizedsweeping import prioritizedsweeping
+from .valueiteration import valueiteration, policyiteration
+from .treebackup import treebackup
+from .lstdq import lstdq, lspi
+
+# Episodic algorithms learn() can select by name.
+ALGORITHMS = {'nstep': variablenstep, 'treebackup': treebackup}
@@ -0,0 +1,160 @@
+"""
+A lockstep implementation of the variable n-step tree backup algorithm (see
+variablenstep). Instead of running one episode at a time, a batch of episodes
+is advanced together. States, actions and errors of all episodes at a time
+step are stored as arrays and are indexed directly into the transition, reward
+and q-value matrices. This avoids the per-step method calls of variablenstep.
+
+Only applicable to tabular learners (i.e. QLearner) where states and actions
+are indices into [r|t|q]matrix.
+
+Each episode follows the same n-step tree backup as variablenstep. However,
+since episodes are interleaved, an update made by one episode is seen by other
+episodes in the batch at the next time step instead of after the episode ends.
+
+Like other learning algorithms, returns a tuple of lists if history is true:
+    [list of states traversed after the initial state, including final state],
+    [list of actions taken to traverse states, starting with the first action]
+for each episode in the batch. Else a tuple of lists of the number of states
+traversed and the final state of each episode.
+
+The stepsize function of the learner is called with the array of states of
+all episodes at a time step if it gives the same step sizes as calling it with
+one state at a time. Otherwise it is called once per state.
+"""
+
+
+import numpy as np
+
+
+def batchnstep(self, states, actions=None, history=False):
+    """
+    Runs a batch of learning episodes in lockstep. Calculates errors between
+    last and current estimation of q-values and calls self.update_many to
+    modify the q-matrix.
+    See variablenstep for the algorithm.
+
+    Args:
+        self (QLearner): A reference to the calling QLearner object. Must
+            use a tabular representation of the value function.
+        states (list/ndarray): States to begin learning episodes from.
+        actions (list/ndarray): Actions to take from each state. If None, or
+            an element is None, choose one from policy.
+        history (bool): Whether to keep and return the states and actions of
+            whole episodes. Default False.
+    Returns:
+        If history is True, a tuple of:
+        - A list of the histories of N states traversed after each provided state.
+        - A list of the histories of N actions taken after each provided state.
+        Else a tuple of a list of the number of states traversed (N) in each
+        episode and a list of the final state of each episode.
+    """
+    states = np.asarray(states, dtype=int)
+    num = len(states)
+    size = self.steps + 1   # only the last n steps are needed to compute G
+    ind = np.arange(num)
+    goals = self._goal_mask
+
+    T = np.full(num, np.inf)            # termination time of each episode
+    tau = 0                             # time of states being updated
+    t = 0                               # time from beginning of episodes
+    length = np.zeros(num, dtype=int)   # number of look-ahead steps taken
+    delta = np.zeros((size, num))       # ring buffers of histories, indexed
+    Q = np.zeros((size, num))           # by time % size
+    A = np.zeros((size, num), dtype=int)
+    S = np.zeros((size, num), dtype=int)
+    pi = np.ones((size, num))
+    stepsize = None                     # self.stepsize over arrays of states
+
+    S[0] = states
+    if actions is None:
+        A[0] = self._next_actions(states)
+    else:
+        # Only episodes without a provided action draw one from the policy.
+        given = np.array([a is not None for a in actions], dtype=bool)
+        A[0, given] = [a for a in actions if a is not None]
+        if not np.all(given):
+            A[0, ~given] = self._next_actions(states[~given])
+    Q[0] = self.qmatrix[S[0], A[0]]
+    shistory = [S[0].copy()]
+    ahistory = [A[0].copy()]
+
+    # Loop from start of episodes until the state before the last terminal state
+    while tau <= np.max(T) - 1 and t < self.depth:
+        # Look-ahead for episodes which have not reached a terminal state.
+        live = t < T
+        if np.any(live):
+            cur, nxt = t % size, (t + 1) % size
+            action = A[cur, live]
+            state = S[cur, live]
+            naction = self._next_actions(state)
+            if stepsize is None:
+                stepsize = _vectorize(self.stepsize, state)
+            step = stepsize(state)
+            nstate = self.next_state_many(state, action, step)
+            reward = self.reward_many(state, action, nstate, step)
+            cqvalue = self.qmatrix[state, action]
+            aprobs = self._a_probs_many(nstate)
+            expected = np.sum(aprobs * self.qmatrix[nstate], axis=1)
+            terminal = goals[nstate]
+
+            A[nxt, live] = naction
+            S[nxt, live] = nstate
+            Q[nxt, live] = self.qmatrix[nstate, naction]
+            pi[nxt, live] = aprobs[np.arange(len(nstate)), naction]
+            delta[cur, live] = reward - cqvalue \
+                               + np.where(terminal, 0, self.discount * expected)
+            T[ind[live][terminal]] = t + 1
+            if self.memory is not None:
+                self.memory.add_many(state, action, reward, nstate, terminal)
+            length[live] += 1
+            if history:
+                shistory.append(S[nxt].copy())
+                ahistory.append(A[nxt].copy())
+
+        # Update states n-steps behind the look-ahead in each episode.
+        # Like variablenstep, the loop condition lags tau by one iteration, so
+        # the terminal state itself is updated too (with G = Q[T]).
+        tau = t - self.steps + 1
+        if tau >= 0:
+            updating = tau <= T
+            if np.any(updating):
+                end = T[updating]
+                E = np.ones(np.sum(updating))
+                G = Q[tau % size, updating]
+                for k in range(tau, tau + self.steps):
+                    within = k < end
+                    G[within] += E[within] * delta[k % size, updating][within]
+                    E = self.discount * E * pi[(k + 1) % size, updating]
+                ustates = S[tau % size, updating]
+                uactions = A[tau % size, updating]
+                self.update_many(ustates, uactions,
+                                 self.qmatrix[ustates, uactions] - G)
+        t += 1
+
+    if not history:
+        return length.tolist(), S[length % size, ind].tolist()
+    shistory = np.array(shistory)
+    ahistory = np.array(ahistory)
+    return [list(shistory[1:length[i]+1, i]) for i in range(num)],\
+           [list(ahistory[:length[i]+1, i]) for i in range(num)]
+
+
+def _vectorize(func, states):
+    """
+    Returns a function of an array of states which returns the array of
+    func(state) of each. func is called with the whole array if that gives the
+    same result as calling it once per state in states.
+
+    Args:
+        func (func): A function that accepts a state and returns a step size.
+        states (ndarray): Sample states to compare results on.
+    """
+    steps = np.array([func(state) for state in states])
+    try:
+        same = np.array_equal(np.broadcast_to(func(states), states.shape), steps)
+    except (TypeError, ValueError, IndexError):
+        same = False
+    if same:
+        return lambda states: np.broadcast_to(func(states), states.shape)
+    return lambda states: np.array([func(state) for state in states], dtype=int)
@@ -0,0 +1,159 @@
+"""
+Implementations of least-squares temporal difference Q (LSTD-Q) and least-
+squares policy iteration (LSPI). Instead of a gradient step per transition,
+the weights of an approximation linear in weights are solved for directly
+from a batch of transitions (state, action, reward, next state, terminal):
+
+    A = sum over transitions(phi(s, a) (phi(s, a) - discount * phi(s', a'))^T)
+    b = sum over transitions(phi(s, a) * reward)
+    weights = (A + regularization * I)^-1 b
+
+where phi are the features of a state/action and a' is the action of the
+evaluated policy from the next state s'. The phi(s', a') of terminal
+transitions are 0.
+
+* LSTD-Q evaluates the greedy policy of the current weights once.
+* LSPI repeats LSTD-Q with the greedy policy of the new weights until the
+    policy at the next states is stable or weights change by less than a
+    tolerance.
+
+The same batch of transitions is reused for every evaluation so no new steps
+are taken in the environment. Only applicable to learners with features (see
+FLearner). The learning rate is not used.
+
+Both return the number of policies evaluated (linear solves).
+"""
+
+
+import numpy as np
+try:
+    import features
+except ImportError:
+    from .. import features
+
+BLOCK = 2**20       # most elements of dense features accumulated at a time
+
+
+def _features(self, states, actions, nstates):
+    """
+    Returns the features of the transitions' state/action pairs and of all
+    actions from next states. They are computed once for all evaluations.
+    """
+    return self._phi_many(states, actions), self._phi_many(nstates)
+
+
+def _greedy(self, nphi):
+    """
+    Returns the greedy actions of the current weights from next states.
+    """
+    return np.argmax(features.dot(nphi, self.weights), axis=1)
+
+
+def _dense(phi, dim):
+    """
+    Returns [pairs x dim] dense features of dense or sparse features of pairs.
+    """
+    if not isinstance(phi, tuple):
+        return np.asarray(phi, dtype=float)
+    indices, values = phi
+    dense = np.zeros((len(indices), dim))
+    np.add.at(dense, (np.arange(len(indices))[:, None], indices), values)
+    return dense
+
+
+def _solve(self, phi, nphi, rewards, terminals, nactions, regularization):
+    """
+    Accumulates A and b over transitions and returns the solved weights.
+    Sparse features with few active features are accumulated by the indices
+    of active features, so the cost does not grow with the number of features.
+    """
+    dim = self.funcdim
+    A = regularization * np.eye(dim)
+    b = np.zeros(dim)
+    nphi = features.take(nphi, nactions)
+    sparse = isinstance(phi, tuple)
+    if sparse:
+        active = phi[0].shape[-1] * (phi[0].shape[-1] + nphi[0].shape[-1])
+        sparse = active < dim
+    rows = max(1, BLOCK // (active if sparse else dim))
+    for i in range(0, len(rewards), rows):
+        chunk = slice(i, i + rows)
+        cphi, cnphi = features.index(phi, chunk), features.index(nphi, chunk)
+        scale = np.where(terminals[chunk], 0., self.discount)
+        if sparse:
+            # phi - discount * nphi as the union of both active features
+            indices = np.concatenate((cphi[0], cnphi[0]), axis=1)
+            values = np.concatenate((cphi[1], -scale[:, None] * cnphi[1]), axis=1)
+            flat = cphi[0][:, :, None] * dim + indices[:, None, :]
+            A += np.bincount(flat.ravel(),
+                             (cphi[1][:, :, None] * values[:, None, :]).ravel(),
+                             minlength=dim * dim).reshape(dim, dim)
+            b += np.bincount(cphi[0].ravel(), (rewards[chunk, None] * cphi[1]).ravel(),
+                             minlength=dim)
+        else:
+            cphi, cnphi = _dense(cphi, dim), _dense(cnphi, dim)
+            A += np.dot(cphi.T, cphi - scale[:, None] * cnphi)
+            b += np.dot(rewards[chunk], cphi)
+    return np.linalg.solve(A, b)
+
+
+def _store(self, weights):
+    """
+    Writes the solved weights into the learner.
+    """
+    self.weights[:] = weights
+    self._policy_stale = True
+    self._unsaved_all = True
+
+
+def lstdq(self, states, actions, rewards, nstates, terminals, regularization=1e-6):
+    """
+    Solves for the weights of the greedy policy of the current weights from a
+    batch of transitions. Writes the result into weights.
+
+    Args:
+        self (FLearner): A reference to the calling FLearner object or a
+            subclass. Must have an approximation linear in weights.
+        states/actions/rewards/nstates/terminals (ndarray): Arrays of
+            transitions. States and actions may be indices or vectors.
+        regularization (float): Added to the diagonal of A so features not
+            in any transition get a weight of 0. Default 1e-6.
+
+    Returns:
+        The number of policies evaluated (1).
+    """
+    phi, nphi = _features(self, states, self._action_indices(actions), nstates)
+    _store(self, _solve(self, phi, nphi, rewards, terminals, _greedy(self, nphi),
+                        regularization))
+    return 1
+
+
+def lspi(self, states, actions, rewards, nstates, terminals, tolerance=1e-6,
+         iterations=20, regularization=1e-6):
+    """
+    Repeats LSTD-Q with the greedy policy of the last weights until the policy
+    is stable. Writes the result into weights.
+
+    Args:
+        self (FLearner): See lstdq().
+        states/actions/rewards/nstates/terminals (ndarray): See lstdq().
+        tolerance (float): Largest change in a weight at convergence.
+            Default 1e-6.
+        iterations (int): Maximum number of policies evaluated. Default 20.
+        regularization (float): See lstdq(). Default 1e-6.
+
+    Returns:
+        The number of policies evaluated.
+    """
+    phi, nphi = _features(self, states, self._action_indices(actions), nstates)
+    nactions = _greedy(self, nphi)
+    for i in range(1, iterations + 1):
+        weights = _solve(self, phi, nphi, rewards, terminals, nactions,
+                         regularization)
+        change = np.max(np.abs(weights - self.weights)) if len(weights) else 0.
+        _store(self, weights)
+        policy = _greedy(self, nphi)
+        if np.array_equal(policy, nactions) or change <= tolerance:
+            break
+        nactions = policy
+    return i
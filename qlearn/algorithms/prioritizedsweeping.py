@@ -0,0 +1,114 @@
+"""
+An implementation of prioritized sweeping. Instead of sampling episodes, the
+deterministic model of the environment (tmatrix and rmatrix) is used to plan:
+each (state, action) pair is backed up directly from the value of its next
+state,
+
+    Q[s, a] = R[s, a] + discount * max over b(Q[T[s, a], b])
+
+where the value of a goal (terminal) state is 0. Pairs are backed up in the
+order of the size of their Bellman error (largest first) which is kept in a
+priority queue. When the value of a state changes, the pairs leading into it
+are found from a predecessor index of the tmatrix and queued with their new
+errors. Value changes are therefore propagated backwards from goal states
+without spending updates on pairs whose estimates are already correct.
+
+Only applicable to tabular learners (i.e. QLearner) where states and actions
+are indices into [r|t|q]matrix. The model is one step i.e. the stepsize
+function is not used.
+
+Unlike other learning algorithms, no episodes are run. Returns the number of
+backups made.
+"""
+
+
+from heapq import heapify, heappush, heappop
+import numpy as np
+
+
+def predecessors(tmatrix, num_states):
+    """
+    Builds an index of the (state, action) pairs leading into each state.
+
+    Args:
+        tmatrix (ndarray): A [n states x m actions] transition matrix.
+        num_states (int): Number of states.
+
+    Returns:
+        A tuple of (indptr, pairs) where pairs[indptr[s]:indptr[s+1]] are the
+        flat indices (state * m + action) of pairs with tmatrix[pair] == s.
+    """
+    flat = np.asarray(tmatrix).ravel()
+    pairs = np.argsort(flat, kind='stable')
+    indptr = np.zeros(num_states + 1, dtype=int)
+    indptr[1:] = np.cumsum(np.bincount(flat, minlength=num_states))
+    return indptr, pairs
+
+
+def prioritizedsweeping(self, tolerance=1e-6, updates=None):
+    """
+    Backs up (state, action) pairs in order of their Bellman errors until no
+    error is larger than tolerance. Writes the backed up values into the
+    qmatrix.
+
+    Args:
+        self (QLearner): A reference to the calling QLearner object. Must
+            use a tabular representation of the value function.
+        tolerance (float): Largest Bellman error left unbacked. Default 1e-6.
+        updates (int): Maximum number of backups. Values of states that cannot
+            reach a goal state do not converge when discount is 1, so planning
+            stops after this many backups. Defaults to 100 backups per
+            (state, action) pair.
+
+    Returns:
+        The number of backups made.
+    """
+    num_states, num_actions = self.num_states, self.num_actions
+    updates = 100 * num_states * num_actions if updates is None else updates
+    discount = self.discount
+    rmatrix = np.asarray(self.rmatrix, dtype=float)
+    tmatrix = np.asarray(self.tmatrix)
+    terminal = self._goal_mask
+    indptr, pairs = predecessors(tmatrix, num_states)
+
+    # Planning is done in full precision on a dense copy of the q-values.
+    qmatrix = np.array(self.qvalue_many(np.arange(num_states)), dtype=float)
+    values = np.where(terminal, 0., np.max(qmatrix, axis=1))
+    priority = np.abs(rmatrix + discount * values[tmatrix] - qmatrix)
+    priority[priority <= tolerance] = 0
+    queue = [(-priority[s, a], s, a) for s, a in zip(*np.nonzero(priority))]
+    heapify(queue)
+    changed = np.zeros(num_states, dtype=bool)
+
+    count = 0
+    while len(queue) > 0 and count < updates:
+        error, state, action = heappop(queue)
+        # A pair is queued again when its error grows. Older entries are stale.
+        if -error != priority[state, action]:
+            continue
+        priority[state, action] = 0
+        qmatrix[state, action] = rmatrix[state, action] \
+                                 + discount * values[tmatrix[state, action]]
+        changed[state] = True
+        count += 1
+        if terminal[state]:
+            continue
+        value = np.max(qmatrix[state])
+        if value == values[state]:
+            continue
+        values[state] = value
+        for pair in pairs[indptr[state]:indptr[state + 1]]:
+            pstate, paction = divmod(pair, num_actions)
+            error = abs(rmatrix[pstate, paction] + discount * value \
+                        - qmatrix[pstate, paction])
+            if error > tolerance and error > priority[pstate, paction]:
+                priority[pstate, paction] = error
+                heappush(queue, (-error, pstate, paction))
+
+    rows = np.flatnonzero(changed)
+    self.qmatrix[rows] = qmatrix[rows]
+    if self._track_dirty:
+        self._dirty.update(rows.tolist())
+    if not self._unsaved_all:
+        self._unsaved.update(rows.tolist())
+    return count
@@ -0,0 +1,110 @@
+"""
+An implementation of the tree backup(lambda) algorithm with eligibility
+traces. Instead of looking n-steps ahead and keeping the history of the
+episode to compute the n-step return (see variablenstep), each step's one-step
+tree backup error is applied at once to all recently visited state/action
+pairs in proportion to their eligibility (trace):
+
+    error = reward + discount * sum over a(pi(a | next state) * Q(next state, a))
+            - Q(state, action)
+
+    Q(s, a) += lrate * error * trace(s, a)      for all traced (s, a)
+
+    trace(s, a) *= discount * lambda * pi(next action | next state)
+
+Traces of all pairs decay by the same factor each step, so the oldest pair
+always has the smallest trace. Traces are kept in a queue, and pairs whose
+trace falls below CUTOFF are dropped from the front. At most MAXLEN pairs are
+traced. The memory used per step is therefore constant and does not grow with
+the depth of the episode. A pair visited more than once has one entry per
+visit (accumulating traces).
+
+With lambda = 0 this is one-step tree backup (expected Sarsa). With lambda = 1
+and no cutoff it is equivalent to tree backup with n = depth.
+
+Like other learning algorithms, returns a tuple of lists if history is true:
+    [list of states traversed after the initial state, including final state],
+    [list of actions taken to traverse states, starting with the first action]
+Else a tuple of (number of states traversed, final state).
+"""
+
+
+from collections import deque
+import numpy as np
+
+
+CUTOFF = 1e-3       # smallest trace kept
+MAXLEN = 256        # largest number of traced state/action pairs
+
+
+def treebackup(self, state, action, history=False):
+    """
+    Runs a learning episode using tree backup(lambda). The decay of traces
+    (lambda) is self.trace. Calls self.update for each traced pair at every
+    step. Compatible with integer and vector representation of states and
+    actions.
+    See Reinforcement Learning - an Introduction by Sutton/Barto (Ch. 12)
+
+    Args:
+        self (QLearner): A reference to the calling QLearner object or a
+            subclass.
+        state (int/list): State to begin learning episode from.
+        action (int/list): Action to take from that state. If None, choose one
+            from policy.
+        history (bool): Whether to keep and return the states and actions of
+            the whole episode. Default False.
+    Returns:
+        If history is True, a tuple of:
+        - The history of N states traversed after the provided state.
+        - The history of N actions taken after the provided state.
+        Else a tuple of the number of states traversed (N) and the final state.
+    """
+    traces = deque(maxlen=MAXLEN)   # [state, action, trace] of traced pairs
+    action = self.next_action(state) if action is None else action
+    S = [] if history else None
+    A = [action] if history else None
+    nstate = state
+    t = 0
+
+    while t < self.depth:
+        step = self.stepsize(state)
+        nstate = self.next_state(state, action, stepsize=step)
+        reward = self.reward(state, action, nstate, stepsize=step)
+        terminal = self.goal(nstate)
+        cqvalue = self.qvalue(state, action)
+        if terminal:
+            error = reward - cqvalue
+        else:
+            aprobs = self.a_probs(nstate)
+            error = reward + self.discount * np.dot(aprobs, self.qvalue(nstate)) \
+                    - cqvalue
+        if self.memory is not None:
+            self.memory.add(state, action, reward, nstate, terminal)
+
+        traces.append([state, action, 1.])
+        for s, a, e in traces:
+            self.update(s, a, -error * e)
+        if history:
+            S.append(nstate)
+        t += 1
+        if terminal:
+            break
+
+        naction = self.next_action(nstate)
+        # For QLearner subclasses with vector representation,
+        # naction cannot be used as an index
+        if isinstance(naction, (int, np.integer)):
+            decay = self.discount * self.trace * aprobs[naction]
+        else:
+            decay = self.discount * self.trace \
+                    * aprobs[self.actionconverter.encode(naction)]
+        for entry in traces:
+            entry[2] *= decay
+        while len(traces) > 0 and traces[0][2] < CUTOFF:
+            traces.popleft()
+        state, action = nstate, naction
+        if history:
+            A.append(action)
+    if history:
+        return S, A
+    return t, nstate
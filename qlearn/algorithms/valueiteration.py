@@ -0,0 +1,129 @@
+"""
+Implementations of value iteration and policy iteration. Like prioritized
+sweeping, the deterministic model of the environment (tmatrix and rmatrix) is
+used instead of sampled episodes. Every sweep computes the whole qmatrix at
+once from the values of next states:
+
+    Q = R + discount * V[T]
+
+where V is the greedy value of each state and 0 for goal (terminal) states.
+
+* Value iteration takes V[s] = max over a(Q[s, a]) after every sweep.
+* Policy iteration evaluates the greedy policy of the current qmatrix,
+    V[s] = R[s, pi(s)] + discount * V[T[s, pi(s)]], and then improves the
+    policy. It stops when the policy is stable.
+
+Only applicable to tabular learners (i.e. QLearner) where states and actions
+are indices into [r|t|q]matrix. The model is one step i.e. the stepsize
+function is not used.
+
+Value iteration returns the number of sweeps made, and policy iteration the
+number of policies evaluated.
+"""
+
+
+import numpy as np
+
+
+def _model(self):
+    """
+    Returns the dense reward matrix, transition matrix, a boolean mask of
+    terminal (goal) states and the current q-values in full precision.
+    """
+    rmatrix = np.asarray(self.rmatrix, dtype=float)
+    tmatrix = np.asarray(self.tmatrix)
+    terminal = self._goal_mask
+    qmatrix = np.array(self.qvalue_many(np.arange(self.num_states)), dtype=float)
+    return rmatrix, tmatrix, terminal, qmatrix
+
+
+def _store(self, qmatrix):
+    """
+    Writes the solved q-values into the qmatrix of the learner.
+    """
+    self.qmatrix[:] = qmatrix
+    self._policy_stale = True
+    self._unsaved_all = True
+
+
+def valueiteration(self, tolerance=1e-6, iterations=None):
+    """
+    Sweeps over all (state, action) pairs until no q-value changes by more
+    than tolerance. Writes the result into the qmatrix.
+
+    Args:
+        self (QLearner): A reference to the calling QLearner object. Must
+            use a tabular representation of the value function.
+        tolerance (float): Largest change in a q-value at convergence.
+            Default 1e-6.
+        iterations (int): Maximum number of sweeps. Values of states that
+            cannot reach a goal state do not converge when discount is 1.
+            Defaults to 10 times the number of states.
+
+    Returns:
+        The number of sweeps made.
+    """
+    rmatrix, tmatrix, terminal, qmatrix = _model(self)
+    iterations = 10 * self.num_states if iterations is None else iterations
+    sweeps = 0
+    while sweeps < iterations:
+        values = np.where(terminal, 0., np.max(qmatrix, axis=1))
+        new = rmatrix + self.discount * values[tmatrix]
+        change = np.max(np.abs(new - qmatrix))
+        qmatrix = new
+        sweeps += 1
+        if change <= tolerance:
+            break
+    _store(self, qmatrix)
+    return sweeps
+
+
+def policyiteration(self, tolerance=1e-6, iterations=None):
+    """
+    Alternates between evaluating the greedy policy of the qmatrix and
+    improving it until the policy does not change. Writes the q-values of
+    the final policy into the qmatrix.
+
+    Since the model is deterministic, a policy is a single next state for each
+    state. It is evaluated exactly by path doubling: the discounted rewards of
+    the next 2^k steps from every state are combined into those of the next
+    2^(k+1) steps. A policy which never reaches a goal state from some states
+    has diverging values when discount is 1. So paths are followed for at
+    least self.depth steps, the same limit as the length of a learning episode.
+
+    Args:
+        self (QLearner): A reference to the calling QLearner object. Must
+            use a tabular representation of the value function.
+        tolerance (float): Smallest increase in q-value for which the policy
+            of a state is changed. Default 1e-6.
+        iterations (int): Maximum number of policy improvements. Defaults to
+            the number of states.
+
+    Returns:
+        The number of policy evaluations made.
+    """
+    rmatrix, tmatrix, terminal, qmatrix = _model(self)
+    iterations = self.num_states if iterations is None else iterations
+    states = np.arange(self.num_states)
+    doublings = int(np.ceil(np.log2(max(self.depth, 2))))
+    policy = np.argmax(qmatrix, axis=1)
+    evaluations = 0
+    while evaluations < iterations:
+        # Evaluation. Goal states are absorbing with no reward.
+        values = np.where(terminal, 0., rmatrix[states, policy])
+        nstates = np.where(terminal, states, tmatrix[states, policy])
+        discount = float(self.discount)
+        for _ in range(doublings):
+            values = values + discount * values[nstates]
+            nstates = nstates[nstates]
+            discount *= discount
+        evaluations += 1
+        # Improvement. Ties keep the current action so the loop terminates.
+        qmatrix = rmatrix + self.discount * np.where(terminal, 0., values)[tmatrix]
+        best = np.argmax(qmatrix, axis=1)
+        improved = qmatrix[states, best] > qmatrix[states, policy] + tolerance
+        if not np.any(improved):
+            break
+        policy = np.where(improved, best, policy)
+    _store(self, qmatrix)
+    return evaluations
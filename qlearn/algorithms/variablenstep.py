@@ -6,16 +6,19 @@ choosing n-actions from the current state. If n=1, then it is QLearning.
 The size of a step can be a function of the current state.
 
 All learning algorithms should be able to learn from a single state/action pair.
-All learning algorithms return a tuple of lists:
+All learning algorithms accept a history argument. If true, they return a
+tuple of lists:
     [list of states traversed after the initial state, including final state],
     [list of actions taken to traverse states, starting with the first action]
+Else they return a tuple of:
+    (number of states traversed after the initial state, final state)
 """
 
 
 import numpy as np
 
 
-def variablenstep(self, state, action):
+def variablenstep(self, state, action, history=False):
     """
     Begins learning procedure over all (state, action) pairs. Calculates errors
     between last and current estimation of q-value and calls self.update to
@@ -25,29 +28,42 @@ def variablenstep(self, state, action):
     Compatible with integer and vector representation of states and actions.
     See Reinforcement Learning - an Introduction by Sutton/Barto (Ch. 7)
 
+    Only the last n+1 states, actions and errors are needed to compute the
+    n-step error. They are kept in ring buffers of that size, indexed by
+    time % (n+1), so memory does not grow with the length of the episode.
+
     Args:
         self (QLearner): A reference to the calling QLearner object or a
             subclass.
         state (int/list): State to begin learning episode from.
         action (int/list): Action to take from that state. If None, choose one
             from policy.
+        history (bool): Whether to keep and return the states and actions of
+            the whole episode. Default False.
     Returns:
-        A tuple of:
+        If history is True, a tuple of:
         - The history of N states traversed after the provided state.
         - The history of N actions taken after the provided state.
+        Else a tuple of the number of states traversed (N) and the final state.
     """
 
     T = np.inf      # termination time (i.e. terminal state)
     tau = 0         # time of state being updated
     t = 0           # time from beginning of episode
-    delta = []      # error in current and next value estimate at time t
-    Q = []          # history of Q-values of taken actions
-    A = []          # history of actions taken for n-step lookahead
-    S = [state]     # history of states taken
-    pi = [1]        # history of action probabilities for each state
+    size = self.steps + 1   # length of ring buffers, indexed by time % size
+    delta = [0.] * size     # error in current and next value estimate at time t
+    Q = [0.] * size         # Q-values of taken actions
+    A = [None] * size       # actions taken for n-step lookahead
+    S = [None] * size       # states taken
+    pi = [1.] * size        # action probabilities for each state
+    length = 0              # number of states traversed
 
-    A.append(self.next_action(state) if action is None else action)
-    Q.append(self.qvalue(state, A[-1]))
+    S[0] = state
+    A[0] = self.next_action(state) if action is None else action
+    Q[0] = self.qvalue(state, A[0])
+    if history:
+        shistory = []
+        ahistory = [A[0]]
 
     # Loop from start of episode until the state before terminal state
     while tau <= T-1 and t < self.depth:
@@ -55,48 +71,56 @@ def variablenstep(self, state, action):
         # being updated. If a terminal state comes before n-steps, it
         # stops looking ahead.
         if t < T:
-            action = A[-1]                          # current action
-            state = S[-1]                           # current state
+            cur, nxt = t % size, (t + 1) % size
+            action = A[cur]                         # current action
+            state = S[cur]                          # current state
             naction = self.next_action(state)       # next action
             step = self.stepsize(state)             # size of lookahead
             nstate = self.next_state(state, action, stepsize=step) # next state
             cqvalue = self.qvalue(state, action)    # current Q-value
             nqvalue = self.qvalue(nstate, naction)  # next Q-value
 
-            A.append(naction)
-            S.append(nstate)
-            Q.append(nqvalue)
+            A[nxt] = naction
+            S[nxt] = nstate
+            Q[nxt] = nqvalue
+            length += 1
+            if history:
+                shistory.append(nstate)
+                ahistory.append(naction)
 
             reward = self.reward(state, action, nstate, stepsize=step)
             aprobs = self.a_probs(nstate)
             # For QLearner subclasses with vector representation,
             # naction cannot be used as an index
             if isinstance(naction, (int, np.integer)):
-                pi.append(aprobs[naction])
+                pi[nxt] = aprobs[naction]
             else:
-                pi.append(aprobs[self.actionconverter.encode(naction)])
+                pi[nxt] = aprobs[self.actionconverter.encode(naction)]
 
             if self.goal(nstate):   # Episode stops look-ahead by
                 T = t + 1           # updating T from infinity to t+1
-                delta.append(reward - cqvalue)
+                delta[cur] = reward - cqvalue
             else:
-                delta.append(
-                    reward \
-                    + self.discount * np.dot(aprobs, self.qvalue(nstate))\
-                    - cqvalue
-                    )
+                delta[cur] = reward \
+                             + self.discount * np.dot(aprobs, self.qvalue(nstate))\
+                             - cqvalue
+            if self.memory is not None:
+                self.memory.add(state, action, reward, nstate, T == t + 1)
         # In the second step, the algorithm updates a state's value
         # using the errors/rewards computed from the look-ahead.
         tau = t - self.steps + 1 # tau trails look-ahead (t) by n-steps
         if tau >= 0:
             E = 1
-            G = Q[tau]  # G is the expected return using n-step lookahead
+            G = Q[tau % size]  # G is the expected return using n-step lookahead
             # Iterating from current state to n-steps ahead or terminal
             # state (whichever's closer), computes the n-step error
             # and updates q-matrix accordingly.
             for k in range(tau, min(tau + self.steps, T)):
-                G += E * delta[k]
-                E = self.discount * E * pi[k+1]
-            self.update(S[tau], A[tau], self.qvalue(S[tau], A[tau]) - G)
+                G += E * delta[k % size]
+                E = self.discount * E * pi[(k+1) % size]
+            ustate, uaction = S[tau % size], A[tau % size]
+            self.update(ustate, uaction, self.qvalue(ustate, uaction) - G)
         t += 1
-    return S[1:], A
+    if history:
+        return shistory, ahistory
+    return length, S[length % size]
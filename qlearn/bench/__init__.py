@@ -0,0 +1,23 @@
+"""
+Benchmarks for the qlearn package. Measures:
+
+* Learning speed (episodes/s and steps/s) of QLearner, FLearner and SLearner
+    over TestBench sizes, action selection policies and modes (learners),
+* TestBench set up time (setup),
+* Simulator.run() latency on the tank netlists in models/ (simulator),
+* Netlist parsing throughput (netlist),
+* FlagGenerator encode/decode rates (flags).
+
+Usage:
+
+> python -m qlearn.bench -o results.json
+> python -m qlearn.bench --sizes 10 100 1000 --suites learners setup
+> python -m qlearn.bench -o new.json --compare results.json
+
+Results are JSON so they can be compared between versions. See suite module.
+"""
+
+from .timing import measure, result
+from .learners import bench_learners, bench_setup
+from .circuits import bench_netlist, bench_simulator, bench_flags
+from .suite import run, compare, load, save, SUITES
@@ -0,0 +1,45 @@
+"""
+Runs the qlearn benchmarks from the command-line. See bench package.
+"""
+
+import sys
+import json
+from argparse import ArgumentParser
+from .suite import run, compare, load, save, SUITES
+from .learners import SIZES, SIM_SIZES
+
+
+args = ArgumentParser(prog='python -m qlearn.bench')
+args.add_argument('-s', '--suites', metavar='S', nargs='*', choices=SUITES,
+                  help="Benchmarks to run", default=SUITES)
+args.add_argument('--sizes', metavar='N', type=int, nargs='*',
+                  help="TestBench sizes for QLearner/FLearner", default=SIZES)
+args.add_argument('--sim_sizes', metavar='N', type=int, nargs='*',
+                  help="TestBench sizes for SLearner", default=SIM_SIZES)
+args.add_argument('-e', '--episodes', metavar='E', type=int,
+                  help="Episodes to learn for QLearner/FLearner", default=100)
+args.add_argument('--sim_episodes', metavar='E', type=int,
+                  help="Episodes to learn for SLearner", default=5)
+args.add_argument('-d', '--depth', metavar='D', type=int,
+                  help="Maximum steps in each learning episode", default=100)
+args.add_argument('--seed', metavar='SEED', type=int,
+                  help="Random number seed", default=0)
+args.add_argument('-o', '--output', metavar='F', type=str,
+                  help="File to save results to (JSON). Default stdout", default='')
+args.add_argument('-c', '--compare', metavar='F', type=str,
+                  help="File of baseline results to compare with", default='')
+ARGS = args.parse_args()
+
+RESULTS = run(suites=ARGS.suites, sizes=ARGS.sizes, sim_sizes=ARGS.sim_sizes,
+              episodes=ARGS.episodes, sim_episodes=ARGS.sim_episodes,
+              depth=ARGS.depth, seed=ARGS.seed)
+if ARGS.output != '':
+    save(RESULTS, ARGS.output)
+elif ARGS.compare == '':
+    json.dump(RESULTS, sys.stdout, indent=1)
+    print()
+
+if ARGS.compare != '':
+    for name, params, old, new, speedup in compare(load(ARGS.compare), RESULTS):
+        print('%-20s %-60s %12.4g %12.4g %7.2fx' % (name, json.dumps(params),
+                                                   old, new, speedup))
@@ -0,0 +1,152 @@
+"""
+Benchmarks of the linsim package: netlist parsing, circuit simulation and
+state/flag conversion.
+
+Simulations are run on the tank netlists in models/ the same way as the tank
+demos: capacitors are tanks whose potentials are the state, and one of the
+resistors (valves) is switched on by the action.
+"""
+
+import os
+from glob import glob
+import numpy as np
+from .timing import measure, result
+from ..linsim import Netlist, FlagGenerator
+from ..linsim import Simulator
+
+
+MODELS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(
+         os.path.abspath(__file__)))), 'models')
+NETLISTS = tuple(sorted(glob(os.path.join(MODELS, '*.netlist'))))
+ON_RESISTANCE = 1e0
+OFF_RESISTANCE = 1e6
+INTERNAL_RESISTANCE = 1e3
+CAPACITANCE = 1e-3
+TIMESTEP = 1e-2
+STEPSIZE = 3e-2
+FLAGS = ((10, 10), (5,) * 6 + (15,), (2,) * 20)
+
+
+def bench_netlist(paths=NETLISTS, repeat=3, number=50):
+    """
+    Measures how fast netlist files are parsed.
+
+    Args:
+        paths (tuple): Filepaths of netlists. Defaults to models/*.netlist.
+        repeat/number (int): See timing.measure().
+
+    Returns:
+        A list of result dicts (see timing.result).
+    """
+    results = []
+    for path in paths:
+        with open(path, 'r') as f:
+            lines = len(f.readlines())
+        elapsed = measure(lambda: Netlist('bench', path=path), number, repeat)
+        name = os.path.basename(path)
+        results.append(result('netlist_parse', 1 / elapsed, 'netlists/s', netlist=name))
+        results.append(result('netlist_parse_lines', lines / elapsed, 'lines/s',
+                              netlist=name))
+    return results
+
+
+def bench_simulator(paths=NETLISTS, runs=20, seed=0):
+    """
+    Measures the latency of Simulator.run() on tank netlists from random
+    states and actions.
+
+    Args:
+        paths (tuple): Filepaths of netlists. Defaults to models/*.netlist.
+        runs (int): Number of simulations. Default 20.
+        seed (int): Seed for random states and actions.
+
+    Returns:
+        A list of result dicts (see timing.result).
+    """
+    random = np.random.RandomState(seed)
+    results = []
+    for path in paths:
+        sim, num_tanks, num_valves = _tank_simulator(path)
+        states = random.rand(runs, num_tanks) * 4
+        actions = random.randint(num_valves + 1, size=(runs, 1))
+        sim.run(states[0], actions[0], stepsize=STEPSIZE)    # warm up
+        times = []
+        for state, action in zip(states, actions):
+            times.append(measure(lambda: sim.run(state, action, stepsize=STEPSIZE),
+                                 number=1, repeat=1))
+        name = os.path.basename(path)
+        results.append(result('simulator_run', np.median(times), 's',
+                              netlist=name, stepsize=STEPSIZE, timestep=TIMESTEP))
+        results.append(result('simulator_run_min', np.min(times), 's',
+                              netlist=name, stepsize=STEPSIZE, timestep=TIMESTEP))
+    return results
+
+
+def bench_flags(flags=FLAGS, num=10000, repeat=3, seed=0):
+    """
+    Measures encode/decode rates of FlagGenerator, one at a time and
+    vectorized.
+
+    Args:
+        flags (tuple): Tuples of flag arguments for FlagGenerators.
+        num (int): Number of states to encode/decode. Default 10000.
+        repeat (int): See timing.measure().
+        seed (int): Seed for random states.
+
+    Returns:
+        A list of result dicts (see timing.result).
+    """
+    random = np.random.RandomState(seed)
+    results = []
+    for args in flags:
+        gen = FlagGenerator(*args)
+        states = random.randint(min(gen.num_states, 2**62), size=num)
+        vecs = gen.decode_many(states)
+        single = min(num, 1000)
+        params = dict(flags=list(args), num_states=int(gen.num_states))
+        elapsed = measure(lambda: [gen.decode(s) for s in states[:single]],
+                          repeat=repeat)
+        results.append(result('flags_decode', single / elapsed, 'states/s', **params))
+        elapsed = measure(lambda: [gen.encode(v) for v in vecs[:single]],
+                          repeat=repeat)
+        results.append(result('flags_encode', single / elapsed, 'states/s', **params))
+        elapsed = measure(lambda: gen.decode_many(states), repeat=repeat)
+        results.append(result('flags_decode_many', num / elapsed, 'states/s', **params))
+        elapsed = measure(lambda: gen.encode_many(vecs), repeat=repeat)
+        results.append(result('flags_encode_many', num / elapsed, 'states/s', **params))
+    return results
+
+
+def _tank_simulator(path):
+    """
+    Creates a Simulator for a tank netlist. Returns the simulator, number of
+    tanks (state variables) and number of valves (actions besides no-op).
+    """
+    net = Netlist('bench', path=path)
+    if 'ic' not in net.directives:
+        net.add_directive('.ic')
+    initial = net.directives['ic'][0]
+    valves = [r for r in net.elements_like('r') if not r.name.startswith('ri')]
+    for res in valves:
+        res.value = OFF_RESISTANCE
+    for res in net.elements_like('ri'):
+        res.value = INTERNAL_RESISTANCE
+    tanks = net.elements_like('c')
+    for cap in tanks:
+        cap.value = CAPACITANCE
+
+    def state_mux(svec, avec, netlist):
+        for i, cap in enumerate(tanks):
+            initial.param('v(' + str(cap.nodes[0]) + ')', svec[i])
+        for res in valves:
+            res.value = OFF_RESISTANCE
+        if avec[0] != 0:
+            valves[int(avec[0] - 1)].value = ON_RESISTANCE
+        return netlist
+
+    def state_demux(psvec, pavec, netlist, res):
+        return np.array([res['v(' + str(cap.nodes[0]) + ')'] for cap in tanks])
+
+    sim = Simulator(env=net, timestep=TIMESTEP, state_mux=state_mux,
+                    state_demux=state_demux)
+    return sim, len(tanks), len(valves)
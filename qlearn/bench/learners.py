@@ -0,0 +1,112 @@
+"""
+Benchmarks of learning speed. Learners are set up on TestBench topologies of
+different sizes, and learn from the same start states for each action
+selection policy and mode. Results are episodes per second and steps (state
+transitions) per second. Episode depth is fixed so rates of different sizes
+are comparable. The time to set up each TestBench is also measured.
+
+SLearner runs a circuit simulation for every step so it is benchmarked on
+smaller topologies and fewer episodes.
+"""
+
+from time import perf_counter
+from itertools import islice
+import numpy as np
+from .timing import result
+from ..qlearner import QLearner
+from ..flearner import FLearner
+from ..slearner import SLearner
+from ..testbench import TestBench
+
+
+SIZES = (10, 30, 100)       # TestBench sizes for QLearner/FLearner (up to 1000)
+SIM_SIZES = (5,)            # TestBench sizes for SLearner
+POLICIES = (QLearner.UNIFORM, QLearner.GREEDY, QLearner.SOFTMAX)
+MODES = (QLearner.OFFLINE, QLearner.ONLINE)
+FUNCDIM = 7
+
+
+def approximation(size):
+    """
+    Returns func and dfunc for FLearner/SLearner with terms scaled by the
+    size of the topology so weights do not diverge on large topologies.
+    """
+    def dfunc(s, a, w):
+        return np.array([s[0]*a[0]/size, s[1]*a[1]/size, (s[0]/size)**2,
+                         (s[1]/size)**2, a[0]**2/4, a[1]**2/4, 1])
+    def func(s, a, w):
+        return np.dot(w, dfunc(s, a, w))
+    return func, dfunc
+
+
+def bench_learners(sizes=SIZES, sim_sizes=SIM_SIZES, episodes=100,
+                   sim_episodes=5, depth=100, seed=0, learners=None):
+    """
+    Measures learning rates of learners over sizes, policies and modes.
+
+    Args:
+        sizes (tuple): TestBench sizes for QLearner and FLearner.
+        sim_sizes (tuple): TestBench sizes for SLearner.
+        episodes (int): Number of episodes to learn for QLearner/FLearner.
+        sim_episodes (int): Number of episodes to learn for SLearner.
+        depth (int): Maximum number of steps in each episode. Default 100.
+        seed (int): Seed for topologies and learners.
+        learners (tuple): Learner classes to benchmark. Defaults to all of
+            QLearner, FLearner, SLearner.
+
+    Returns:
+        A list of result dicts (see timing.result).
+    """
+    learners = (QLearner, FLearner, SLearner) if learners is None else learners
+    results = []
+    for learner in learners:
+        if learner is SLearner:
+            lsizes, num, modes = sim_sizes, sim_episodes, (SLearner.ONLINE,)
+        else:
+            lsizes, num, modes = sizes, episodes, MODES
+        for size in lsizes:
+            for policy in POLICIES:
+                for mode in modes:
+                    results.extend(_bench_learner(learner, size, policy, mode,
+                                                  num, depth, seed))
+    return results
+
+
+def bench_setup(sizes=SIZES, seed=0):
+    """
+    Measures the time to set up TestBench topologies and a QLearner.
+
+    Args:
+        sizes (tuple): TestBench sizes.
+        seed (int): Seed for topologies.
+
+    Returns:
+        A list of result dicts (see timing.result).
+    """
+    results = []
+    for size in sizes:
+        start = perf_counter()
+        TestBench(size=size, seed=seed)
+        results.append(result('testbench_setup', perf_counter() - start, 's',
+                              size=size))
+    return results
+
+
+def _bench_learner(learner, size, policy, mode, episodes, depth, seed):
+    kwargs = dict(policy=policy, depth=depth, max_prob=0.5)
+    if learner is not QLearner:
+        func, dfunc = approximation(size)
+        kwargs.update(func=func, dfunc=dfunc, funcdim=FUNCDIM)
+    if learner is SLearner:
+        kwargs.update(stepsize=lambda x: 1e-2)
+    else:
+        kwargs.update(mode=mode)
+    t = TestBench(size=size, seed=seed, learner=learner, **kwargs)
+    starts = list(islice(t.learner.episodes(), episodes))
+    start = perf_counter()
+    lengths, _ = t.learner.learn(episodes=starts, history=False)
+    elapsed = perf_counter() - start
+    params = dict(learner=learner.__name__, size=size, policy=policy, mode=mode,
+                  episodes=len(starts), depth=depth)
+    return [result('learn_episodes', len(starts) / elapsed, 'episodes/s', **params),
+            result('learn_steps', sum(lengths) / elapsed, 'steps/s', **params)]
@@ -0,0 +1,104 @@
+"""
+This module runs the benchmarks together and compares results between
+versions. Results are saved as JSON:
+
+    {'meta': {'python': str, 'numpy': str, 'platform': str, 'time': str},
+     'results': [{'name': str, 'params': dict, 'value': float, 'unit': str},
+                 ...]}
+"""
+
+import sys
+import json
+import platform
+from datetime import datetime
+import numpy as np
+from .learners import bench_learners, bench_setup, SIZES, SIM_SIZES
+from .circuits import bench_netlist, bench_simulator, bench_flags
+
+
+SUITES = ('learners', 'setup', 'simulator', 'netlist', 'flags')
+
+
+def run(suites=SUITES, sizes=SIZES, sim_sizes=SIM_SIZES, episodes=100,
+        sim_episodes=5, depth=100, seed=0, log=sys.stderr):
+    """
+    Runs benchmarks.
+
+    Args:
+        suites (tuple): Names of benchmarks to run. Default SUITES (all).
+        sizes/sim_sizes/episodes/sim_episodes/depth: See
+            learners.bench_learners().
+        seed (int): Seed for all benchmarks.
+        log (file): Where names of benchmarks are printed as they run. None
+            for no output.
+
+    Returns:
+        A dict of meta data and results. See module.
+    """
+    benches = {
+        'learners': lambda: bench_learners(sizes, sim_sizes, episodes,
+                                           sim_episodes, depth, seed),
+        'setup': lambda: bench_setup(sizes, seed),
+        'simulator': lambda: bench_simulator(seed=seed),
+        'netlist': lambda: bench_netlist(),
+        'flags': lambda: bench_flags(seed=seed)
+    }
+    results = []
+    for suite in suites:
+        if suite not in benches:
+            raise ValueError('Benchmark "' + str(suite) + '" does not exist.')
+        if log is not None:
+            print('Running ' + suite + ' benchmarks...', file=log)
+        results.extend(benches[suite]())
+    meta = {'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(),
+            'time': datetime.now().isoformat(timespec='seconds')}
+    return {'meta': meta, 'results': results}
+
+
+def compare(old, new):
+    """
+    Compares two sets of results of the same benchmarks.
+
+    Args:
+        old (dict): Results returned by run() (or loaded from JSON) of the
+            baseline.
+        new (dict): Results to compare with the baseline.
+
+    Returns:
+        A list of (name, params, old value, new value, speedup) tuples for
+        results present in both. Speedup is greater than 1 if new is faster.
+    """
+    baseline = {_key(res): res for res in old['results']}
+    comparison = []
+    for res in new['results']:
+        base = baseline.get(_key(res))
+        if base is None or base['value'] == 0 or res['value'] == 0:
+            continue
+        if res['unit'].endswith('/s'):
+            speedup = res['value'] / base['value']
+        else:
+            speedup = base['value'] / res['value']
+        comparison.append((res['name'], res['params'], base['value'],
+                           res['value'], speedup))
+    return comparison
+
+
+def load(fname):
+    """
+    Loads results saved as JSON.
+    """
+    with open(fname, 'r') as f:
+        return json.load(f)
+
+
+def save(results, fname):
+    """
+    Saves results as JSON.
+    """
+    with open(fname, 'w') as f:
+        json.dump(results, f, indent=1)
+
+
+def _key(res):
+    return (res['name'], json.dumps(res['params'], sort_keys=True))
@@ -0,0 +1,45 @@
+"""
+This module defines helpers shared by the benchmarks to time functions and
+format results.
+"""
+
+from time import perf_counter
+
+
+def measure(func, number=1, repeat=3):
+    """
+    Times a function. Like timeit, the best of repeated measurements is taken
+    since slower runs are due to other processes and not the function.
+
+    Args:
+        func (func): A function that takes no arguments.
+        number (int): Number of calls in each measurement. Default 1.
+        repeat (int): Number of measurements. Default 3.
+
+    Returns:
+        The smallest time (s) per call.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (perf_counter() - start) / number)
+    return best
+
+
+def result(name, value, unit, **params):
+    """
+    Creates a benchmark result entry.
+
+    Args:
+        name (str): Name of benchmark.
+        value (float): Measured value.
+        unit (str): Unit of value. Units ending in '/s' are rates (higher is
+            better). Others are durations (lower is better).
+        **params: Parameters of the benchmark which identify the result.
+
+    Returns:
+        A dict of name, params, value and unit.
+    """
+    return {'name': name, 'params': params, 'value': float(value), 'unit': unit}
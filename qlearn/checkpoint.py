@@ -0,0 +1,166 @@
+"""
+This module saves and restores the learning state of learners (QLearner,
+FLearner, SLearner) so that long learning runs can be resumed. A checkpoint
+is a binary numpy .npz archive containing:
+
+* The value function: qmatrix (dense or sparse) or weights,
+* The state of the learner's random number generator and buffered numbers,
+* The OFFLINE action selection policy caches and the policy/mode,
+* The learning parameters (lrate, discount, depth, steps, trace).
+
+The environment (reward/transition matrices, simulator, functions) is not
+saved. A checkpoint is restored into a learner instantiated with the same
+environment.
+
+Checkpoints of tabular learners can be incremental. An incremental checkpoint
+(a delta) only contains the rows of the qmatrix (and policy caches) of states
+changed since the previous checkpoint, and the filepath of that checkpoint.
+Restoring a delta restores the chain of checkpoints it is based on. Changes to
+the whole qmatrix or policy caches (e.g. reset(), solve(), a new policy) make
+the next checkpoint a full one.
+"""
+
+import os
+import json
+import numpy as np
+try:
+    from sparse import SparseMatrix
+except ImportError:
+    from .sparse import SparseMatrix
+
+
+PARAMS = ('lrate', 'discount', 'depth', 'steps', 'trace', 'policy', 'mode')
+
+
+def save_checkpoint(learner, fname, incremental=False):
+    """
+    Saves the learning state of a learner into a file.
+
+    Args:
+        learner (QLearner): A QLearner instance or a subclass.
+        fname (str): Filepath of checkpoint. A '.npz' extension is added by
+            numpy if missing.
+        incremental (bool): Whether to only save the rows of the qmatrix of
+            states changed since the last checkpoint of the learner. Saves a
+            full checkpoint if there is no previous checkpoint, if the whole
+            qmatrix has changed (e.g. reset(), solve()), or for learners with
+            weights. Default False.
+
+    Returns:
+        The filepath of the saved checkpoint.
+    """
+    fname = fname if fname.endswith('.npz') else fname + '.npz'
+    name = 'weights' if hasattr(learner, 'weights') else 'qmatrix'
+    table = getattr(learner, name)
+    parent = getattr(learner, '_checkpoint', None)
+    incremental = incremental and name == 'qmatrix' and parent is not None \
+                  and not learner._unsaved_all
+    params = {key: getattr(learner, key) for key in PARAMS}
+    params['depth'] = float(params['depth'])    # may be np.inf
+    params['table'] = name
+    params['policy_stale'] = bool(getattr(learner, '_policy_stale', True))
+    params['scalars'] = {key: float(val) for key, val in learner._action_param.items()
+                         if np.ndim(val) == 0}
+    arrays = {key: val for key, val in learner._action_param.items()
+              if np.ndim(val) > 0}
+    data = {}
+    state = learner.random.get_state()
+    data['rng_keys'] = state[1]
+    data['rng_pos'] = np.array([state[2], state[3]])
+    data['rng_gauss'] = np.array(state[4])
+    data['rng_buffer'] = learner.uniforms.get_state()
+    data['dirty'] = np.fromiter(getattr(learner, '_dirty', ()), dtype=int)
+
+    if incremental:
+        rows = np.array(sorted(learner._unsaved), dtype=int)
+        params['kind'] = 'delta'
+        params['parent'] = os.path.relpath(parent, os.path.dirname(os.path.abspath(fname)))
+        data['rows'] = rows
+        data['table'] = table[rows]
+        for key, val in arrays.items():
+            data['cache_' + key] = val[rows]
+    else:
+        params['kind'] = 'full'
+        if isinstance(table, SparseMatrix):
+            rows = table.rows()
+            params['sparse'] = {'shape': list(table.shape), 'fill': float(table.fill)}
+            data['rows'] = rows
+            data['table'] = table[rows]
+        else:
+            data['table'] = np.asarray(table)
+        for key, val in arrays.items():
+            if isinstance(val, SparseMatrix):
+                data['cacherows_' + key] = val.rows()
+                data['cachefill_' + key] = np.asarray(val.fill)
+                val = val[val.rows()]
+            data['cache_' + key] = val
+
+    data['params'] = np.array(json.dumps(params))
+    np.savez(fname, **data)
+    learner._checkpoint = os.path.abspath(fname)
+    if name == 'qmatrix':
+        learner._unsaved.clear()
+        learner._unsaved_all = False
+    return fname
+
+
+def load_checkpoint(learner, fname):
+    """
+    Restores the learning state of a learner from a checkpoint file. If the
+    checkpoint is incremental, the checkpoints it is based on are restored
+    first.
+
+    Args:
+        learner (QLearner): A QLearner instance or a subclass with the same
+            environment as the learner that was saved.
+        fname (str): Filepath of checkpoint.
+    """
+    with np.load(fname) as archive:
+        data = {key: archive[key] for key in archive.files}
+    params = json.loads(str(data['params']))
+    name = params['table']
+    if params['kind'] == 'delta':
+        parent = os.path.join(os.path.dirname(os.path.abspath(fname)), params['parent'])
+        load_checkpoint(learner, parent)
+        rows = data['rows']
+        getattr(learner, name)[rows] = data['table']
+        for key in data:
+            if key.startswith('cache_'):
+                learner._action_param[key[len('cache_'):]][rows] = data[key]
+    else:
+        if 'sparse' in params:
+            table = SparseMatrix(params['sparse']['shape'], params['sparse']['fill'],
+                                 dtype=data['table'].dtype)
+            table[data['rows']] = data['table']
+        else:
+            table = data['table']
+        setattr(learner, name, table)
+        learner.set_action_selection_policy(params['policy'], params['mode'],
+                                            max_prob=0)
+        learner._action_param = {}
+        for key in data:
+            if key.startswith('cache_'):
+                cache_name = key[len('cache_'):]
+                cache = data[key]
+                if 'cacherows_' + cache_name in data:
+                    cache = SparseMatrix((learner.num_states, learner.num_actions),
+                                         data['cachefill_' + cache_name],
+                                         dtype=cache.dtype)
+                    cache[data['cacherows_' + cache_name]] = data[key]
+                learner._action_param[cache_name] = cache
+    learner._action_param.update(params['scalars'])
+
+    for key in PARAMS:
+        setattr(learner, key, params[key])
+    if np.isfinite(learner.depth):
+        learner.depth = int(learner.depth)
+    learner._policy_stale = params['policy_stale']
+    learner.random.set_state(('MT19937', data['rng_keys'], int(data['rng_pos'][0]),
+                              int(data['rng_pos'][1]), float(data['rng_gauss'])))
+    learner.uniforms.set_state(data['rng_buffer'])
+    if hasattr(learner, '_dirty'):
+        learner._dirty = set(data['dirty'].tolist())
+    learner._checkpoint = os.path.abspath(fname)
+    if name == 'qmatrix':
+        learner._unsaved = set()
+        learner._unsaved_all = False
@@ -0,0 +1,309 @@
+"""
+This module defines feature maps for linear function approximation by FLearner
+and SLearner (see the features argument of FLearner):
+
+    Value(state, action) = features(state)[action] . weights
+
+A feature map is called with an array of state vectors [... x variables] and
+returns the features of every action from each state [... x actions x dim].
+Actions are the vectors of an actionconverter (FlagGenerator), in order.
+State and action variables are scaled to [0, 1] over the range of their
+FlagGenerator.
+
+* Polynomial: all products of state and action variables up to a degree.
+* RBF: Gaussian radial basis functions centered on a grid over state
+    variables, with a separate set of weights for each action.
+* TileCoding: overlapping grids (tilings) over state variables where each
+    state activates one tile per tiling, with a separate set of weights for
+    each action.
+* Linear: features of a per state/action function dfunc(state, action,
+    weights) which does not depend on weights, i.e. an approximation with
+    func(state, action, weights) = dfunc(state, action, weights) . weights.
+
+RBF and TileCoding are sparse: only a few of the features of a state/action
+are non-zero. Sparse maps (sparse = True) also provide active(states) which
+returns the indices and values of the non-zero features, each of shape
+[... x actions x k]. Learners then compute values from, and update, only the
+weights of active features instead of all of them.
+
+Features are either a dense array or a tuple of (indices, values) arrays of
+active features. The functions dot(), add(), take() and concatenate() operate
+on both.
+"""
+
+from itertools import combinations_with_replacement
+import numpy as np
+
+
+class FeatureMap:
+    """
+    Base class of feature maps over state and action vectors.
+
+    Args:
+        stateconverter (FlagGenerator): Generator of state vectors.
+        actionconverter (FlagGenerator): Generator of action vectors.
+
+    Instance Attributes:
+        dim (int): Number of features (funcdim of the learner).
+        sparse (bool): Whether active() returns fewer than dim features.
+        avecs (ndarray): [actions x variables] array of action vectors.
+    """
+
+    sparse = False
+
+    def __init__(self, stateconverter, actionconverter):
+        self.avecs = np.array([avec for avec in actionconverter], dtype=float)
+        self.num_actions = len(self.avecs)
+        self._slow, self._srange = _ranges(stateconverter)
+        self._alow, self._arange = _ranges(actionconverter)
+        self.dim = 0
+
+
+    def __call__(self, svecs):
+        """
+        Returns the dense features of all actions [... x actions x dim] for an
+        array of state vectors [... x variables].
+        """
+        indices, values = self.active(svecs)
+        phi = np.zeros(indices.shape[:-1] + (self.dim,))
+        np.put_along_axis(phi, indices, values, axis=-1)
+        return phi
+
+
+    def active(self, svecs):
+        """
+        Returns a tuple of the indices and values of active features of all
+        actions, each [... x actions x k], for an array of state vectors
+        [... x variables].
+        """
+        phi = self(svecs)
+        indices = np.broadcast_to(np.arange(self.dim), phi.shape)
+        return indices, phi
+
+
+    def _scale_states(self, svecs):
+        return (np.asarray(svecs, dtype=float) - self._slow) / self._srange
+
+
+
+class Polynomial(FeatureMap):
+    """
+    Products of state and action variables up to a degree, including a
+    constant (bias) term. For e.g. with variables x, y and degree 2:
+
+        1, x, y, x^2, x*y, y^2
+
+    Args:
+        stateconverter/actionconverter: See FeatureMap.
+        degree (int): Largest degree of products. Default 2.
+    """
+
+    def __init__(self, stateconverter, actionconverter, degree=2):
+        super().__init__(stateconverter, actionconverter)
+        self.degree = degree
+        nvars = len(self._slow) + len(self._alow)
+        powers = [np.zeros(nvars, dtype=int)]
+        for deg in range(1, degree + 1):
+            for combination in combinations_with_replacement(range(nvars), deg):
+                powers.append(np.bincount(combination, minlength=nvars))
+        self.powers = np.array(powers)      # [dim x variables] exponents
+        self.dim = len(self.powers)
+        self._ascaled = (self.avecs - self._alow) / self._arange
+
+
+    def __call__(self, svecs):
+        svecs = self._scale_states(svecs)
+        shape = svecs.shape[:-1] + (self.num_actions, svecs.shape[-1])
+        joint = np.concatenate((np.broadcast_to(svecs[..., None, :], shape),
+                                np.broadcast_to(self._ascaled, shape[:-1] \
+                                + self._ascaled.shape[-1:])), axis=-1)
+        return np.prod(joint[..., None, :] ** self.powers, axis=-1)
+
+
+
+class RBF(FeatureMap):
+    """
+    Gaussian radial basis functions over state variables. Centers are on a
+    grid with a number of centers along each state variable. Each action has
+    its own block of features, so k = number of centers features are active.
+
+        feature = exp(-|state - center|^2 / (2 * width^2))
+
+    Args:
+        stateconverter/actionconverter: See FeatureMap.
+        centers (int/tuple): Number of centers along each state variable (or
+            a number for all variables). Default 3.
+        width (float): Width of the basis functions in scaled [0, 1] units.
+            Defaults to the spacing between centers.
+    """
+
+    sparse = True
+
+    def __init__(self, stateconverter, actionconverter, centers=3, width=None):
+        super().__init__(stateconverter, actionconverter)
+        nvars = len(self._slow)
+        centers = (centers,) * nvars if isinstance(centers, int) else tuple(centers)
+        grids = np.meshgrid(*[np.linspace(0, 1, c) for c in centers], indexing='ij')
+        self.centers = np.stack([g.ravel() for g in grids], axis=-1)
+        self.width = 1. / max(max(centers) - 1, 1) if width is None else width
+        self.dim = len(self.centers) * self.num_actions
+        self._blocks = (np.arange(self.num_actions) * len(self.centers))[:, None] \
+                       + np.arange(len(self.centers))
+
+
+    def active(self, svecs):
+        svecs = self._scale_states(svecs)
+        dists = np.sum((svecs[..., None, :] - self.centers) ** 2, axis=-1)
+        values = np.exp(-dists / (2 * self.width ** 2))
+        shape = values.shape[:-1] + self._blocks.shape
+        return (np.broadcast_to(self._blocks, shape),
+                np.broadcast_to(values[..., None, :], shape))
+
+
+
+class TileCoding(FeatureMap):
+    """
+    Tile coding over state variables. Each tiling is a grid of tiles along
+    each state variable, displaced from the others by a fraction of a tile
+    (asymmetrically, by odd multiples along each variable). A state activates
+    one tile (feature of value 1) in each tiling. Each action has its own
+    block of features, so k = tilings features are active.
+
+    Since as many features are active as there are tilings, the learning rate
+    is usually divided by the number of tilings.
+
+    Args:
+        stateconverter/actionconverter: See FeatureMap.
+        tilings (int): Number of tilings. Default 8.
+        tiles (int/tuple): Number of tiles along each state variable (or a
+            number for all variables). Default 4.
+    """
+
+    sparse = True
+
+    def __init__(self, stateconverter, actionconverter, tilings=8, tiles=4):
+        super().__init__(stateconverter, actionconverter)
+        nvars = len(self._slow)
+        tiles = (tiles,) * nvars if isinstance(tiles, int) else tuple(tiles)
+        self.tilings = tilings
+        self.tiles = np.array(tiles)
+        # each tiling has one more tile along each variable to cover offsets
+        self._shape = tuple(self.tiles + 1)
+        self._size = int(np.prod(self._shape))
+        odd = 2 * np.arange(nvars) + 1
+        self.offsets = (np.arange(tilings)[:, None] * odd % tilings) / tilings
+        self.dim = self._size * tilings * self.num_actions
+        self._bases = (np.arange(self.num_actions) * self._size * tilings)[:, None] \
+                      + np.arange(tilings) * self._size
+
+
+    def active(self, svecs):
+        svecs = np.clip(self._scale_states(svecs), 0, 1)
+        coords = np.floor(svecs[..., None, :] * self.tiles + self.offsets).astype(int)
+        cells = np.ravel_multi_index(tuple(np.moveaxis(coords, -1, 0)), self._shape)
+        indices = cells[..., None, :] + self._bases
+        return indices, np.ones(indices.shape)
+
+
+
+class Linear(FeatureMap):
+    """
+    Features of a function of a single state and action vector. Declares an
+    approximation with func = dfunc . weights to be linear so learners compute
+    the features of a state once and use them for both values and gradients.
+    Variables are passed to dfunc unscaled.
+
+    Args:
+        stateconverter/actionconverter: See FeatureMap.
+        dfunc (func): Takes a state vector, action vector and weights (None)
+            and returns the features of the pair (ndarray). Must not depend on
+            weights.
+    """
+
+    def __init__(self, stateconverter, actionconverter, dfunc):
+        super().__init__(stateconverter, actionconverter)
+        self.dfunc = dfunc
+        self.dim = len(dfunc(stateconverter.decode(0), self.avecs[0], None))
+
+
+    def __call__(self, svecs):
+        svecs = np.asarray(svecs, dtype=float)
+        flat = svecs.reshape(-1, svecs.shape[-1])
+        phi = np.array([[self.dfunc(s, a, None) for a in self.avecs] for s in flat],
+                       dtype=float)
+        return phi.reshape(svecs.shape[:-1] + (self.num_actions, self.dim))
+
+
+
+def dot(phi, weights):
+    """
+    Returns the values (phi . weights) of dense or sparse features over the
+    last axis.
+    """
+    if isinstance(phi, tuple):
+        indices, values = phi
+        return np.sum(weights[indices] * values, axis=-1)
+    return np.dot(phi, weights)
+
+
+def add(weights, phi, scale):
+    """
+    Adds scale * phi to weights in place and returns the largest absolute
+    change. phi are the features of a single state/action and scale a number,
+    or phi are [pairs x ...] features and scale an array of [pairs].
+    """
+    scale = np.asarray(scale, dtype=float)
+    if isinstance(phi, tuple):
+        indices, values = phi
+        if scale.ndim == 0:
+            delta = scale * values
+            weights[indices] += delta
+            return float(np.max(np.abs(delta))) if delta.size else 0.
+        delta = np.zeros(len(weights))
+        np.add.at(delta, indices, scale[:, None] * values)
+    elif scale.ndim == 0:
+        delta = scale * phi
+    else:
+        delta = np.dot(scale, phi)
+    weights += delta
+    return float(np.max(np.abs(delta))) if delta.size else 0.
+
+
+def take(phi, actions):
+    """
+    Returns the features of the given actions. phi are the [actions x ...]
+    features of a state and actions an index, or phi are [states x actions x
+    ...] features and actions an array of [states] indices.
+    """
+    if isinstance(phi, tuple):
+        return tuple(take(p, actions) for p in phi)
+    if np.ndim(actions) == 0:
+        return phi[actions]
+    return phi[np.arange(len(phi)), actions]
+
+
+def index(phi, key):
+    """
+    Returns phi[key] of dense or sparse features.
+    """
+    if isinstance(phi, tuple):
+        return tuple(p[key] for p in phi)
+    return phi[key]
+
+
+def concatenate(parts):
+    """
+    Concatenates a list of dense or sparse features along the first axis.
+    """
+    if isinstance(parts[0], tuple):
+        return tuple(np.concatenate(p) for p in zip(*parts))
+    return np.concatenate(parts)
+
+
+def _ranges(converter):
+    """
+    Returns the lowest values and ranges of variables of a FlagGenerator.
+    """
+    low = np.asarray(converter.bottom, dtype=float)
+    span = (np.asarray(converter.flags) - 1) * np.asarray(converter.scale, dtype=float)
+    return low, np.where(span > 0, span, 1.)
@@ -24,6 +24,30 @@ sensitive to the learning rate:
 
     weights[t+1] = -lrate * error * df/d weights[t]
 
+If the approximation is linear in weights, it can instead be given as a
+vectorized function of features of all actions from states:
+
+    features(state vectors [... x variables]) -> [... x actions x funcdim]
+
+So the values of all actions from a state are a single matrix-vector product
+with weights, and the values over a batch of states are one tensor product.
+The gradient with respect to weights is the feature vector of the action.
+An approximation with func = dfunc . weights, where dfunc does not depend on
+weights, is declared linear by passing func=None (see features.Linear). The
+features of the last RECENT states are memoized, so the features of a state
+are computed once in a learning step and used for both values and gradients.
+
+Decoding state numbers into vectors is slow, so decoded vectors of all states
+are precomputed into a table if it fits in TABLE_SIZE elements. Otherwise the
+last CACHE_SIZE decoded states are memoized. Similarly, for approximations
+linear in weights (features, or func = dfunc . weights where dfunc does not
+depend on weights), the feature vectors of states can be cached (see cache
+argument). They are computed the first time a state is visited.
+
+For approximations linear in weights, the weights can instead be solved for by
+least squares from a batch of transitions, e.g. stored in a ReplayBuffer while
+learning (see solve() and algorithms.lstdq).
+
 The learned weights are then used to generate a policy:
 
     Policy(action | state) = max over a(Value(state, a) | a => all possible actions)
@@ -47,24 +71,45 @@ All learners expose the following interface:
     what leads to that utility.
 * qvalue(state, action) which returns value of a state-action pair, or an array
     of values of all actions from a state if action is not specified.
+* value_many(states), qvalue_many(states, actions), recommend_many(states)
+    which are the vectorized value(), qvalue() and recommend() over arrays of
+    states.
 * learn(episodes, actions, **kwargs) which runs over multiple episodes to populate
     a utility function or matrix.
 * recommend(state, **kwargs) which recommends an action based on the learned values
     depending on the exploration vs. exploitation setting of the learner.
 * reset() which returns the value function/matrix to its initial state while
     keeping any learning parameters provided at instantiation.
+* checkpoint(fname) and restore(fname) which save and load the learning state.
+* replay(batch_size) which learns from transitions stored in a ReplayBuffer.
+* solve(method) which solves for weights from a batch of transitions by
+    least squares (LSTD-Q/LSPI).
+* set_profiling(enable) which records calls and time of each phase of learning.
 """
 
 
+from functools import lru_cache
 import numpy as np
 try:
+    import features
+    from features import Linear
     from qlearner import QLearner
+    from algorithms import lstdq, lspi
     from linsim import FlagGenerator
 except ImportError:
+    from . import features
+    from .features import Linear
     from .qlearner import QLearner
+    from .algorithms import lstdq, lspi
     from .linsim import FlagGenerator
 
 
+CHUNK = 4096        # number of states passed to features() at a time
+TABLE_SIZE = 2**22  # most elements in a precomputed state/feature table
+CACHE_SIZE = 2**16  # most states memoized if a table does not fit
+RECENT = 8          # number of recent states whose features are memoized
+
+
 
 class FLearner(QLearner):
     """
@@ -86,7 +131,8 @@ class FLearner(QLearner):
                 float = func(state_vec, action_vec, weights_vec)
             Where [state|action_weights]_vec are arrays. The returned array
             can be of any length, where each element is a combination of the
-            state/action variables.
+            state/action variables. If None (and features is None), func is
+            dfunc . weights and the approximation is linear.
         dfunc (func): The derivative of func with respect to weights. Same
             input signature as func. Returns 'funcdim` elements in returned array.
         funcdim (int): The dimension of the weights to learn. Defaults to
@@ -111,11 +157,28 @@ class FLearner(QLearner):
             calculate next estimate of value of state, action pair. Default=1.
         seed (int): A seed for all random number generation in instance. Default
             is None.
+        dtype (type): Numeric type of weights e.g. np.float32. Default float.
+        memory (ReplayBuffer): A buffer where transitions taken during learning
+            are stored for replay(). Default None (transitions not stored).
+        trace (float): Decay (lambda) of eligibility traces in [0, 1] for
+            learn(algorithm='treebackup'). Default 0.8.
+        features (func): A vectorized approximation linear in weights which
+            is used instead of func/dfunc (which can then be None). Takes an
+            array of state vectors [... x variables] and returns the features
+            of every action (in actionconverter order) as an array of
+            [... x actions x funcdim]. Default None. A FeatureMap (see
+            features module) with sparse = True also provides active() and
+            only the weights of active features are used and updated.
+        cache (bool): Whether to cache the feature vectors of each state. Only
+            for approximations linear in weights: features, or func equal to
+            dfunc . weights where dfunc does not depend on weights. Values and
+            gradients are then computed from cached features. Default False.
 
     Instance Attributes:
         goal (func): Takes a state number (int) and returns bool whether it is
             a goal state or not.
-        mode/policy/lrate/discount/rmatrix/tmatrix: Same as args.
+        mode/policy/lrate/discount/rmatrix/tmatrix/dtype/memory/trace/features/
+            cache: Same as args.
         random (np.random.RandomState): A random number generator local to this
             instance.
         weights (ndarray): The coefficients of the function provided.
@@ -124,16 +187,23 @@ class FLearner(QLearner):
     def __init__(self, rmatrix, stateconverter, actionconverter, goal, func,
                  funcdim, dfunc, tmatrix=None, lrate=0.25, discount=1, 
                  policy='uniform', mode='offline', depth=None,
-                 steps=1, seed=None, stepsize=lambda x: 1, **kwargs):
+                 steps=1, seed=None, stepsize=lambda x: 1, dtype=float,
+                 memory=None, trace=0.8, features=None, cache=False, **kwargs):
+        if func is None and features is None:
+            features = Linear(stateconverter, actionconverter, dfunc)
+        self.features = features
         super().__init__(rmatrix, goal, tmatrix, lrate, discount,
-                         policy, mode, depth, steps, seed, **kwargs)
+                         policy, mode, depth, steps, seed, dtype=dtype,
+                         memory=memory, trace=trace, **kwargs)
         self.stateconverter = stateconverter
         self.actionconverter = actionconverter
         self.funcdim = funcdim
-        self.func = func
-        self.dfunc = dfunc
-        self.weights = np.ones(self.funcdim)
+        self.func = self._features_func if func is None else func
+        self.dfunc = self._features_dfunc if dfunc is None else dfunc
+        self.weights = np.ones(self.funcdim, dtype=self.dtype)
         self._avecs = [avec for avec in self.actionconverter]
+        self.cache = cache
+        self._create_tables()
 
 
     def value(self, state):
@@ -150,12 +220,16 @@ class FLearner(QLearner):
             next most rewarding action.
         """
         if isinstance(state, (list, tuple, np.ndarray)):
-            vals = [self.func(state, a, self.weights)\
-                    for a in self._avecs]
+            if self.features is not None:
+                vals = features.dot(self._features_of(np.asarray(state, dtype=float)),
+                                    self.weights)
+            else:
+                vals = [self.func(state, a, self.weights) for a in self._avecs]
+        elif self._linear:
+            vals = features.dot(self._phi(state), self.weights)
         else:
-            state_ = self.stateconverter.decode(state)
-            vals = [self.func(state_, a, self.weights)\
-                    for a in self._avecs]
+            svec = self._decode(state)
+            vals = [self.func(svec, a, self.weights) for a in self._avecs]
         action = np.argmax(vals)
         return (vals[action], action)
 
@@ -172,7 +246,12 @@ class FLearner(QLearner):
             The qvalue of state,action if action is specified. Else returns the
             qvalues of all actions from a state (array).
         """
-        svec = self.stateconverter.decode(state)
+        if self._linear:
+            phi = self._phi(state)
+            if action is not None:
+                return features.dot(features.take(phi, action), self.weights)
+            return features.dot(phi, self.weights)
+        svec = self._decode(state)
         if action is not None:
             avec = self.actionconverter.decode(action)
             return self.func(svec, avec, self.weights)
@@ -181,23 +260,343 @@ class FLearner(QLearner):
                     for a in self._avecs])
 
 
+    def qvalue_many(self, states, actions=None):
+        """
+        The q-values of a sequence of states (and actions). States are
+        decoded into vectors together. The function approximation is then
+        evaluated for each state/action vector. With features, the values
+        of chunks of states are computed by one tensor product each.
+
+        Args:
+            states (list/ndarray): Indices of states in [r|q]matrix. OR a
+                [states x variables] array of state vectors.
+            actions (list/ndarray): Indices of actions to be taken from each
+                state. OR a [states x variables] array of action vectors.
+
+        Returns:
+            An array of the qvalues of each state,action pair if actions are
+            specified. Else a [states x actions] array of qvalues of all actions
+            from each state.
+        """
+        if self.features is not None or (self.cache and np.ndim(states) == 1):
+            aind = None if actions is None else self._action_indices(actions)
+            return features.dot(self._phi_many(states, aind), self.weights)
+        svecs = self._state_vectors(states)
+        if actions is not None:
+            avecs = self._action_vectors(actions)
+            return np.array([self.func(s, a, self.weights) \
+                             for s, a in zip(svecs, avecs)])
+        else:
+            return np.array([[self.func(s, a, self.weights) for a in self._avecs] \
+                             for s in svecs]).reshape(len(svecs), len(self._avecs))
+
+
     def update(self, state, action, error):
         """
         Updates weights given state, action, and error in current and next
-        value estimate.
+        value estimate. With sparse features, only the weights of active
+        features are changed.
 
         Args:
             state (int): State number.
             action (int): Action number.
             error (float): Error term (current value - next estimate)
         """
-        svec = self.stateconverter.decode(state)
-        avec = self._avecs[action]
-        self.weights -= self.lrate * error * self.dfunc(svec, avec, self.weights)
+        if self._linear:
+            change = features.add(self.weights,
+                                  features.take(self._phi(state), action),
+                                  -self.lrate * error)
+        else:
+            delta = self.lrate * error \
+                    * self.dfunc(self._decode(state), self._avecs[action], self.weights)
+            self.weights -= delta
+            change = np.max(np.abs(delta))
+        if self._deltas is not None:
+            self._deltas.append(change)
+
+
+    def update_many(self, states, actions, errors):
+        """
+        Vectorized update(). The gradients of all pairs are computed with the
+        current weights and the weights are changed once by their sum weighted
+        by the errors.
+
+        Args:
+            states (ndarray): State indices. Or a [states x variables] array of
+                state vectors.
+            actions (ndarray): Action indices. Or a [states x variables] array
+                of action vectors.
+            errors (ndarray): Error terms (current value - new estimate)
+        """
+        if self.features is not None or (self.cache and np.ndim(states) == 1):
+            phi = self._phi_many(states, self._action_indices(actions))
+            change = features.add(self.weights, phi,
+                                  -self.lrate * np.asarray(errors, dtype=float))
+        else:
+            svecs = self._state_vectors(states)
+            avecs = self._action_vectors(actions)
+            grads = np.array([self.dfunc(s, a, self.weights) \
+                              for s, a in zip(svecs, avecs)])
+            delta = self.lrate * np.dot(errors, grads)
+            self.weights -= delta
+            change = np.max(np.abs(delta))
+        if self._deltas is not None:
+            self._deltas.append(change)
 
 
     def reset(self):
         """
         Resets weights to initial values.
         """
-        self.weights = np.ones(self.funcdim)
+        self.weights = np.ones(self.funcdim, dtype=self.dtype)
+
+
+    def solve(self, method='lspi', tolerance=1e-6, iterations=20,
+              transitions=None, regularization=1e-6):
+        """
+        Solves for weights by least squares from a batch of transitions
+        instead of a gradient step per transition. Only for approximations
+        linear in weights. See algorithms.lstdq.
+
+        Args:
+            method (str): 'lstdq' to evaluate the greedy policy of the current
+                weights once, or 'lspi' to iterate until the policy is stable.
+                Default 'lspi'.
+            tolerance (float): Largest change in a weight at convergence of
+                LSPI. Default 1e-6.
+            iterations (int): Maximum number of policies evaluated by LSPI.
+                Default 20.
+            transitions (tuple): A tuple of (states, actions, rewards, next
+                states, terminals) arrays. Defaults to all transitions in
+                self.memory, e.g. stored while learning.
+            regularization (float): Added to the diagonal of the least squares
+                matrix. Default 1e-6.
+
+        Returns:
+            The number of policies evaluated.
+        """
+        if not self._linear:
+            raise TypeError('Solving requires an approximation linear in weights.')
+        if transitions is None:
+            if self.memory is None or len(self.memory) == 0:
+                raise ValueError('No transitions. Provide a ReplayBuffer or transitions.')
+            size = len(self.memory)
+            transitions = (self.memory.states[:size], self.memory.actions[:size],
+                           self.memory.rewards[:size], self.memory.nstates[:size],
+                           self.memory.terminals[:size])
+        states, actions, rewards, nstates, terminals = \
+            [np.asarray(t) for t in transitions]
+        rewards = rewards.astype(float)
+        terminals = terminals.astype(bool)
+        if method == 'lstdq':
+            return lstdq(self, states, actions, rewards, nstates, terminals,
+                         regularization=regularization)
+        elif method == 'lspi':
+            return lspi(self, states, actions, rewards, nstates, terminals,
+                        tolerance=tolerance, iterations=iterations,
+                        regularization=regularization)
+        raise ValueError('Method must be "lstdq" or "lspi".')
+
+
+    def _state_vectors(self, states):
+        """
+        Returns a [states x variables] array of state vectors given an array
+        of state indices or of state vectors.
+        """
+        states = np.asarray(states)
+        if states.ndim > 1:
+            return states
+        if self._svecs is not None:
+            return self._svecs[states]
+        return self.stateconverter.decode_many(states)
+
+
+    def _action_vectors(self, actions):
+        """
+        Returns a [actions x variables] array of action vectors given an array
+        of action indices or of action vectors.
+        """
+        actions = np.asarray(actions)
+        if actions.ndim > 1:
+            return actions
+        return np.asarray(self._avecs)[actions]
+
+
+    def _create_tables(self):
+        """
+        Creates the table (or memoized function) of decoded state vectors and,
+        if cache is set, the table (or memoized function) of state features.
+        Must be called again if the stateconverter or features change.
+        """
+        nvars = len(self.stateconverter.flags)
+        if self.num_states * nvars <= TABLE_SIZE:
+            self._svecs = self.stateconverter.decode_many(np.arange(self.num_states))
+            self._svecs.setflags(write=False)
+            self._decode = self._svecs.__getitem__
+        else:
+            self._svecs = None
+            self._decode = lru_cache(maxsize=CACHE_SIZE)(self._decode_readonly)
+        self._linear = self.features is not None or self.cache
+        self._sparse = getattr(self.features, 'sparse', False)
+        self._ftable = None         # [states x actions x ...] cached features
+        self._fknown = None         # whether features of a state are in table
+        self._fcache = None         # memoized features if table does not fit
+        self._recent = None         # memoized features of recent states
+        if self.features is not None and not self.cache:
+            self._recent = lru_cache(maxsize=RECENT)(self._features_readonly)
+        if self.cache and self.num_states * self.num_actions <= TABLE_SIZE:
+            self._fknown = np.zeros(self.num_states, dtype=bool)
+        elif self.cache:
+            self._fcache = lru_cache(maxsize=CACHE_SIZE)(self._features_readonly)
+
+
+    def _decode_readonly(self, state):
+        svec = self.stateconverter.decode(state)
+        svec.setflags(write=False)
+        return svec
+
+
+    def _features_readonly(self, state):
+        phi = features.index(self._compute_features(self._decode(state)[None]), 0)
+        for part in (phi if isinstance(phi, tuple) else (phi,)):
+            part.setflags(write=False)
+        return phi
+
+
+    def _features_of(self, svecs):
+        """
+        Returns the features of all actions from state vectors: active
+        (indices, values) if features are sparse, else dense.
+        """
+        if self._sparse:
+            return self.features.active(svecs)
+        return self.features(svecs)
+
+
+    def _compute_features(self, svecs):
+        """
+        Returns the [states x actions x ...] features of an array of state
+        vectors from features or dfunc.
+        """
+        if self.features is not None:
+            return self._features_many(svecs)
+        return np.array([[self.dfunc(s, a, self.weights) for a in self._avecs] \
+                         for s in svecs]).reshape(len(svecs), self.num_actions, -1)
+
+
+    def _phi(self, state):
+        """
+        Returns the [actions x ...] features of a state index (cached if cache
+        is set, else memoized for RECENT states).
+        """
+        if not self.cache:
+            return self._recent(state)
+        if self._fknown is None:
+            return self._fcache(state)
+        if not self._fknown[state]:
+            self._store([state], self._compute_features(self._decode(state)[None]))
+            return self._phi(state)
+        return features.index(self._ftable, state)
+
+
+    def _phi_many(self, states, actions=None):
+        """
+        Returns the features of an array of state indices or of a [states x
+        variables] array of state vectors. Either of all actions [states x
+        actions x ...], or of the given action indices [states x ...].
+        """
+        if not self.cache or np.ndim(states) > 1:
+            return self._features_many(self._state_vectors(states), actions)
+        states = np.asarray(states, dtype=int)
+        if self._fknown is not None:
+            new = np.unique(states[~self._fknown[states]])
+            if len(new) > 0:
+                self._store(new, self._compute_features(self._state_vectors(new)))
+        if self._fknown is not None:
+            phi = features.index(self._ftable, states)
+        elif len(states) > 0:
+            phi = features.concatenate([features.index(self._fcache(s), None) \
+                                        for s in states.tolist()])
+        else:
+            return self._features_many(self._state_vectors(states), actions)
+        return phi if actions is None else features.take(phi, actions)
+
+
+    def _store(self, states, phi):
+        """
+        Stores features of state indices in the table. The table is created
+        when the first features are stored. If it would not fit in TABLE_SIZE
+        elements, features are memoized instead.
+        """
+        parts = phi if isinstance(phi, tuple) else (phi,)
+        if self._ftable is None:
+            size = sum(self.num_states * np.prod(p.shape[1:]) for p in parts)
+            if size > TABLE_SIZE:
+                self._fknown = None
+                self._fcache = lru_cache(maxsize=CACHE_SIZE)(self._features_readonly)
+                return
+            tables = tuple(np.zeros((self.num_states,) + p.shape[1:], dtype=p.dtype) \
+                           for p in parts)
+            self._ftable = tables if isinstance(phi, tuple) else tables[0]
+        for table, part in zip(self._ftable if isinstance(phi, tuple) \
+                               else (self._ftable,), parts):
+            table[states] = part
+        self._fknown[states] = True
+
+
+    def _action_indices(self, actions):
+        """
+        Returns an array of action indices given an array of action indices
+        or a [actions x variables] array of action vectors.
+        """
+        actions = np.asarray(actions)
+        if actions.ndim > 1:
+            return self.actionconverter.encode_many(actions)
+        return actions.astype(int)
+
+
+    def _features_many(self, svecs, actions=None):
+        """
+        Returns the features of all actions from an array of state vectors
+        [states x actions x ...], or of the given action indices
+        [states x ...]. States are passed to features() in chunks to limit
+        memory used.
+        """
+        svecs = np.asarray(svecs, dtype=float)
+        parts = []
+        for i in range(0, len(svecs), CHUNK):
+            phi = self._features_of(svecs[i:i+CHUNK])
+            if actions is not None:
+                phi = features.take(phi, actions[i:i+CHUNK])
+            parts.append(phi)
+        if len(parts) == 0:
+            shape = (0, self.funcdim) if actions is not None else \
+                    (0, self.num_actions, self.funcdim)
+            return np.zeros(shape)
+        return features.concatenate(parts)
+
+
+    def _features_func(self, svec, avec, weights):
+        """
+        func() of the features approximation.
+        """
+        phi = self._features_of(np.asarray(svec, dtype=float))
+        return features.dot(features.take(phi, self._action_indices([avec])[0]),
+                            weights)
+
+
+    def _features_dfunc(self, svec, avec, weights):
+        """
+        dfunc() of the features approximation.
+        """
+        return self.features(np.asarray(svec, dtype=float))[
+            self._action_indices([avec])[0]]
+
+
+    def _update_policy(self):
+        """
+        Updates OFFLINE [SOFTMAX | GREEDY] policy. Since any change in weights
+        changes the values of all states, the whole policy is updated.
+        """
+        self._policy_stale = True
+        super()._update_policy()
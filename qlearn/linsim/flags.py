@@ -114,6 +114,41 @@ class FlagGenerator:
         return int(state)
 
 
+    def decode_many(self, states):
+        """
+        Vectorized decode() for an array of state numbers.
+
+        Args:
+            states (list/ndarray): State numbers in basis 10.
+
+        Returns:
+            A [states x flags] numpy float array where each row is the decoded
+            state.
+        """
+        states = np.asarray(states, dtype=int)
+        if np.any(states >= self.num_states) or np.any(states < 0):
+            raise ValueError('State numbers exceed possible states.')
+        flags = np.stack(np.unravel_index(states, self.flags), axis=-1)
+        return flags * self.scale + self.bottom
+
+
+    def encode_many(self, flags):
+        """
+        Vectorized encode() for an array of flag combinations.
+
+        Args:
+            flags (list/ndarray): A [states x flags] array where each row
+                contains flag values in the same order as provided at
+                instantiation.
+
+        Returns:
+            An integer array of state numbers in basis 10.
+        """
+        flags = np.asarray(flags, dtype=float)
+        flags = np.round((flags - self.bottom) / self.scale).astype(int)
+        return np.ravel_multi_index(tuple(np.moveaxis(flags, -1, 0)), self.flags)
+
+
     @staticmethod
     def convert_basis(current, to, num):
         """
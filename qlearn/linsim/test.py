@@ -86,6 +86,14 @@ def test_flag_generator():
     assert np.array_equal(gen3.decode(1), [-4.55]), 'Decoding failed.'
     assert gen3.encode(*gen3.decode(1)) == 1, 'Encoding decoding mismatch.'
 
+    # Test 4: Vectorized encoding and decoding
+    for g in (gen, gen2, gen3):
+        vecs = g.decode_many(np.arange(g.num_states))
+        assert np.allclose(vecs, [g.decode(i) for i in range(g.num_states)]), \
+            'Vectorized decoding failed.'
+        assert np.array_equal(g.encode_many(vecs), np.arange(g.num_states)), \
+            'Vectorized encoding decoding mismatch.'
+
 
 @test
 def test_node_class():
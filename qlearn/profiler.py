@@ -0,0 +1,180 @@
+"""
+This module defines the Profiler class which records where learning time is
+spent. The phases of a learning step (next_state, reward, qvalue, a_probs,
+update, next_action) are methods of the learner. When a Profiler is attached,
+each phase method is wrapped on the instance by a timer that counts calls and
+accumulates wall time. Detaching removes the wrappers, so a learner that is not
+being profiled runs its methods directly without any overhead.
+
+The vectorized methods used by batched learning (see BATCHED) are timed as
+the same phases. A call of a vectorized method counts as one call.
+
+Phases can call each other (e.g. a_probs calls qvalue). For each phase the
+total time includes nested phases, while self time excludes them. The self
+times of all phases and the untimed remainder add up to the elapsed time.
+
+Totals are kept over all calls, and per-episode entries are added by learn()
+at the end of each episode (or batch of episodes). Records can be exported as
+a dict or as JSON:
+
+    {'phases': {'next_state': {'calls': int, 'time': float, 'self_time': float},
+                ...},
+     'episodes': [{'episodes': int, 'time': float,
+                   'phases': {'next_state': {'calls': int, 'time': float,
+                                             'self_time': float}, ...}}, ...]}
+"""
+
+import json
+from time import perf_counter
+
+
+PHASES = ('next_state', 'reward', 'qvalue', 'a_probs', 'update', 'next_action')
+# Vectorized learner methods of each phase
+BATCHED = {'next_state': 'next_state_many', 'reward': 'reward_many',
+           'qvalue': 'qvalue_many', 'a_probs': '_a_probs_many',
+           'update': 'update_many', 'next_action': '_next_actions'}
+
+
+class Profiler:
+    """
+    Records call counts and wall time of phases of learning.
+
+    Args:
+        phases (tuple): Names of learner methods to time. Default PHASES.
+
+    Instance Attributes:
+        phases: Same as args.
+        calls (dict): Total number of calls of each phase.
+        times (dict): Total wall time (s) of each phase including nested
+            phases.
+        self_times (dict): Total wall time (s) of each phase excluding nested
+            phases.
+        episodes (list): A list of dicts of per-episode records. See module.
+    """
+
+    def __init__(self, phases=PHASES):
+        self.phases = tuple(phases)
+        self.calls = dict.fromkeys(self.phases, 0)
+        self.times = dict.fromkeys(self.phases, 0.)
+        self.self_times = dict.fromkeys(self.phases, 0.)
+        self.episodes = []
+        self._originals = {}        # learner's instance attributes replaced
+        self._stack = []            # time of nested phases of running phases
+        self._last = self._totals() # totals at the end of the last episode
+        self._start = perf_counter()
+
+
+    def clear(self):
+        """
+        Clears all records.
+        """
+        for phase in self.phases:
+            self.calls[phase] = 0
+            self.times[phase] = 0.
+            self.self_times[phase] = 0.
+        self.episodes = []
+        self._last = self._totals()
+        self._start = perf_counter()
+
+
+    def attach(self, learner):
+        """
+        Wraps the phase methods of a learner, and their vectorized versions,
+        in timers.
+
+        Args:
+            learner (QLearner): The learner (or subclass) to profile.
+        """
+        for phase in self.phases:
+            for name in (phase, BATCHED.get(phase)):
+                if name is None or not hasattr(learner, name):
+                    continue
+                self._originals[name] = learner.__dict__.get(name)
+                setattr(learner, name, self._timer(phase, getattr(learner, name)))
+        self._last = self._totals()
+        self._start = perf_counter()
+
+
+    def detach(self, learner):
+        """
+        Restores the phase methods of a learner.
+
+        Args:
+            learner (QLearner): The profiled learner.
+        """
+        for name, original in self._originals.items():
+            if original is None:
+                learner.__dict__.pop(name, None)
+            else:
+                setattr(learner, name, original)
+        self._originals = {}
+
+
+    def end_episode(self, episodes=1):
+        """
+        Adds a record of phases since the last call (or since attaching).
+
+        Args:
+            episodes (int): Number of episodes run since the last call.
+        """
+        now = perf_counter()
+        totals = self._totals()
+        phases = {}
+        for phase in self.phases:
+            phases[phase] = {key: totals[phase][key] - self._last[phase][key] \
+                             for key in totals[phase]}
+        self.episodes.append({'episodes': episodes, 'time': now - self._start,
+                              'phases': phases})
+        self._last = totals
+        self._start = now
+
+
+    def as_dict(self):
+        """
+        Returns the records as a dict of builtin types. See module.
+        """
+        return {'phases': self._totals(),
+                'episodes': [dict(entry) for entry in self.episodes]}
+
+
+    def to_json(self, fname=None):
+        """
+        Returns the records as a JSON string. Writes them to a file if a
+        filepath is given.
+
+        Args:
+            fname (str): Filepath of JSON file. Optional.
+
+        Returns:
+            A JSON string of as_dict().
+        """
+        text = json.dumps(self.as_dict())
+        if fname is not None:
+            with open(fname, 'w') as f:
+                f.write(text)
+        return text
+
+
+    def _totals(self):
+        return {phase: {'calls': self.calls[phase], 'time': self.times[phase],
+                        'self_time': self.self_times[phase]} \
+                for phase in self.phases}
+
+
+    def _timer(self, phase, func):
+        calls, times, self_times, stack = self.calls, self.times, \
+                                          self.self_times, self._stack
+        def timed(*args, **kwargs):
+            stack.append(0.)
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                nested = stack.pop()
+                calls[phase] += 1
+                times[phase] += elapsed
+                self_times[phase] += elapsed - nested
+                if stack:
+                    stack[-1] += elapsed
+        return timed
@@ -32,22 +32,50 @@ All learners expose the following interface:
     what leads to that utility.
 * qvalue(state, action) which returns value of a state-action pair, or an array
     of values of all actions from a state if action is not specified.
+* value_many(states), qvalue_many(states, actions), recommend_many(states)
+    which are the vectorized value(), qvalue() and recommend() over arrays of
+    states. Tabular learners also have next_state_many() and reward_many().
 * learn(episodes, actions, **kwargs) which runs over multiple episodes to populate
     a utility function or matrix.
 * recommend(state, **kwargs) which recommends an action based on the learned values
     depending on the exploration vs. exploitation setting of the learner.
 * reset() which returns the value function/matrix to its initial state while
     keeping any learning parameters provided at instantiation.
+* checkpoint(fname) and restore(fname) which save and load the learning state.
+* replay(batch_size) which learns from transitions stored in a ReplayBuffer.
+* set_profiling(enable) which records calls and time of each phase of learning.
 """
 
 import numpy as np
-from itertools import zip_longest
+from itertools import zip_longest, islice, chain, count
+from multiprocessing import get_context, shared_memory
 try:
     import utils
+    import schedulers
+    import checkpoint
+    from sparse import SparseMatrix
+    from rng import BufferedRandom
+    from profiler import Profiler, PHASES
     from algorithms import variablenstep
+    from algorithms import batchnstep
+    from algorithms import prioritizedsweeping
+    from algorithms import valueiteration, policyiteration
+    from algorithms import ALGORITHMS
 except ImportError:
     from . import utils
+    from . import schedulers
+    from . import checkpoint
+    from .sparse import SparseMatrix
+    from .rng import BufferedRandom
+    from .profiler import Profiler, PHASES
     from .algorithms import variablenstep
+    from .algorithms import batchnstep
+    from .algorithms import prioritizedsweeping
+    from .algorithms import valueiteration, policyiteration
+    from .algorithms import ALGORITHMS
+
+
+CHUNK = 4096        # number of states whose policy caches are computed at a time
 
 
 class QLearner:
@@ -56,15 +84,18 @@ class QLearner:
     learning process.
 
     Args:
-        rmatrix (ndarray/str): The reward matrix of [n states x m actions]. OR
-            filepath to space delimited rmatrix file. Element [n, m] in the
-            matrix represents the reward for taking action m from state n.
+        rmatrix (ndarray/SparseMatrix/str): The reward matrix of [n states x m
+            actions]. OR filepath to space delimited or binary (.npy/.npz)
+            rmatrix file. Binary .npy files are memory-mapped read-only. Element
+            [n, m] in the matrix represents the reward for taking action m from
+            state n.
         goal (list/tuple/set/array/function): Indices of goal states in rmatrix
             OR a function that accepts a state index and returns true if goal.
         tmatrix (ndarray/str): A transition matrix of [n states x m actions], OR
-            filepath to space delimited tmatrix. Where tmatrix[state, action]
-            contains index of next state. If None, then rmatrix must be square
-            of [n states x n states] i.e. no actions but direct state transitions.
+            filepath to space delimited or binary tmatrix. Where
+            tmatrix[state, action] contains index of next state. If None, then
+            rmatrix must be square of [n states x n states] i.e. no actions but
+            direct state transitions.
         lrate (float): Learning rate for q-learning.
         discount (float): Discount factor for q-learning.
         policy (str): The action selection policy. Used durung learning/
@@ -82,17 +113,36 @@ class QLearner:
             forwarded as a 'stepsize' keyword argument to self.next_state. Used
             by SLearner for variable simulation times. Optional. Can be used
             to convey other information to an overridden next_state function.
+            Batched learning calls it with an array of states if it accepts
+            one, else once per state.
         seed (int): A seed for all random number generation in instance. Default
             is None.
+        sparse (bool): Whether to store the qmatrix as a SparseMatrix which only
+            keeps rows of states that have been updated. For state spaces where
+            a dense qmatrix does not fit in memory. OFFLINE policy caches
+            then only keep rows of those states too. Default False.
+        dtype (type): Numeric type of the qmatrix e.g. np.float32 or np.float16
+            to reduce memory use. Default float (64 bit).
+        memory (ReplayBuffer): A buffer where transitions taken during learning
+            are stored for replay(). Default None (transitions not stored).
+        trace (float): Decay (lambda) of eligibility traces in [0, 1] for
+            learn(algorithm='treebackup'). Default 0.8.
 
     Instance Attributes:
         goal (func): Takes a state number (int) and returns bool whether it is
-            a goal state or not.
-        mode/policy/lrate/discount/rmatrix/tmatrix: Same as args.
+            a goal state or not. See goal_many() for arrays of states.
+        mode/policy/lrate/discount/rmatrix/tmatrix/sparse/dtype/memory/trace:
+            Same as args.
         random (np.random.RandomState): A random number generator local to this
             instance.
-        qmatrix (ndarray): A matrix of the same shape as rmatrix where the [i, j]
-            element is the value of taking action j from state i.
+        uniforms (BufferedRandom): Single random numbers drawn in blocks from
+            random. Used by action selection policies.
+        qmatrix (ndarray/SparseMatrix): A matrix of the same shape as rmatrix
+            where the [i, j] element is the value of taking action j from state i.
+        metrics (list): A list of dicts of metrics for each episode of the last
+            call to learn() with metrics or converge set. See learn().
+        profiler (Profiler): Records calls and time of learning phases per
+            episode if profiling is enabled. See set_profiling(). Else None.
     """
 
     UNIFORM = 'uniform'
@@ -104,16 +154,19 @@ class QLearner:
 
     def __init__(self, rmatrix, goal, tmatrix=None, lrate=0.25, discount=1,
                  policy='uniform', mode='offline', depth=None,
-                 steps=1, seed=None, stepsize=lambda x:1, **kwargs):
+                 steps=1, seed=None, stepsize=lambda x:1, sparse=False,
+                 dtype=float, memory=None, trace=0.8, **kwargs):
         if seed is None:
             self.random = np.random.RandomState()
         else:
             self.random = np.random.RandomState(seed)
+        self.uniforms = BufferedRandom(self.random)
 
         self.qmatrix = None
         self.tmatrix = None
         self.rmatrix = None
-        self._goals = set()
+        self._goals = set()         # goal state indices
+        self._goal_mask = None      # goal states as a boolean array over states
         self._policy = None
 
         self.depth = depth  # set later in set_rq_matrix() if None
@@ -121,7 +174,20 @@ class QLearner:
         self.lrate = lrate
         self.discount = discount
         self.stepsize = stepsize
+        self.sparse = sparse
+        self.dtype = np.dtype(dtype)
+        self.memory = memory
+        self.trace = trace
         self._action_param = {}     # helper parameter for GREEDY/SOFTMAX policies
+        self._dirty = set()         # states updated since last _update_policy()
+        self._track_dirty = False   # whether updates are added to _dirty
+        self._policy_stale = True   # whether all OFFLINE policy rows need update
+        self._unsaved = set()       # rows changed since last checkpoint(), if not _unsaved_all
+        self._unsaved_all = True    # whether all states changed since last checkpoint()
+        self._checkpoint = None     # filepath of last checkpoint
+        self._deltas = None         # sizes of updates when recording metrics
+        self.metrics = []           # per-episode metrics of last learn()
+        self.profiler = None        # records time of learning phases if set
 
         self._avecs = []            # for subclasses using action vectors
 
@@ -149,6 +215,27 @@ class QLearner:
         """Returns number of possible actions"""
         return self.rmatrix.shape[1]
 
+    @property
+    def mode(self):
+        """Returns the action selection mode"""
+        return self._mode
+
+    @mode.setter
+    def mode(self, mode):
+        """
+        Sets the action selection mode. Updated states are only tracked while
+        an OFFLINE [GREEDY | SOFTMAX] policy is cached. The cache is rebuilt
+        in full when tracking resumes.
+        """
+        cached = mode == QLearner.OFFLINE \
+                 and self.policy in (QLearner.GREEDY, QLearner.SOFTMAX)
+        if cached and not self._track_dirty:
+            self._policy_stale = True
+        elif not cached:
+            self._dirty.clear()
+        self._track_dirty = cached
+        self._mode = mode
+
 
     def set_action_selection_policy(self, policy, mode='offline', **kwargs):
         """
@@ -159,10 +246,17 @@ class QLearner:
             policy (str): One of QLearner.[UNIFORM | GREEDY | SOFTMAX].
             mode (str): One of QLearner.[OFFLINE | ONLINE]. Default OFFLINE.
             max_prob (float): Probability of choosing action with highest utility [0, 1).
+            temperature (float): For SOFTMAX, the temperature of a softmax
+                (Boltzmann) distribution over action values, computed stably
+                by subtracting the largest value. If None, actions are chosen
+                with probability proportional to their value minus the
+                smallest value. Default None.
         """
         self._action_param = {}
-        self.mode = mode
+        self._policy_stale = True
+        self._unsaved_all = True
         self.policy = policy
+        self.mode = mode
         if policy == QLearner.UNIFORM:
             self._policy = self._uniform_policy
 
@@ -175,72 +269,133 @@ class QLearner:
                 raise KeyError('"max_prob" keyword argument needed for GREEDY policy.')
 
         elif policy == QLearner.SOFTMAX:
+            if kwargs.get('temperature') is not None:
+                self._action_param['temperature'] = kwargs['temperature']
             self._policy = self._softmax_policy
 
         else:
             raise ValueError('Policy does not exist.')
 
 
-    def set_rq_matrix(self, rmatrix):
+    def set_rq_matrix(self, rmatrix, qmatrix=None, mmap_mode='r'):
         """
         Sets the reward/q-value matrices for the QLearner instance. Also sets
         self.depth if not specified.
 
         Args:
-            rmatrix (ndarray/str): The reward matrix of [n states x m actions].
+            rmatrix (ndarray/SparseMatrix/str): The reward matrix of [n states x
+                m actions].
                 OR
                 square matrix of [n states x n states] where each element is
                 the reward for n->m transition.
-                If string, then it is path to space delimited matrix file.
+                If string, then it is path to a space delimited or binary
+                (.npy/.npz) matrix file. See utils.read_matrix.
+            qmatrix (ndarray/str): The initial q-value matrix of the same shape
+                as rmatrix OR a filepath to it. Binary files are memory-mapped
+                copy-on-write so learning does not modify the file. Defaults to
+                a matrix of zeros.
+            mmap_mode (str): Memory-map mode for a binary rmatrix file. Default
+                'r' (read-only). If None, the file is read into memory.
         """
-        if isinstance(rmatrix, np.ndarray):
+        if isinstance(rmatrix, (np.ndarray, SparseMatrix)):
             self.rmatrix = rmatrix
         elif isinstance(rmatrix, str):
-            self.rmatrix = utils.read_matrix(rmatrix)
+            self.rmatrix = utils.read_matrix(rmatrix, mmap_mode=mmap_mode)
         else:
             raise TypeError('Either provide filename or ndarray for R matrix.')
-        self.qmatrix = np.zeros(self.rmatrix.shape)
+        if qmatrix is None:
+            self.qmatrix = self._create_qmatrix()
+        else:
+            if isinstance(qmatrix, str):
+                qmatrix = utils.read_matrix(qmatrix,
+                                            mmap_mode=None if mmap_mode is None else 'c')
+            elif not isinstance(qmatrix, (np.ndarray, SparseMatrix)):
+                raise TypeError('Either provide filename or ndarray for Q matrix.')
+            if qmatrix.shape != self.rmatrix.shape:
+                raise ValueError('Q and R matrix must have same shape.')
+            self.qmatrix = qmatrix
+        self._policy_stale = True
+        self._unsaved_all = True
         if self.depth is None:
             self.depth = self.num_states
 
 
     def set_goal(self, goal):
         """
-        Sets a function that checks if a state is a goal state or not.
+        Sets a function that checks if a state is a goal state or not. Goals
+        are stored as a boolean mask over states so goal checks are lookups.
 
         Args:
             goal (list/tuple/set/array/function): Indices of goal states in
-            rmatrix OR a function that accepts a state index and returns true if
-            goal.
+            rmatrix, OR a boolean array of length num_states, OR a function
+            that accepts a state index and returns true if goal. The function
+            is first called once on an array of all state indices and should
+            return a boolean array. If it cannot, it is called on each state.
         """
-        if isinstance(goal, (np.ndarray, list, tuple, set)):
-            self._goals = set(goal)
-            self.goal = lambda x: x in self._goals
+        if isinstance(goal, np.ndarray) and goal.dtype == bool:
+            if goal.shape != (self.num_states,):
+                raise ValueError('Goal mask must have one element per state.')
+            mask = goal.copy()
+        elif isinstance(goal, (np.ndarray, list, tuple, set)):
+            mask = np.zeros(self.num_states, dtype=bool)
+            goals = np.fromiter(goal, dtype=int, count=len(goal))
+            mask[goals[(goals >= 0) & (goals < self.num_states)]] = True
         elif callable(goal):
-            self._goals = set([g for g in range(self.num_states) if goal(g)])
-            self.goal = goal
+            states = np.arange(self.num_states)
+            try:
+                mask = np.asarray(goal(states))
+            except (TypeError, ValueError, IndexError):
+                mask = None
+            if mask is None or mask.shape != states.shape or mask.dtype != bool:
+                mask = np.fromiter((goal(g) for g in states), dtype=bool,
+                                   count=self.num_states)
         else:
             raise TypeError('Provide goal as list/set/array/tuple/function.')
+        self._goal_mask = mask
+        self._goals = set(np.flatnonzero(mask).tolist())
+        # Indexing a list is faster than a numpy array for single states.
+        # States outside [0, num_states) are not goals, like a set of goals.
+        goals, num = mask.tolist(), self.num_states
+        self.goal = lambda state: 0 <= state < num and goals[state]
 
 
-    def set_transition_matrix(self, tmatrix):
+    def goal_many(self, states):
+        """
+        Vectorized goal() for an array of states.
+
+        Args:
+            states (ndarray): Indices of states in [r|q]matrix.
+
+        Returns:
+            A boolean array, True where a state is a goal state. States outside
+            [0, num_states) are not goal states.
+        """
+        states = np.asarray(states)
+        inside = (states >= 0) & (states < self.num_states)
+        return inside & self._goal_mask[np.where(inside, states, 0)]
+
+
+    def set_transition_matrix(self, tmatrix, mmap_mode='r'):
         """
         Sets the transition matrix in case of state-action-state transitions
         as opposed to state-state transitions (which only require a nxn matrix).
 
         Args:
             tmatrix (ndarray/str): A transition matrix of [n states x m actions]
-                OR a filepath to the whitespace delimited tmatrix file.
+                OR a filepath to the whitespace delimited or binary (.npy/.npz)
+                tmatrix file.
             where tmatrix[state, action] contains index of next state.
+            mmap_mode (str): Memory-map mode for a binary tmatrix file. Default
+                'r' (read-only). If None, the file is read into memory.
         """
         if tmatrix is not None:
             if isinstance(tmatrix, str):    # if filepath, read file to matrix
-                tmatrix = utils.read_matrix(tmatrix)
+                tmatrix = utils.read_matrix(tmatrix, mmap_mode=mmap_mode, dtype=int)
             elif not isinstance(tmatrix, np.ndarray): # if not filepath, must be array
                 raise TypeError('tmatrix should be ndarray or filepath string.')
             if tmatrix.shape != self.rmatrix.shape:
                 raise ValueError('Transition and R matrix must have same shape.')
-            if tmatrix.dtype != int:
+            if not np.issubdtype(tmatrix.dtype, np.integer):
                 raise TypeError('Transition matrix must have integer contents.')
             self.tmatrix = tmatrix
             # self._next_state = lambda s, a: self.tmatrix[s, a]
@@ -259,40 +414,17 @@ class QLearner:
         Args:
             coverage (float): Fraction of states to generate for episodes.
                 Default= 1. Range [0, 1].
-            mode (str): The order in which to loop through states. If 'bfs',
-                performs a Breadth  First Search around goal states.
+            mode (str/func): The order in which to loop through states. One of
+                'random', 'replace', 'bfs', 'reverse', 'stratified' or a
+                scheduler function. If 'bfs', performs a Breadth  First Search
+                around goal states. See schedulers module.
                 Default=None (random selection without replacement).
 
         Returns:
             A generator of of state indices.
         """
         num = int(self.num_states * coverage)
-        if mode == 'bfs':
-            enqueued = np.zeros(self.num_states, dtype=bool)
-            queue = list(self._goals)
-            enqueued[queue] = True
-            i = 0
-            # Do a BFS of the goal states' connected neighbourhood.
-            while i < num and len(queue) > 0:
-                i += 1
-                state = queue.pop()
-                for n in self.neighbours(state):
-                    if not enqueued[n]:
-                        enqueued[n] = True
-                        queue.insert(0, n)
-                yield state
-            # If neighbourhoods of goal states are exhausted i.e. no more states
-            # that can be accessed from goal states through any actions, then
-            # generate the remainder by randomly picking from the unvisited
-            # states:
-            if i < num:
-                choices = self.random.choice(np.arange(self.num_states)[~enqueued],\
-                                         size=num-i, replace=False)
-                for j in range(num-i):
-                    yield choices[j]
-        else:
-            for i in range(num):
-                yield self.random.choice(self.num_states)
+        return schedulers.schedule(self, num, mode)
 
 
     def neighbours(self, state):
@@ -364,6 +496,53 @@ class QLearner:
         return reward
 
 
+    def next_state_many(self, states, actions, stepsize=1):
+        """
+        Vectorized next_state() for arrays of states and actions.
+
+        Args:
+            states (ndarray): Indices of current states in [r|q]matrix.
+            actions (ndarray): Indices of actions taken from each state.
+            stepsize (int/ndarray): Number of steps to take each action for.
+                Default=1.
+
+        Returns:
+            An array of indices of next states.
+        """
+        states = np.array(states, dtype=int)
+        actions = np.asarray(actions)
+        steps = np.broadcast_to(stepsize, states.shape)
+        for k in range(int(np.max(steps, initial=0))):
+            moving = k < steps
+            states[moving] = self.tmatrix[states[moving], actions[moving]]
+        return states
+
+
+    def reward_many(self, cstates, actions, nstates, stepsize=1):
+        """
+        Vectorized reward() for arrays of states and actions.
+
+        Args:
+            cstates (ndarray): Indices of current states in [r|q]matrix.
+            actions (ndarray): Indices of actions taken from each state.
+            nstates (ndarray): Indices of next states in [r|q]matrix.
+            stepsize (int/ndarray): Number of steps to take each action for.
+                Default=1.
+
+        Returns:
+            An array of rewards.
+        """
+        cstates = np.array(cstates, dtype=int)
+        actions = np.asarray(actions)
+        steps = np.broadcast_to(stepsize, cstates.shape)
+        rewards = np.zeros(len(cstates))
+        for k in range(int(np.max(steps, initial=0))):
+            moving = k < steps
+            rewards[moving] += self.rmatrix[cstates[moving], actions[moving]]
+            cstates[moving] = self.tmatrix[cstates[moving], actions[moving]]
+        return rewards
+
+
     def value(self, state):
         """
         The utility/value of a state.
@@ -397,7 +576,45 @@ class QLearner:
             return self.qmatrix[state]
 
 
-    def learn(self, episodes=None, coverage=1., ep_mode=None, actions=(), **kwargs):
+    def qvalue_many(self, states, actions=None):
+        """
+        The q-values of an array of states (and actions).
+
+        Args:
+            states (ndarray): Indices of states in [r|q]matrix (row indices).
+            actions (ndarray): Indices of actions to be taken from each state.
+
+        Returns:
+            An array of the qvalues of each state,action pair if actions are
+            specified. Else a [states x actions] array of qvalues of all actions
+            from each state.
+        """
+        if actions is not None:
+            return self.qmatrix[states, actions]
+        else:
+            return self.qmatrix[states]
+
+
+    def value_many(self, states):
+        """
+        Vectorized value() for an array of states.
+
+        Args:
+            states (ndarray): Indices of states in [r|q]matrix (row indices).
+
+        Returns:
+            A tuple of an array of the values of states and an array of the
+            indices of the most rewarding next action from each state.
+        """
+        qvals = self.qvalue_many(states)
+        actions = np.argmax(qvals, axis=1)
+        return qvals[np.arange(len(actions)), actions], actions
+
+
+    def learn(self, episodes=None, coverage=1., ep_mode=None, actions=(),
+              batchsize=1, processes=1, converge=None, tolerance=1e-3, window=10,
+              max_episodes=None, metrics=False, algorithm=None, history=False,
+              interval=1, **kwargs):
         """
         Begins learning procedure over all (state, action) pairs. Populates the
         Q matrix with utility for each (state, action).
@@ -415,28 +632,421 @@ class QLearner:
             OR
             actions (list/tuple): A list of actions to take for each starting state
                 provided in episodes. Optional.
-            
+            batchsize (int): Number of episodes to run together in lockstep.
+                If greater than 1, uses the batchnstep algorithm. Only for
+                tabular learners. In OFFLINE mode, the policy is updated every
+                batch instead of every episode. Default=1.
+            processes (int): Number of worker processes to divide episodes
+                between. If greater than 1, the value function (qmatrix or
+                weights) is placed in shared memory and updated by all workers
+                without locks ("Hogwild"). Each worker has its own random
+                number generator seeded from self.random. Requires the 'fork'
+                start method. Default=1.
+            converge (str): Stops learning early when the value function stops
+                changing over the last 'window' episodes (or batches). One of:
+                * 'max': largest absolute update is at most tolerance,
+                * 'mean': mean absolute update is at most tolerance,
+                * 'policy': no greedy action changes. Tabular learners only
+                  check the states updated in each episode. Other learners
+                  (e.g. FLearner) share weights between states so the greedy
+                  action of every state is recomputed, costing
+                  O(states x actions) q-value evaluations per check. See
+                  interval.
+                If episodes is None, passes over episodes() are repeated until
+                convergence. Default None (no early stopping).
+            tolerance (float): Threshold of update size for convergence.
+            window (int): Number of consecutive episodes (or batches) which
+                must meet the convergence criterion. Default 10.
+            max_episodes (int): Maximum number of episodes to run when
+                converge is set. Defaults to 100 passes over episodes().
+            metrics (bool): Whether to record per-episode metrics in
+                self.metrics even if converge is None. Default False.
+            algorithm (str/func): The episodic learning algorithm. One of
+                'nstep' (n-step tree backup, see algorithms.variablenstep) or
+                'treebackup' (tree backup(lambda) with eligibility traces
+                decayed by self.trace, see algorithms.treebackup). OR a
+                function with the signature:
+                    (states, actions) = func(learner, state, action, history)
+                Only 'nstep' can be batched. Default None ('nstep').
+            history (bool): Whether to keep and return the states and actions
+                traversed in each episode. If False, only the episode lengths
+                and final states are kept so long episodes use constant memory.
+                Default False.
+            interval (int): Number of episodes (or batches) between checks of
+                the 'policy' criterion for non-tabular learners. A check
+                counts the greedy actions changed since the last check. The
+                criterion is met when all checks in the last window episodes
+                (at least one) find no changes. Default 1.
+
             **kwargs: Any learning parameters (lrate, depth, stepsize, mode, steps,
-                discount, exploration) which are stored.
+                discount, exploration, trace) which are stored.
         Returns:
-            A list of lists of states traversed for each episode.
+            If history is False, a tuple (lengths, final_states) of a list of
+            the number of states traversed in each episode and a list of the
+            final state of each episode.
+            If history is True, a tuple of a list of lists of states traversed
+            for each episode and a list of lists of actions taken in each
+            episode.
         """
         for key, val in kwargs.items():
             if hasattr(self, key):
                 setattr(self, key, val)
-        
-        episodes = episodes if episodes is not None else\
-                self.episodes(coverage=coverage, mode=ep_mode)
 
-        histories = []
-        actions = []
-        for i, pair in enumerate(zip_longest(episodes, actions)):
-            if self.mode == self.__class__.OFFLINE:
-                self._update_policy()
-            states, actions = variablenstep(self, state=pair[0], action=pair[1])
-            histories.append(states)
-            actions.append(actions)
-        return histories, actions
+        if episodes is None:
+            episodes = self.episodes(coverage=coverage, mode=ep_mode)
+            if converge is not None:
+                max_episodes = 100 * int(self.num_states * coverage) \
+                               if max_episodes is None else max_episodes
+                episodes = chain.from_iterable(
+                    self.episodes(coverage=coverage, mode=ep_mode) for _ in count())
+        if max_episodes is not None:
+            episodes = islice(episodes, max_episodes)
+        algorithm = 'nstep' if algorithm is None else algorithm
+        if not callable(algorithm):
+            if algorithm not in ALGORITHMS:
+                raise ValueError('Algorithm "' + str(algorithm) + '" does not exist.')
+            algorithm = ALGORITHMS[algorithm]
+        if batchsize > 1 and algorithm is not variablenstep:
+            raise ValueError('Only the n-step algorithm can be batched.')
+        if processes > 1:
+            if converge is not None or metrics:
+                raise ValueError('Metrics are not recorded in parallel learning.')
+            return self._learn_parallel(episodes, actions, batchsize, processes,
+                                        algorithm, history)
+
+        self.metrics = []
+        self._deltas = [] if converge is not None or metrics else None
+        track = self._track_dirty
+        if converge == 'policy':
+            self._greedy = self.recommend_many(np.arange(self.num_states))
+            self._track_dirty = True    # greedy actions of updated states are checked
+        try:
+            histories = []
+            ahistories = []
+            pairs = zip_longest(episodes, actions)
+            if batchsize > 1:
+                if type(self).qvalue is not QLearner.qvalue:
+                    raise TypeError('Batched learning requires a tabular q-matrix.')
+                batch = list(islice(pairs, batchsize))
+                while len(batch) > 0:
+                    if self.mode == self.__class__.OFFLINE:
+                        self._update_policy()
+                    starts = [pair[0] for pair in batch]
+                    states, actions = batchnstep(self, *zip(*batch), history=history)
+                    histories.extend(states)
+                    ahistories.extend(actions)
+                    if self.profiler is not None:
+                        self.profiler.end_episode(len(batch))
+                    if self._deltas is not None:
+                        self._record(starts, states, converge, history, interval)
+                        if self._converged(converge, tolerance, window):
+                            break
+                    batch = list(islice(pairs, batchsize))
+            else:
+                for state, action in pairs:
+                    if self.mode == self.__class__.OFFLINE:
+                        self._update_policy()
+                    states, actions = algorithm(self, state=state, action=action,
+                                                history=history)
+                    histories.append(states)
+                    ahistories.append(actions)
+                    if self.profiler is not None:
+                        self.profiler.end_episode()
+                    if self._deltas is not None:
+                        self._record([state], [states], converge, history,
+                                     interval)
+                        if self._converged(converge, tolerance, window):
+                            break
+        finally:
+            self._deltas = None
+            if not track:
+                self._dirty.clear()
+            self._track_dirty = track
+        return histories, ahistories
+
+
+    def checkpoint(self, fname, incremental=False):
+        """
+        Saves the learning state (value function, random number generator,
+        policy caches and learning parameters) into a binary file. See
+        checkpoint module.
+
+        Args:
+            fname (str): Filepath of checkpoint (.npz).
+            incremental (bool): Whether to only save the rows of the qmatrix
+                changed since the last checkpoint. Default False.
+
+        Returns:
+            The filepath of the checkpoint.
+        """
+        return checkpoint.save_checkpoint(self, fname, incremental=incremental)
+
+
+    def restore(self, fname):
+        """
+        Restores the learning state saved by checkpoint(). The instance must
+        have the same environment as the instance that was saved.
+
+        Args:
+            fname (str): Filepath of checkpoint (.npz).
+        """
+        checkpoint.load_checkpoint(self, fname)
+
+
+    def set_profiling(self, enable=True, phases=PHASES):
+        """
+        Enables or disables recording of call counts and wall time of the
+        phases of learning (see profiler module). Records are added to the
+        profiler at the end of each episode (or batch) of learn(). Batched
+        learning is timed through the vectorized phase methods (e.g.
+        update_many). Episodes run by worker processes (learn(processes>1)) are not recorded. When disabled,
+        the phases run without any timing overhead.
+
+        Args:
+            enable (bool): Whether to record phases. Default True.
+            phases (tuple): Names of methods to time. Default profiler.PHASES
+                i.e. next_state, reward, qvalue, a_probs, update, next_action.
+
+        Returns:
+            The Profiler if enabled. Else the detached Profiler with the
+            records so far (or None if profiling was not enabled).
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.detach(self)
+            self.profiler = None
+        if enable:
+            self.profiler = Profiler(phases)
+            self.profiler.attach(self)
+            return self.profiler
+        return profiler
+
+
+    def _record(self, starts, histories, converge, history=False, interval=1):
+        """
+        Appends metrics of the last episode (or batch of episodes) to
+        self.metrics and clears the recorded updates. Metrics are a dict of:
+        * episodes: number of episodes (more than 1 for a batch),
+        * length: total number of states traversed,
+        * updates: number of updates to the value function,
+        * max_delta/mean_delta: largest/mean absolute update,
+        * policy_changes: number of states whose greedy action changed (only
+            if converge is 'policy' and the policy was checked, see interval).
+
+        Args:
+            starts (list): Start states of episodes.
+            histories (list): States traversed in each episode. Or the number
+                of states traversed in each episode if history is False.
+            converge (str): The convergence criterion. See learn().
+            history (bool): Whether histories are lists of states.
+            interval (int): Entries between policy checks of non-tabular
+                learners. See learn().
+        """
+        deltas = np.abs(np.asarray(self._deltas, dtype=float))
+        self._deltas.clear()
+        entry = {'episodes': len(starts),
+                 'length': sum(len(h) for h in histories) if history \
+                           else int(sum(histories)),
+                 'updates': len(deltas),
+                 'max_delta': float(np.max(deltas)) if len(deltas) else 0.,
+                 'mean_delta': float(np.mean(deltas)) if len(deltas) else 0.}
+        if converge == 'policy':
+            if type(self).qvalue is QLearner.qvalue and history:
+                # Only the q-values of visited states change.
+                states = np.unique(np.concatenate(
+                    [np.asarray(starts, dtype=int)] \
+                    + [np.asarray(h, dtype=int) for h in histories]))
+            elif type(self).qvalue is QLearner.qvalue:
+                # Updated states are a superset of those changed this episode.
+                states = np.fromiter(self._dirty, dtype=int, count=len(self._dirty))
+                if self.mode == QLearner.ONLINE:
+                    self._dirty.clear()
+            elif (len(self.metrics) + 1) % interval == 0:
+                states = np.arange(self.num_states)
+            else:
+                self.metrics.append(entry)
+                return
+            greedy = self.recommend_many(states)
+            entry['policy_changes'] = int(np.sum(np.any(
+                (greedy != self._greedy[states]).reshape(len(states), -1), axis=1)))
+            self._greedy[states] = greedy
+        self.metrics.append(entry)
+
+
+    def _converged(self, converge, tolerance, window):
+        """
+        Checks the convergence criterion over the last window of metrics.
+
+        Args:
+            converge (str): One of 'max', 'mean', 'policy' or None. See learn().
+            tolerance (float): Threshold of update size.
+            window (int): Number of metrics entries to check.
+
+        Returns:
+            True if the criterion is met, else False.
+        """
+        if converge is None or len(self.metrics) < window:
+            return False
+        recent = self.metrics[-window:]
+        if converge == 'max':
+            return max(m['max_delta'] for m in recent) <= tolerance
+        elif converge == 'mean':
+            updates = sum(m['updates'] for m in recent)
+            total = sum(m['mean_delta'] * m['updates'] for m in recent)
+            return total <= tolerance * max(updates, 1)
+        elif converge == 'policy':
+            checks = [m['policy_changes'] for m in recent if 'policy_changes' in m]
+            return len(checks) > 0 and all(c == 0 for c in checks)
+        raise ValueError('Convergence criterion must be "max", "mean" or "policy".')
+
+
+    def replay(self, batch_size=32):
+        """
+        Learns from transitions stored in self.memory instead of taking new
+        steps. A batch of transitions is sampled and the value function is
+        updated once with the one-step tree backup (expected) errors of all
+        transitions. Priorities of prioritized buffers are updated with the
+        errors.
+
+        Args:
+            batch_size (int): Number of transitions to sample. Default 32.
+
+        Returns:
+            An array of the errors (current value - new estimate) of the
+            sampled transitions.
+        """
+        if self.memory is None:
+            raise ValueError('No replay memory. Provide a ReplayBuffer.')
+        indices, states, actions, rewards, nstates, terminals, weights = \
+            self.memory.sample(batch_size, self.random)
+        expected = np.sum(self._a_probs_many(nstates) * self.qvalue_many(nstates),
+                          axis=1)
+        targets = rewards + np.where(terminals, 0, self.discount * expected)
+        errors = self.qvalue_many(states, actions) - targets
+        self.update_many(states, actions, errors * weights)
+        self.memory.update_priorities(indices, errors)
+        return errors
+
+
+    def sweep(self, tolerance=1e-6, updates=None):
+        """
+        Learns the qmatrix by planning on the transition/reward matrices
+        instead of sampling episodes. Uses prioritized sweeping: the
+        (state, action) pairs with the largest errors are backed up first and
+        changes in value are propagated to the pairs leading into a state.
+        The q-values converge to those of the greedy (optimal) policy. See
+        algorithms.prioritizedsweeping.
+
+        Args:
+            tolerance (float): Largest error in a q-value left unbacked.
+                Default 1e-6.
+            updates (int): Maximum number of backups. Defaults to 100 times
+                the number of (state, action) pairs.
+
+        Returns:
+            The number of backups made.
+        """
+        if type(self).qvalue is not QLearner.qvalue:
+            raise TypeError('Sweeping requires a tabular q-matrix.')
+        return prioritizedsweeping(self, tolerance=tolerance, updates=updates)
+
+
+    def solve(self, method='value', tolerance=1e-6, iterations=None):
+        """
+        Computes the q-values of the greedy (optimal) policy exactly from the
+        transition/reward matrices. Every sweep updates the whole qmatrix at
+        once. The solved qmatrix is used by recommend() and can be a starting
+        point for learn(). See algorithms.valueiteration.
+
+        Args:
+            method (str): 'value' for value iteration or 'policy' for policy
+                iteration. Default 'value'.
+            tolerance (float): Largest change in a value at convergence.
+                Default 1e-6.
+            iterations (int): Maximum number of sweeps. Defaults to 10 times
+                the number of states.
+
+        Returns:
+            The number of sweeps made.
+        """
+        if type(self).qvalue is not QLearner.qvalue:
+            raise TypeError('Solving requires a tabular q-matrix.')
+        if method == 'value':
+            return valueiteration(self, tolerance=tolerance, iterations=iterations)
+        elif method == 'policy':
+            return policyiteration(self, tolerance=tolerance, iterations=iterations)
+        raise ValueError('Method must be "value" or "policy".')
+
+
+    def _learn_parallel(self, episodes, actions, batchsize, processes, algorithm,
+                        history):
+        """
+        Divides episodes between worker processes which learn concurrently
+        on a value function in shared memory. See learn().
+
+        Args:
+            episodes (list/generator): States to begin learning episodes from.
+            actions (list/tuple): Actions to take from each starting state.
+            batchsize (int): Number of episodes each worker runs in lockstep.
+            processes (int): Number of worker processes.
+            algorithm (func): The episodic learning algorithm.
+            history (bool): Whether to return the histories of episodes.
+
+        Returns:
+            Same as learn(). Histories are in the order of episodes.
+        """
+        name = 'weights' if hasattr(self, 'weights') else 'qmatrix'
+        table = getattr(self, name)
+        if not isinstance(table, np.ndarray):
+            raise TypeError('Parallel learning requires a dense ' + name + '.')
+        pairs = list(zip_longest(episodes, actions))
+        seeds = np.random.SeedSequence(
+            self.random.randint(2**32, size=4, dtype=np.uint64)).spawn(processes)
+        context = get_context('fork')
+        memory = shared_memory.SharedMemory(create=True, size=max(table.nbytes, 1))
+        shared = np.ndarray(table.shape, dtype=table.dtype, buffer=memory.buf)
+        workers = []
+        done = False
+        try:
+            shared[:] = table
+            setattr(self, name, shared)
+            for i in range(processes):
+                receiver, sender = context.Pipe(duplex=False)
+                worker = context.Process(target=_learn_worker,
+                                         args=(self, pairs[i::processes],
+                                               seeds[i], batchsize, algorithm,
+                                               history, sender))
+                worker.start()
+                sender.close()
+                workers.append((worker, receiver))
+            results = []
+            for _, receiver in workers:
+                result = receiver.recv()
+                if isinstance(result, Exception):
+                    raise result
+                results.append(result)
+            table[:] = shared   # workers are done writing once they send
+            done = True
+        finally:
+            # Workers still running after an error must not outlive the
+            # shared memory.
+            for worker, receiver in workers:
+                if not done:
+                    worker.terminate()
+                worker.join()
+                receiver.close()
+            setattr(self, name, table)
+            del shared
+            memory.close()
+            memory.unlink()
+        self._policy_stale = True
+        self._unsaved_all = True
+        histories = [None] * len(pairs)
+        ahistories = [None] * len(pairs)
+        for i, (states, actions) in enumerate(results):
+            histories[i::processes] = states
+            ahistories[i::processes] = actions
+        return histories, ahistories
 
 
     def update(self, state, action, error):
@@ -449,7 +1059,55 @@ class QLearner:
             action (int): Index of action in [r|q]matrix.
             error (float): Error term (current value - new estimate)
         """
-        self.qmatrix[state, action] -= self.lrate * error
+        delta = self.lrate * error
+        self.qmatrix[state, action] -= delta
+        if self._track_dirty:
+            self._dirty.add(state)
+        if not self._unsaved_all:
+            self._unsaved.add(state)
+        if self._deltas is not None:
+            self._deltas.append(delta)
+
+
+    def update_many(self, states, actions, errors):
+        """
+        Vectorized update(). Errors of all pairs are measured from the same
+        (current) q-values. Repeated (state, action) pairs are updated as if
+        update() was called for each of them in order i.e. earlier errors are
+        decayed by (1 - lrate) for every later repetition. Summing them instead
+        would take too large a step when many episodes visit the same pair.
+
+        Args:
+            states (ndarray): Indices of states in [r|q]matrix.
+            actions (ndarray): Indices of actions in [r|q]matrix.
+            errors (ndarray): Error terms (current value - new estimate)
+        """
+        states = np.asarray(states)
+        actions = np.asarray(actions)
+        keys = states * self.num_actions + actions
+        order = np.argsort(keys, kind='stable')
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[order][1:] != keys[order][:-1]
+        if not np.all(first):
+            starts = np.flatnonzero(first)
+            group = np.cumsum(first) - 1
+            counts = np.diff(np.append(starts, len(keys)))[group]
+            later = counts - 1 - (np.arange(len(keys)) - starts[group])
+            decay = np.empty(len(keys))
+            decay[order] = (1 - self.lrate) ** later
+            errors = errors * decay
+        if isinstance(self.qmatrix, SparseMatrix):
+            self.qmatrix.add_at((states, actions), -self.lrate * errors)
+        else:
+            np.subtract.at(self.qmatrix, (states, actions), self.lrate * errors)
+        if self._track_dirty or not self._unsaved_all:
+            rows = np.unique(states).tolist()
+            if self._track_dirty:
+                self._dirty.update(rows)
+            if not self._unsaved_all:
+                self._unsaved.update(rows)
+        if self._deltas is not None:
+            self._deltas.extend(self.lrate * errors)
 
 
     def recommend(self, state):
@@ -467,6 +1125,19 @@ class QLearner:
         return np.argmax(self.qvalue(state))
 
 
+    def recommend_many(self, states):
+        """
+        Vectorized recommend() for an array of states.
+
+        Args:
+            states (ndarray): Indices of current states in [r|q]matrix.
+
+        Returns:
+            An array of indices of actions to take (columns) in [r|q]matrix.
+        """
+        return np.argmax(self.qvalue_many(states), axis=1)
+
+
     def reset(self):
         """
         Resets self.qmatrix to initial state. This is useful in case the same
@@ -475,7 +1146,19 @@ class QLearner:
         The qmatrix is not automatically reset for each learn() call to allow
         for the learning process to build upon a custom qmatrix provided.
         """
-        self.qmatrix = np.zeros_like(self.rmatrix)
+        self.qmatrix = self._create_qmatrix()
+        self._policy_stale = True
+        self._unsaved_all = True
+
+
+    def _create_qmatrix(self):
+        """
+        Returns an initial qmatrix of zeros of self.dtype with the same shape
+        as rmatrix. Stored as a SparseMatrix if self.sparse is True.
+        """
+        if self.sparse:
+            return SparseMatrix(self.rmatrix.shape, dtype=self.dtype)
+        return np.zeros(self.rmatrix.shape, dtype=self.dtype)
 
 
     def _uniform_policy(self, state):
@@ -488,7 +1171,7 @@ class QLearner:
         Returns:
             Index of action in [r|q]matrix.
         """
-        return self.random.randint(self.num_actions)
+        return self.uniforms.randint(self.num_actions)
 
 
     def _greedy_policy(self, state):
@@ -503,22 +1186,25 @@ class QLearner:
             Index of action in [r|q]matrix.
         """
         if self.mode == QLearner.ONLINE:
-            if self.random.uniform() < self._action_param['max_prob']:
+            if self.uniforms.uniform() < self._action_param['max_prob']:
                 return np.argmax(self.qvalue(state))
             else:
-                return self.random.randint(self.num_actions)
+                return self.uniforms.randint(self.num_actions)
         # not possible for SLearner subclass i.e. continuous state space
         elif self.mode == QLearner.OFFLINE:
-            if self.random.uniform() < self._action_param['max_prob']:
+            if self.uniforms.uniform() < self._action_param['max_prob']:
                 return self._action_param['max_util_indices'][state]
             else:
-                return self.random.randint(self.num_actions)
+                return self.uniforms.randint(self.num_actions)
 
 
     def _softmax_policy(self, state):
         """
         Selects actions with probability proportional to their utility in
-        qmatrix[state,:]
+        qmatrix[state,:] (or their softmax weights if a temperature is set).
+        In OFFLINE mode, actions are drawn in constant time from alias tables
+        of each state (see utils.alias_tables). A single random number picks
+        the column and decides between it and its alias.
 
         Args:
             state (int): Index of current state.
@@ -527,39 +1213,171 @@ class QLearner:
             Index of action in [r|q]matrix.
         """
         if self.mode == QLearner.ONLINE:
-            qvals = self.qvalue(state)
-            cumulative_utils = np.cumsum(qvals - np.min(qvals))
-            random_num = self.random.rand() * cumulative_utils[-1]
-            return np.searchsorted(cumulative_utils, random_num)
+            cumulative_utils = np.cumsum(self._softmax_weights(self.qvalue(state)))
+            if cumulative_utils[-1] <= 0:
+                return self.uniforms.randint(self.num_actions)
+            random_num = self.uniforms.uniform() * cumulative_utils[-1]
+            ind = np.searchsorted(cumulative_utils, random_num, side='right')
+            return ind if ind < self.num_actions else ind - 1
         # not possible for SLearner subclass i.e. continuous state space
         elif self.mode == QLearner.OFFLINE:
-            random_num = self.random.rand()  \
-                        * self._action_param['cumulative_utils'][state][-1]
-            ind = np.searchsorted(self._action_param['cumulative_utils'][state],\
-                                random_num)
-            # Searchsorted returns size of array if number is larger than
-            # largest element. The conditional return addresses that.
-            return ind if ind < self.num_actions else ind - 1
+            random_num = self.uniforms.uniform() * self.num_actions
+            ind = int(random_num)
+            if random_num - ind < self._action_param['alias_probs'][state, ind]:
+                return ind
+            return int(self._action_param['alias_indices'][state, ind])
+
+
+    def _softmax_weights(self, qvals):
+        """
+        Unnormalized SOFTMAX action weights from action values. The last axis
+        of qvals is actions.
+        """
+        qvals = np.asarray(qvals, dtype=float)
+        if 'temperature' in self._action_param:
+            return np.exp((qvals - np.max(qvals, axis=-1, keepdims=True)) \
+                          / self._action_param['temperature'])
+        return qvals - np.min(qvals, axis=-1, keepdims=True)
+
+
+    def _softmax_probs(self, qvals):
+        """
+        SOFTMAX action probabilities from action values. The last axis of qvals
+        is actions.
+        """
+        weights = self._softmax_weights(qvals)
+        if 'temperature' in self._action_param:
+            return weights / np.sum(weights, axis=-1, keepdims=True)
+        return weights / (np.sum(weights, axis=-1, keepdims=True) + self.lrate)
 
 
     def _update_policy(self):
         """
         Updates OFFLINE [SOFTMAX | GREEDY] policy every episode by updating
-        how new actions are suggested based on current utility.
+        how new actions are suggested based on current utility. Only the rows
+        of states updated since the last call are recomputed, unless the whole
+        policy is stale (e.g. after reset() or a change of policy). Rows are
+        computed CHUNK states at a time. For a sparse qmatrix, only the rows of
+        materialized states are computed and stored, the rest share the cache
+        of the fill row.
+        """
+        if self.policy == QLearner.GREEDY:
+            keys = ('max_util_indices',)
+        elif self.policy == QLearner.SOFTMAX:
+            keys = ('alias_probs', 'alias_indices')
+        else:
+            self._dirty.clear()
+            return
+        if self._policy_stale or keys[0] not in self._action_param:
+            sparse = isinstance(self.qmatrix, SparseMatrix)
+            fill = np.full((1, self.num_actions), self.qmatrix.fill if sparse else 0,
+                           dtype=self.dtype)
+            for key, cache in zip(keys, self._policy_caches(fill)):
+                if cache.ndim == 1:
+                    self._action_param[key] = np.full(self.num_states, cache[0],
+                                                      dtype=cache.dtype)
+                elif sparse:
+                    self._action_param[key] = SparseMatrix(
+                        (self.num_states, self.num_actions), cache[0], cache.dtype)
+                else:
+                    self._action_param[key] = np.empty(
+                        (self.num_states, self.num_actions), dtype=cache.dtype)
+            rows = self.qmatrix.rows() if sparse else np.arange(self.num_states)
+            self._unsaved_all = True    # all cache rows change
+        else:
+            rows = np.fromiter(self._dirty, dtype=int, count=len(self._dirty))
+            if not self._unsaved_all:
+                self._unsaved.update(self._dirty)   # cache rows change
+        self._dirty.clear()
+        self._policy_stale = False
+        for i in range(0, len(rows), CHUNK):
+            chunk = rows[i:i+CHUNK]
+            for key, cache in zip(keys, self._policy_caches(self.qvalue_many(chunk))):
+                self._action_param[key][chunk] = cache
+
+
+    def _policy_caches(self, qvals):
+        """
+        Computes the rows of the OFFLINE [SOFTMAX | GREEDY] policy caches.
+
+        Args:
+            qvals (ndarray): A [states x actions] array of q-values.
+
+        Returns:
+            A tuple of the cache rows of states, one for each cache.
         """
         if self.policy == QLearner.GREEDY:
             # max_util_indices is a list of action indices (column #s) with the
             # highest q value for each state. Used to generate random numbers
             # based on the greedy policy.
-            self._action_param['max_util_indices'] = np.argmax(
-                [self.qvalue(s) for s in range(self.num_states)], axis=1)
+            return (np.argmax(qvals, axis=1),)
+        # alias_probs/alias_indices are the alias tables of the action
+        # weights of each state. Used to sample actions in constant time.
+        probs, aliases = utils.alias_tables(self._softmax_weights(qvals))
+        return (probs.astype(self.dtype), aliases)
+
+
+    def _next_actions(self, states):
+        """
+        Vectorized next_action() for an array of states. Same as the
+        [UNIFORM | GREEDY | SOFTMAX] policies for tabular learners.
+
+        Args:
+            states (ndarray): Indices of current states.
+
+        Returns:
+            An array of action indices in [r|q]matrix.
+        """
+        num = len(states)
+        if self.policy == QLearner.UNIFORM:
+            return (self.uniforms.sample(num) * self.num_actions).astype(int)
+        elif self.policy == QLearner.GREEDY:
+            greedy = self.uniforms.sample(num) < self._action_param['max_prob']
+            actions = (self.uniforms.sample(num) * self.num_actions).astype(int)
+            if self.mode == QLearner.ONLINE:
+                best = np.argmax(self.qmatrix[states], axis=1)
+            else:
+                best = self._action_param['max_util_indices'][states]
+            return np.where(greedy, best, actions)
+        elif self.policy == QLearner.SOFTMAX:
+            if self.mode == QLearner.ONLINE:
+                cumulative_utils = np.cumsum(
+                    self._softmax_weights(self.qmatrix[states]), axis=1)
+                # Rows of zero weights are sampled uniformly
+                cumulative_utils[cumulative_utils[:, -1] <= 0] = \
+                    np.arange(1, self.num_actions + 1)
+                random_num = self.uniforms.sample(num) * cumulative_utils[:, -1]
+                # Same as a row-wise searchsorted
+                ind = np.sum(cumulative_utils <= random_num[:, None], axis=1)
+                return np.minimum(ind, self.num_actions - 1)
+            random_num = self.uniforms.sample(num) * self.num_actions
+            ind = random_num.astype(int)
+            own = random_num - ind < self._action_param['alias_probs'][states, ind]
+            return np.where(own, ind, self._action_param['alias_indices'][states, ind])
+
+
+    def _a_probs_many(self, states):
+        """
+        Vectorized a_probs() for an array of states.
+
+        Args:
+            states (ndarray): Indices of states in [r|q]matrix. Or an array of
+                state vectors for learners using vector representation.
+
+        Returns:
+            A [states x actions] array of action probabilities.
+        """
+        qvals = self.qvalue_many(states)
+        if self.policy == QLearner.UNIFORM:
+            return np.full(qvals.shape, 1 / self.num_actions)
+        elif self.policy == QLearner.GREEDY:
+            probs = np.full(qvals.shape, (1 - self._action_param['max_prob']) \
+                            / (self.num_actions - 1))
+            probs[np.arange(len(qvals)), np.argmax(qvals, axis=1)] = \
+                self._action_param['max_prob']
+            return probs
         elif self.policy == QLearner.SOFTMAX:
-            # cumulative_utils is the cumulative sum of the action q values for
-            # each state. This is used to generate a random number based on the
-            # relative utility of each action in a state.
-            qvals = np.array([self.qvalue(s) for s in range(self.num_states)])
-            self._action_param['cumulative_utils'] = np.cumsum(
-                qvals - np.min(qvals), axis=1)
+            return self._softmax_probs(qvals)
 
 
     def a_probs(self, state):
@@ -583,7 +1401,35 @@ class QLearner:
             probs[highest] = self._action_param['max_prob']
             return probs
         elif self.policy == QLearner.SOFTMAX:
-            qvals = self.qvalue(state)
-            recentered = qvals - np.min(qvals)
-            return recentered / (np.sum(recentered) + self.lrate)
+            return self._softmax_probs(self.qvalue(state))
+
 
+
+def _learn_worker(learner, pairs, seed, batchsize, algorithm, history, conn):
+    """
+    Target of worker processes created by QLearner.learn(). Learns from a
+    share of the episodes with a separate random number generator and sends
+    the histories back to the parent process. An exception raised while
+    learning is sent instead and raised again by the parent process.
+
+    Args:
+        learner (QLearner): The (forked) learner with a shared value function.
+        pairs (list): A list of (state, action) tuples to begin episodes from.
+        seed (np.random.SeedSequence): Seed for the worker's generator.
+        batchsize (int): See QLearner.learn().
+        algorithm (func): See QLearner.learn().
+        history (bool): See QLearner.learn().
+        conn (multiprocessing.Connection): The connection to send results to.
+    """
+    learner.random = np.random.RandomState(np.random.MT19937(seed))
+    learner.uniforms = BufferedRandom(learner.random)
+    learner._policy_stale = True
+    states = [pair[0] for pair in pairs]
+    actions = [pair[1] for pair in pairs]
+    try:
+        result = learner.learn(episodes=states, actions=actions, batchsize=batchsize,
+                               algorithm=algorithm, history=history)
+    except Exception as ex:
+        result = ex
+    conn.send(result)
+    conn.close()
@@ -0,0 +1,219 @@
+"""
+This module defines the ReplayBuffer class. It stores transitions generated
+during learning episodes so they can be learned from again without taking new
+steps in the environment (e.g. running a simulator). A transition is:
+
+    (state, action, reward, next state, terminal)
+
+where terminal is whether the next state is a goal state. Transitions are kept
+in preallocated arrays used as a ring buffer: once the buffer is full, the
+oldest transitions are overwritten.
+
+Transitions can be sampled uniformly or with priority. Prioritized sampling
+picks a transition with probability proportional to priority^alpha, where the
+priority is the absolute error of the last update made from it. New
+transitions get the largest priority seen so far. The bias from prioritized
+sampling is corrected by importance sampling weights:
+
+    weight = (size * probability) ^ -beta / max(weight)
+
+Powered priorities are kept in a sum-tree: a binary tree over transitions
+where each node is the sum of its children. Adding transitions, updating
+priorities and sampling a transition take O(log capacity) time.
+
+A buffer may be shared by several learners with the same state/action
+representation. See QLearner.replay().
+"""
+
+import numpy as np
+
+
+class ReplayBuffer:
+    """
+    A fixed-capacity ring buffer of transitions stored in numpy arrays. Arrays
+    are allocated when the first transition is added, using its shape and
+    type. So states/actions may be indices or vectors.
+
+    Args:
+        capacity (int): Maximum number of transitions stored.
+        prioritized (bool): Whether to sample transitions by priority.
+            Default False (uniform sampling).
+        alpha (float): Exponent of priorities. 0 is uniform. Default 0.6.
+        beta (float): Exponent of importance sampling weights. 0 is no
+            correction, 1 is full correction. Default 0.4.
+        epsilon (float): Added to priorities so no transition has a zero
+            probability of being sampled. Default 1e-6.
+
+    Instance Attributes:
+        capacity/prioritized/alpha/beta/epsilon: Same as args.
+        states/actions/rewards/nstates/terminals (ndarray): Arrays of
+            transitions. Only the first len(buffer) elements are valid.
+        priorities (ndarray): Priority of each transition.
+    """
+
+    def __init__(self, capacity, prioritized=False, alpha=0.6, beta=0.4,
+                 epsilon=1e-6):
+        self.capacity = int(capacity)
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        self.states = None
+        self.actions = None
+        self.rewards = np.zeros(self.capacity)
+        self.nstates = None
+        self.terminals = np.zeros(self.capacity, dtype=bool)
+        self.priorities = np.zeros(self.capacity)
+        self._max_priority = 1.
+        self._leaves = 1 << max(self.capacity - 1, 0).bit_length()
+        self._depth = self._leaves.bit_length() - 1
+        self._tree = np.zeros(2 * self._leaves)     # sums of priorities^alpha
+        self._alpha = self.alpha if prioritized else None   # alpha of _tree
+        self._next = 0          # position of the next transition to write
+        self._size = 0          # number of transitions stored
+
+
+    def __len__(self):
+        return self._size
+
+
+    def add(self, state, action, reward, nstate, terminal):
+        """
+        Stores a transition.
+
+        Args:
+            state (int/ndarray): State index or vector.
+            action (int/ndarray): Action index or vector taken from state.
+            reward (float): Reward for taking action.
+            nstate (int/ndarray): Next state index or vector.
+            terminal (bool): Whether next state is a goal state.
+        """
+        self.add_many([state], [action], [reward], [nstate], [terminal])
+
+
+    def add_many(self, states, actions, rewards, nstates, terminals):
+        """
+        Stores an array of transitions. See add().
+        """
+        states, actions, nstates = np.asarray(states), np.asarray(actions), \
+                                   np.asarray(nstates)
+        num = len(states)
+        if num == 0:
+            return
+        if self.states is None:
+            self.states = np.zeros((self.capacity,) + states.shape[1:], dtype=states.dtype)
+            self.nstates = np.zeros_like(self.states)
+            self.actions = np.zeros((self.capacity,) + actions.shape[1:],
+                                    dtype=actions.dtype)
+        # Only the last 'capacity' transitions are kept.
+        start = max(num - self.capacity, 0)
+        pos = (self._next + np.arange(num - start)) % self.capacity
+        self.states[pos] = states[start:]
+        self.actions[pos] = actions[start:]
+        self.rewards[pos] = np.asarray(rewards)[start:]
+        self.nstates[pos] = nstates[start:]
+        self.terminals[pos] = np.asarray(terminals)[start:]
+        self.priorities[pos] = self._max_priority
+        if self.prioritized:
+            self._set_tree(pos, self.priorities[pos])
+        else:
+            self._alpha = None
+        self._next = (self._next + num - start) % self.capacity
+        self._size = min(self._size + num, self.capacity)
+
+
+    def sample(self, batch_size, random=np.random):
+        """
+        Samples transitions with replacement.
+
+        Args:
+            batch_size (int): Number of transitions to sample.
+            random (np.random.RandomState): Random number generator to use.
+                Default is the numpy global generator.
+
+        Returns:
+            A tuple of (indices, states, actions, rewards, next states,
+            terminals, weights) arrays. Weights are the importance sampling
+            weights (all 1 for uniform sampling).
+        """
+        if self._size == 0:
+            raise ValueError('Cannot sample from an empty buffer.')
+        if self.prioritized:
+            if self._alpha != self.alpha:
+                self._build_tree()
+            tree = self._tree
+            values = random.uniform(0, tree[1], size=batch_size)
+            nodes = np.ones(batch_size, dtype=int)
+            for _ in range(self._depth):
+                left = 2 * nodes
+                # Rounding must not descend into an empty subtree.
+                right = (values >= tree[left]) & (tree[left + 1] > 0)
+                values = np.where(right, values - tree[left], values)
+                nodes = left + right
+            indices = np.minimum(nodes - self._leaves, self._size - 1)
+            probs = tree[indices + self._leaves] / tree[1]
+            weights = (self._size * probs) ** -self.beta
+            weights = weights / np.max(weights)
+        else:
+            indices = random.randint(self._size, size=batch_size)
+            weights = np.ones(batch_size)
+        return indices, self.states[indices], self.actions[indices], \
+               self.rewards[indices], self.nstates[indices], \
+               self.terminals[indices], weights
+
+
+    def update_priorities(self, indices, errors):
+        """
+        Sets the priorities of transitions to the absolute errors of updates
+        made from them.
+
+        Args:
+            indices (ndarray): Indices of transitions returned by sample().
+            errors (ndarray): Errors of updates from those transitions.
+        """
+        priorities = np.abs(errors) + self.epsilon
+        self.priorities[indices] = priorities
+        self._max_priority = max(self._max_priority, np.max(priorities))
+        if self._alpha == self.alpha:
+            self._set_tree(np.asarray(indices), self.priorities[indices])
+
+
+    def clear(self):
+        """
+        Removes all transitions.
+        """
+        self._next = 0
+        self._size = 0
+        self._max_priority = 1.
+        self._tree[:] = 0
+        self._alpha = self.alpha if self.prioritized else None
+
+
+    def _set_tree(self, indices, priorities):
+        """
+        Sets the priorities of transitions in the sum-tree and updates the sums
+        of their ancestors.
+
+        Args:
+            indices (ndarray): Indices of transitions.
+            priorities (ndarray): Their priorities.
+        """
+        nodes = indices + self._leaves
+        self._tree[nodes] = priorities ** self.alpha
+        for _ in range(self._depth):
+            nodes = np.unique(nodes // 2)
+            self._tree[nodes] = self._tree[2 * nodes] + self._tree[2 * nodes + 1]
+
+
+    def _build_tree(self):
+        """
+        Rebuilds the sum-tree from all priorities, e.g. after alpha changed or
+        transitions were added while not prioritized.
+        """
+        self._tree[:] = 0
+        self._tree[self._leaves:self._leaves + self._size] = \
+            self.priorities[:self._size] ** self.alpha
+        for level in range(self._depth - 1, -1, -1):
+            lo, hi = 1 << level, 2 << level
+            self._tree[lo:hi] = self._tree[2*lo:2*hi:2] + self._tree[2*lo+1:2*hi:2]
+        self._alpha = self.alpha
@@ -0,0 +1,83 @@
+"""
+This module defines the BufferedRandom class. Drawing single random numbers
+from a numpy random number generator has a large per-call overhead compared to
+drawing an array of them. Action selection policies draw one or two numbers
+every step, so learners draw uniform numbers in blocks and hand them out one
+at a time. Integers and arrays of numbers are derived from the same uniform numbers.
+
+The numbers drawn depend only on the state of the underlying generator when
+each block is drawn. So learning remains reproducible for a given seed.
+"""
+
+from itertools import islice
+import numpy as np
+
+
+BLOCK = 4096        # number of uniform numbers drawn at a time
+
+
+class BufferedRandom:
+    """
+    A source of single random numbers drawn in blocks from a generator.
+
+    Args:
+        random (np.random.RandomState): The generator to draw blocks from.
+        block (int): Number of uniform numbers drawn at a time. Default BLOCK.
+
+    Instance Attributes:
+        random/block: Same as args.
+    """
+
+    def __init__(self, random, block=BLOCK):
+        self.random = random
+        self.block = block
+        self._values = iter(())     # remaining numbers of the current block
+
+
+    def uniform(self):
+        """
+        Returns a random float in [0, 1).
+        """
+        try:
+            return next(self._values)
+        except StopIteration:
+            self._values = iter(self.random.random_sample(self.block).tolist())
+            return next(self._values)
+
+
+    def sample(self, num):
+        """
+        Returns an array of num random floats in [0, 1). The same numbers are
+        returned as by num calls to uniform().
+        """
+        values = list(islice(self._values, num))
+        need = num - len(values)
+        if need > 0:
+            blocks = self.random.random_sample(-(-need // self.block) * self.block)
+            self._values = iter(blocks[need:].tolist())
+            return np.concatenate((values, blocks[:need]))
+        return np.array(values, dtype=float)
+
+
+    def randint(self, high):
+        """
+        Returns a random integer in [0, high).
+        """
+        return int(self.uniform() * high)
+
+
+    def get_state(self):
+        """
+        Returns an array of the numbers remaining in the current block.
+        """
+        remaining = list(self._values)
+        self._values = iter(remaining)
+        return np.array(remaining, dtype=float)
+
+
+    def set_state(self, remaining):
+        """
+        Sets the numbers remaining in the current block, as returned by
+        get_state().
+        """
+        self._values = iter(np.asarray(remaining, dtype=float).tolist())
@@ -0,0 +1,197 @@
+"""
+This module defines episode schedulers. A scheduler decides the states that
+learning episodes start from, and their order. Schedulers are generators with
+the signature:
+
+    scheduler(learner, num) -> generator of up to num state indices
+
+where learner is a QLearner (or a subclass) instance. Start states are
+generated lazily so learning can begin before the whole schedule is computed.
+
+Schedulers are registered by name with the @scheduler decorator and are
+selected by QLearner.episodes(mode=...). Built-in schedulers are:
+
+* 'random' (default): Random order without replacement. The order is drawn in
+    one call to the random number generator. If only a small fraction of states
+    is needed, states are drawn with replacement and repeats are discarded,
+    so the whole state range is not shuffled.
+* 'replace': Random states with replacement, drawn in blocks.
+* 'bfs': Breadth first search from goal states along transitions.
+* 'reverse': Breadth first search from goal states against transitions i.e.
+    states in order of the number of actions needed to reach a goal state.
+* 'stratified': States grouped by the number of actions needed to reach a
+    goal state, nearest group first and random order within groups. Each group
+    is sampled in proportion to its size.
+
+A callable with the scheduler signature can be passed as a mode as well.
+"""
+
+from collections import deque
+import numpy as np
+try:
+    from algorithms.prioritizedsweeping import predecessors
+except ImportError:
+    from .algorithms.prioritizedsweeping import predecessors
+
+
+SCHEDULERS = {}
+BLOCK = 1024        # number of states drawn at a time for the 'replace' mode
+FRACTION = 0.25     # largest fraction of states the 'random' mode draws by rejection
+
+
+def scheduler(name):
+    """
+    Decorator which registers a scheduler function under a name.
+
+    Args:
+        name (str): The mode name of the scheduler.
+    """
+    def register(func):
+        SCHEDULERS[name] = func
+        return func
+    return register
+
+
+def schedule(learner, num, mode=None):
+    """
+    Returns a generator of start states from a scheduler.
+
+    Args:
+        learner (QLearner): The learner instance to schedule episodes for.
+        num (int): Number of start states to generate.
+        mode (str/func): Name of a registered scheduler or a scheduler
+            function. Default None ('random').
+
+    Returns:
+        A generator of state indices.
+    """
+    if callable(mode):
+        return mode(learner, num)
+    mode = 'random' if mode is None else mode
+    if mode not in SCHEDULERS:
+        raise ValueError('Episode mode "' + str(mode) + '" does not exist.')
+    return SCHEDULERS[mode](learner, num)
+
+
+def goal_levels(learner):
+    """
+    Groups states by the minimum number of actions needed to reach a goal
+    state from them. Levels are computed lazily, nearest first.
+
+    Args:
+        learner (QLearner): A learner with a tmatrix and goal states.
+
+    Returns:
+        A generator of arrays of state indices. The first array contains the
+        goal states. States which cannot reach a goal are not generated.
+    """
+    indptr, pairs = predecessors(learner.tmatrix, learner.num_states)
+    visited = np.zeros(learner.num_states, dtype=bool)
+    level = np.flatnonzero(learner._goal_mask)
+    visited[level] = True
+    while len(level) > 0:
+        yield level
+        # Gather the predecessors of all states in the level at once.
+        starts, ends = indptr[level], indptr[level + 1]
+        counts = ends - starts
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        preds = pairs[offsets + np.arange(np.sum(counts))] // learner.num_actions
+        level = np.unique(preds[~visited[preds]])
+        visited[level] = True
+
+
+@scheduler('random')
+def random_order(learner, num):
+    """
+    Random start states without replacement.
+    """
+    num = min(num, learner.num_states)
+    if num > FRACTION * learner.num_states:
+        yield from learner.random.permutation(learner.num_states)[:num]
+        return
+    # Sequential draws where a repeat is drawn again: the first occurrences of
+    # states, in order of draws, are a uniformly random ordered sample.
+    states = np.empty(0, dtype=int)
+    while len(states) < num:
+        states = np.concatenate(
+            [states, learner.random.randint(learner.num_states, size=num - len(states))])
+        _, first = np.unique(states, return_index=True)
+        states = states[np.sort(first)]
+    yield from states
+
+
+@scheduler('replace')
+def random_replace(learner, num):
+    """
+    Random start states with replacement.
+    """
+    while num > 0:
+        size = min(num, BLOCK)
+        yield from learner.random.randint(learner.num_states, size=size)
+        num -= size
+
+
+@scheduler('bfs')
+def breadth_first(learner, num):
+    """
+    Breadth first search of the goal states' connected neighbourhood. Once
+    exhausted, the remaining states are picked randomly from unvisited states.
+    """
+    enqueued = np.zeros(learner.num_states, dtype=bool)
+    queue = deque(learner._goals)
+    enqueued[list(queue)] = True
+    i = 0
+    while i < num and len(queue) > 0:
+        i += 1
+        state = queue.pop()
+        for n in learner.neighbours(state):
+            if not enqueued[n]:
+                enqueued[n] = True
+                queue.appendleft(n)
+        yield state
+    # If neighbourhoods of goal states are exhausted i.e. no more states
+    # that can be accessed from goal states through any actions, then
+    # generate the remainder by randomly picking from the unvisited
+    # states:
+    if i < num:
+        yield from learner.random.choice(np.arange(learner.num_states)[~enqueued],
+                                         size=num-i, replace=False)
+
+
+@scheduler('reverse')
+def reverse_reachability(learner, num):
+    """
+    States in order of the number of actions needed to reach a goal state.
+    States that cannot reach a goal state follow in random order.
+    """
+    reached = np.zeros(learner.num_states, dtype=bool)
+    for level in goal_levels(learner):
+        reached[level] = True
+        yield from level[:num]
+        num -= len(level)
+        if num <= 0:
+            return
+    unreached = np.flatnonzero(~reached)
+    yield from learner.random.permutation(unreached)[:num]
+
+
+@scheduler('stratified')
+def stratified(learner, num):
+    """
+    States grouped by the number of actions needed to reach a goal state.
+    The same fraction of each group is sampled randomly. States that cannot
+    reach a goal state form the last group.
+    """
+    fraction = num / learner.num_states
+    reached = np.zeros(learner.num_states, dtype=bool)
+    total = 0       # number of states in groups so far
+    taken = 0       # number of states sampled so far
+    for level in goal_levels(learner):
+        reached[level] = True
+        total += len(level)
+        # Rounding the running total keeps the sum of samples equal to num.
+        size = int(round(fraction * total)) - taken
+        yield from learner.random.choice(level, size=size, replace=False)
+        taken += size
+    unreached = np.flatnonzero(~reached)
+    yield from learner.random.choice(unreached, size=num - taken, replace=False)
@@ -22,19 +22,36 @@ All learners expose the following interface:
     what leads to that utility.
 * qvalue(state, action) which returns value of a state-action pair, or an array
     of values of all actions from a state if action is not specified.
+* value_many(states), qvalue_many(states, actions), recommend_many(states)
+    which are the vectorized value(), qvalue() and recommend() over arrays of
+    states.
 * learn(episodes, actions, **kwargs) which runs over multiple episodes to populate
     a utility function or matrix.
 * recommend(state, **kwargs) which recommends an action based on the learned values
     depending on the exploration vs. exploitation setting of the learner.
 * reset() which returns the value function/matrix to its initial state while
     keeping any learning parameters provided at instantiation.
+* checkpoint(fname) and restore(fname) which save and load the learning state.
+* replay(batch_size) which learns from transitions stored in a ReplayBuffer.
+* solve(method) which solves for weights from a batch of transitions by
+    least squares (LSTD-Q/LSPI).
+* set_profiling(enable) which records calls and time of each phase of learning.
 """
 
+from functools import lru_cache
 import numpy as np
 try:
-    from flearner import FLearner
+    import schedulers
+    import features
+    from features import Linear
+    from rng import BufferedRandom
+    from flearner import FLearner, RECENT
 except ImportError:
-    from .flearner import FLearner
+    from . import schedulers
+    from . import features
+    from .features import Linear
+    from .rng import BufferedRandom
+    from .flearner import FLearner, RECENT
 
 
 
@@ -60,13 +77,14 @@ class SLearner(FLearner):
                 float = func(state_vec, action_vec, weights_vec)
             Where [state|action_weights]_vec are arrays. The returned array
             can be of any length, where each element is a combination of the
-            state/action variables.
+            state/action variables. If None (and features is None), func is
+            dfunc . weights and the approximation is linear. See FLearner.
         dfunc (func): The derivative of func with respect to weights. Same
             input signature as func. Returns 'funcdim` elements in returned array.
         funcdim (int): The dimension of the weights to learn. Defaults to
             dimension of func.
-        goal (list/tuple/set/array/function): Indices of goal states in rmatrix
-            OR a function that accepts a state vector and returns true if goal.
+        goal (list/tuple/set/array/function): Goal state vectors OR a function
+            that accepts a state vector and returns true if goal.
         lrate (float): Learning rate for q-learning.
         discount (float): Discount factor for q-learning.
         policy (str): The action selection policy. Used durung learning/
@@ -80,26 +98,41 @@ class SLearner(FLearner):
             is None.
         stepsize (func): A function that takes a state and returns a number
             indicating the simulator step size. By default returns None.
+        dtype (type): Numeric type of weights e.g. np.float32. Default float.
+        memory (ReplayBuffer): A buffer where transitions simulated during
+            learning are stored for replay(). Default None.
+        batchgoal (bool): Whether goal is a function over a [states x
+            variables] array of state vectors returning a boolean array. See
+            set_goal(). Default False.
+        trace (float): Decay (lambda) of eligibility traces in [0, 1] for
+            learn(algorithm='treebackup'). Default 0.8.
+        features (func): A vectorized approximation linear in weights used
+            instead of func/dfunc. See FLearner. Default None.
         **kwargs: Any number of other keyword arguments. These are passed to
             simulator.run() when next_state() is called.
 
     Instance Attributes:
-        goal (func): Takes a state number (int) and returns bool whether it is
-            a goal state or not.
-        mode/policy/lrate/discount/simulator/depth: Same as args.
+        goal (func): Takes a state vector and returns bool whether it is a goal
+            state or not.
+        mode/policy/lrate/discount/simulator/depth/dtype/memory/trace/features:
+            Same as args.
         random (np.random.RandomState): A random number generator local to this
             instance.
+        uniforms (BufferedRandom): Single random numbers drawn in blocks from
+            random for action selection.
         weights (ndarray): The coefficients of the function provided.
     """
 
     def __init__(self, reward, simulator, stateconverter, actionconverter, goal,
                  func, funcdim, dfunc, lrate=0.25, discount=1,
                  policy='uniform', depth=None, steps=1, seed=None,
-                 stepsize=lambda x:None, **kwargs):
+                 stepsize=lambda x:None, dtype=float, memory=None,
+                 batchgoal=False, trace=0.8, features=None, **kwargs):
         if seed is None:
             self.random = np.random.RandomState()
         else:
             self.random = np.random.RandomState(seed)
+        self.uniforms = BufferedRandom(self.random)
 
         self.simulator = simulator
 
@@ -108,18 +141,32 @@ class SLearner(FLearner):
         self.depth = stateconverter.num_states if depth is None else depth
         self.steps = steps
         self.stepsize = stepsize
+        self.dtype = np.dtype(dtype)
+        self.memory = memory
+        self.trace = trace
 
         self.funcdim = funcdim
-        self.func = func
-        self.dfunc = dfunc
-        self.weights = np.ones(self.funcdim)
+        if func is None and features is None:
+            features = Linear(stateconverter, actionconverter, dfunc)
+        self.features = features
+        self.func = self._features_func if func is None else func
+        self.dfunc = self._features_dfunc if dfunc is None else dfunc
+        self.weights = np.ones(self.funcdim, dtype=self.dtype)
 
         self.stateconverter = stateconverter
         self.actionconverter = actionconverter
         self._avecs = [avec for avec in self.actionconverter]
+        self.cache = False
+        self._create_tables()
+
+        self._dirty = set()         # states updated since last _update_policy()
+        self._track_dirty = False   # whether updates are added to _dirty
+        self._deltas = None         # sizes of updates when recording metrics
+        self.metrics = []           # per-episode metrics of last learn()
+        self.profiler = None        # records time of learning phases if set
 
         self._reward = reward
-        self.set_goal(goal)
+        self.set_goal(goal, batchgoal)
         self.set_action_selection_policy(policy, mode=SLearner.ONLINE, **kwargs)
 
     @property
@@ -131,39 +178,67 @@ class SLearner(FLearner):
         return self.actionconverter.num_states
 
 
-    def set_goal(self, goal):
+    def set_goal(self, goal, batchgoal=False):
         """
-        Sets a function that checks if a state is a goal state or not.
+        Sets a function that checks if a state is a goal state or not. Goal
+        checks over batches of state vectors are done by goal_many().
 
         Args:
             goal (list/tuple/set/array/function): Goal state vectors.
                 OR a function that accepts a state vector and returns true if
                 goal.
+            batchgoal (bool): Whether the goal function accepts a [states x
+                variables] array of state vectors and returns a boolean array
+                instead. Default False.
         """
         if isinstance(goal, (np.ndarray, list, tuple, set)):
-            # self._goals = set(goal)
-            self.goal = lambda x: x in goal
+            goals = np.asarray(list(goal), dtype=float).reshape(len(goal), -1)
+            self._goal_batch = lambda svecs: \
+                np.any(np.all(svecs[:, None, :] == goals, axis=-1), axis=-1)
+        elif callable(goal) and batchgoal:
+            self._goal_batch = goal
         elif callable(goal):
-            # self._goals = set([g for g in self.stateconverter if goal(g)])
+            self._goal_batch = lambda svecs: \
+                np.fromiter((goal(s) for s in svecs), dtype=bool, count=len(svecs))
             self.goal = goal
+            return
         else:
             raise TypeError('Provide goal as list/set/array/tuple/function.')
+        self.goal = lambda svec: \
+            bool(self._goal_batch(np.asarray(svec, dtype=float).reshape(1, -1))[0])
+
+
+    def goal_many(self, svecs):
+        """
+        Vectorized goal() for an array of state vectors.
+
+        Args:
+            svecs (ndarray): A [states x variables] array of state vectors.
+
+        Returns:
+            A boolean array, True where a state is a goal state.
+        """
+        return np.asarray(self._goal_batch(np.asarray(svecs, dtype=float)), dtype=bool)
 
 
-    def episodes(self, coverage=1., **kwargs):
+    def episodes(self, coverage=1., mode=None):
         """
         Provides a sequence of states for learning episodes to start from.
 
         Args:
             coverage (float): Fraction of states to generate for episodes.
                 Default= 1. Range [0, 1].
+            mode (str/func): 'random' or 'replace' (with replacement) or a
+                scheduler function. Modes that search the transition matrix
+                are not possible. See schedulers module. Default None
+                (random selection without replacement).
 
         Returns:
             A generator of of state vectors.
         """
         num = int(self.num_states * coverage)
-        for _ in range(num):
-            yield self.stateconverter.decode(self.random.choice(self.num_states))
+        for state in schedulers.schedule(self, num, mode):
+            yield self.stateconverter.decode(state)
 
 
     def reward(self, svec, avec, next_svec, **kwargs):
@@ -213,6 +288,22 @@ class SLearner(FLearner):
         return (ans[0], self._avecs[ans[1]])
 
 
+    def value_many(self, svecs):
+        """
+        Vectorized value() for an array of states.
+
+        Args:
+            svecs (ndarray): A [states x variables] array of state vectors. OR
+                an array of state indices.
+
+        Returns:
+            A tuple of an array of values and a [states x variables] array of
+            the most rewarding next action vectors.
+        """
+        values, actions = super().value_many(svecs)
+        return values, np.asarray(self._avecs)[actions]
+
+
     def qvalue(self, svec, avec=None):
         """
         The q-value of state, action pair.
@@ -225,6 +316,11 @@ class SLearner(FLearner):
             The qvalue of state,action if action is specified. Else returns the
             qvalues of all actions from a state (ndarray).
         """
+        if self.features is not None:
+            phi = self._svec_features(svec)
+            if avec is not None:
+                phi = features.take(phi, self._action_indices([avec])[0])
+            return features.dot(phi, self.weights)
         if avec is not None:
             return self.func(svec, avec, self.weights)
         else:
@@ -235,14 +331,24 @@ class SLearner(FLearner):
     def update(self, svec, avec, error):
         """
         Updates weights given state, action, and error in current and next
-        value estimate.
+        value estimate. With sparse features, only the weights of active
+        features are changed.
 
         Args:
             svec (ndarray/list/tuple): Vector of state variables.
             avec (ndarray/list/tuple): Vector of action variables.
             error (float): Error term (current value - next estimate)
         """
-        self.weights -= self.lrate * error * self.dfunc(svec, avec, self.weights)
+        if self.features is not None:
+            phi = features.take(self._svec_features(svec),
+                                self._action_indices([avec])[0])
+            change = features.add(self.weights, phi, -self.lrate * error)
+        else:
+            delta = self.lrate * error * self.dfunc(svec, avec, self.weights)
+            self.weights -= delta
+            change = np.max(np.abs(delta))
+        if self._deltas is not None:
+            self._deltas.append(change)
 
 
     def recommend(self, svec):
@@ -255,3 +361,40 @@ class SLearner(FLearner):
             The action vector corresponding to the most valuable action.
         """
         return self.actionconverter.decode(super().recommend(svec))
+
+
+    def recommend_many(self, svecs):
+        """
+        Vectorized recommend() for an array of states.
+
+        Args:
+            svecs (ndarray): A [states x variables] array of state vectors.
+
+        Returns:
+            A [states x variables] array of the most valuable action vectors.
+        """
+        return self.actionconverter.decode_many(super().recommend_many(svecs))
+
+
+    def _create_tables(self):
+        """
+        See FLearner._create_tables(). Features of the last RECENT state
+        vectors are memoized by their values.
+        """
+        super()._create_tables()
+        if self.features is not None:
+            self._recent = lru_cache(maxsize=RECENT)(self._key_features)
+
+
+    def _svec_features(self, svec):
+        """
+        Returns the [actions x ...] features of a state vector.
+        """
+        return self._recent(tuple(np.asarray(svec, dtype=float).tolist()))
+
+
+    def _key_features(self, key):
+        phi = self._features_of(np.array(key))
+        for part in (phi if isinstance(phi, tuple) else (phi,)):
+            part.setflags(write=False)
+        return phi
@@ -0,0 +1,179 @@
+"""
+This module defines the SparseMatrix class. It is a row-lazy replacement for
+dense [r|q]matrices of tabular learners over very large state spaces. Rows are
+only stored in memory once a value in them is written to. Reading an unwritten
+row returns a row filled with a default value.
+
+    SparseMatrix[state, action] == fill      if state has not been written to
+
+The fill can also be a row of values (one per column), for e.g. tables
+derived from a SparseMatrix where unwritten rows are all the same row.
+
+A SparseMatrix supports the indexing used by the learners:
+
+* matrix[state] and matrix[state, :] for the row of a state,
+* matrix[state, action] for a single element,
+* matrix[states, actions] and matrix[states] for arrays of indices,
+* matrix[state, action] = value and matrix[state, action] -= value,
+* add_at((states, actions), values) for unbuffered vectorized additions.
+"""
+
+import numpy as np
+
+
+class SparseMatrix:
+    """
+    A 2D matrix which only materializes rows that have been written to. The
+    materialized rows are stored contiguously in a block that grows as needed.
+
+    Args:
+        shape (tuple): The (rows, columns) dimensions of the matrix.
+        fill (float/ndarray): The value of elements in rows not materialized.
+            OR a row of values of each column. Default 0.
+        dtype (type): Data type of elements. Default float.
+        rows (dict): Optional mapping of row index -> row values to
+            materialize at instantiation. For e.g. rewards of a few special
+            states when all other states have the same reward (fill).
+
+    Instance Attributes:
+        shape/fill/dtype: Same as args.
+    """
+
+    def __init__(self, shape, fill=0., dtype=float, rows=None):
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.dtype = np.dtype(dtype)
+        self.fill = fill if np.ndim(fill) == 0 else np.asarray(fill, dtype=self.dtype)
+        self._index = np.full(self.shape[0], -1,
+                              dtype=np.int32 if self.shape[0] < 2**31 else np.int64)
+        self._rows = np.zeros(1, dtype=int)         # row index of each position
+        self._data = np.zeros((1, self.shape[1]), dtype=self.dtype)
+        self._size = 0                              # number of materialized rows
+        if rows is not None:
+            for row, values in rows.items():
+                self[row] = values
+
+
+    def __len__(self):
+        return self.shape[0]
+
+
+    @property
+    def ndim(self):
+        """Number of dimensions (2)."""
+        return 2
+
+
+    @property
+    def nbytes(self):
+        """Bytes used to store the materialized rows and the row index."""
+        return self._data.nbytes + self._rows.nbytes + self._index.nbytes
+
+
+    def __array__(self, dtype=None, copy=None):
+        return self.toarray() if dtype is None else self.toarray().astype(dtype)
+
+
+    def __getitem__(self, key):
+        rows, cols = self._key(key)
+        pos = self._index[rows]
+        if np.ndim(pos) == 0:
+            if pos < 0:
+                return np.full(self.shape[1], self.fill, dtype=self.dtype)[cols]
+            return self._data[pos, cols]
+        values = self._data[np.maximum(pos, 0), cols]
+        missing = pos < 0
+        missing = missing.reshape(missing.shape + (1,) * (values.ndim - missing.ndim))
+        fill = self.fill if np.ndim(self.fill) == 0 else self.fill[cols]
+        return np.where(missing, fill, values).astype(self.dtype, copy=False)
+
+
+    def __setitem__(self, key, value):
+        rows, cols = self._key(key)
+        pos = self._materialize(rows)     # may reallocate self._data
+        self._data[pos, cols] = value
+
+
+    def add_at(self, key, values):
+        """
+        Unbuffered in-place addition like numpy.add.at i.e. values for repeated
+        indices are accumulated.
+
+        Args:
+            key (tuple): A tuple of (row indices, column indices).
+            values (float/ndarray): Values to add.
+        """
+        rows, cols = self._key(key)
+        pos = self._materialize(rows)
+        np.add.at(self._data, (pos, cols), values)
+
+
+    def rows(self):
+        """
+        Returns an array of the indices of materialized rows.
+        """
+        return self._rows[:self._size].copy()
+
+
+    def toarray(self):
+        """
+        Returns a dense ndarray copy of the matrix.
+        """
+        dense = np.full(self.shape, self.fill, dtype=self.dtype)
+        dense[self._rows[:self._size]] = self._data[:self._size]
+        return dense
+
+
+    def copy(self):
+        """
+        Returns a copy of the matrix.
+        """
+        new = SparseMatrix(self.shape, self.fill, self.dtype)
+        new._index = self._index.copy()
+        new._rows = self._rows[:max(self._size, 1)].copy()
+        new._data = self._data[:max(self._size, 1)].copy()
+        new._size = self._size
+        return new
+
+
+    def _key(self, key):
+        """
+        Splits an index into row and column indices.
+        """
+        rows, cols = key if isinstance(key, tuple) else (key, slice(None))
+        if isinstance(rows, slice):
+            rows = np.arange(self.shape[0])[rows]
+        return rows, cols
+
+
+    def _materialize(self, rows):
+        """
+        Allocates storage for rows not yet materialized.
+
+        Args:
+            rows (int/ndarray): Row indices.
+
+        Returns:
+            The positions of rows in the storage block.
+        """
+        pos = self._index[rows]
+        if np.ndim(pos) == 0:
+            if pos >= 0:
+                return pos
+            new = np.array([rows])
+        else:
+            if np.all(pos >= 0):
+                return pos
+            new = np.unique(np.asarray(rows)[pos < 0])
+        end = self._size + len(new)
+        if end > len(self._data):
+            capacity = max(end, 2 * len(self._data))
+            data = np.empty((capacity, self.shape[1]), dtype=self.dtype)
+            data[:self._size] = self._data[:self._size]
+            indices = np.empty(capacity, dtype=int)
+            indices[:self._size] = self._rows[:self._size]
+            self._data, self._rows = data, indices
+        self._data[self._size:end] = self.fill
+        self._rows[self._size:end] = new
+        self._index[new] = np.arange(self._size, end)
+        self._size = end
+        return self._index[rows]
@@ -11,6 +11,7 @@ try:
 except ImportError:
     from .linsim import Netlist
     from .linsim import Simulator
+    from .linsim import Directive
 
 
 def create_sim_env(size, random):
@@ -3,19 +3,36 @@ Tests for the qlearn package.
 """
 
 import os
+import sys
+import json
+import time
+import warnings
+import multiprocessing
 import numpy as np
 try:
+    import utils
     from qlearner import QLearner
     from flearner import FLearner
     from slearner import SLearner
     from testbench import TestBench
     from linsim import FlagGenerator
+    from sparse import SparseMatrix
+    from replay import ReplayBuffer
+    from rng import BufferedRandom
+    from features import Polynomial, RBF, TileCoding
+    from algorithms import batchnstep
 except ImportError:
+    from . import utils
     from .qlearner import QLearner
     from .flearner import FLearner
     from .slearner import SLearner
     from .testbench import TestBench
     from .linsim import FlagGenerator
+    from .sparse import SparseMatrix
+    from .replay import ReplayBuffer
+    from .rng import BufferedRandom
+    from .features import Polynomial, RBF, TileCoding
+    from .algorithms import batchnstep
 
 NUM_TESTS = 0
 TESTS_PASSED = 0
@@ -101,8 +118,39 @@ def test_instantiation():
     l = set(temp.episodes(coverage=1.0, mode='bfs'))
     assert l == set(range(temp.num_states)), 'Full episode coverage failed.'
 
+    # Test 7: Binary, memory-mapped File I/O
+    np.save('test.npy', rmatrix_rec)
+    np.savez('test.npz', tmatrix)
+    np.savetxt('test.dat', tmatrix)
+    temp = QLearner('test.npy', goal_f, 'test.npz')
+    assert isinstance(temp.rmatrix, np.memmap), 'R matrix not memory-mapped.'
+    assert np.array_equal(temp.rmatrix, rmatrix_rec), "R matrix not equal to file."
+    assert np.array_equal(temp.tmatrix, tmatrix), "T matrix not equal to file."
+    temp.qmatrix[:] = 1
+    temp.learn(coverage=0.2)
+    utils.save_matrix(temp.qmatrix, 'test.npy')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        temp.set_transition_matrix('test.dat')
+    np.savetxt('test.txt', tmatrix + 0.5)
+    try:
+        temp.set_transition_matrix('test.txt')
+        raise AssertionError('Non-integer text T matrix accepted.')
+    except TypeError:
+        pass
+    os.remove('test.txt')
+    temp.set_rq_matrix(rmatrix_rec, qmatrix='test.npy')
+    assert np.array_equal(temp.tmatrix, tmatrix), "T matrix not equal to text file."
+    assert np.array_equal(temp.qmatrix, utils.read_matrix('test.npy')), \
+        "Q matrix not equal to file."
+    temp.learn(coverage=0.2)
+    assert not np.array_equal(temp.qmatrix, utils.read_matrix('test.npy')), \
+        "Q matrix file modified."
+
     # Finalize
     os.remove('test.dat')
+    os.remove('test.npy')
+    os.remove('test.npz')
 
 
 @test
@@ -155,6 +203,1005 @@ def test_online_learning():
     QLEARNER.learn()
 
 
+@test
+def test_batch_learning():
+    """
+    Testing lockstep batched-episode learning.
+    """
+    t1 = TestBench(size=5, seed=0, steps=3)
+    t2 = TestBench(size=5, seed=0, steps=3)
+    starts = [3, 7, 20, 11]
+
+    # Test 1: A batch of one episode is the same as variablenstep
+    h1, a1 = t1.learner.learn(episodes=starts, history=True)
+    h2, a2 = [], []
+    for s in starts:
+        states, actions = batchnstep(t2.learner, [s], history=True)
+        h2.extend(states)
+        a2.extend(actions)
+    assert h1 == h2 and a1 == a2, 'Batch histories not equal to sequential.'
+    assert np.allclose(t1.learner.qmatrix, t2.learner.qmatrix), \
+        'Batch q-matrix not equal to sequential.'
+    # Provided actions and a stepsize of one state at a time
+    stepsize = lambda s: 2 if s % 2 else 1
+    t3 = TestBench(size=5, seed=0, steps=3, stepsize=stepsize)
+    t4 = TestBench(size=5, seed=0, steps=3, stepsize=stepsize)
+    h3, a3 = t3.learner.learn(episodes=starts, actions=[0, 1, 2, 3], history=True)
+    h4, a4 = [], []
+    for s, a in zip(starts, [0, 1, 2, 3]):
+        states, actions = batchnstep(t4.learner, [s], [a], history=True)
+        h4.extend(states)
+        a4.extend(actions)
+    assert h3 == h4 and a3 == a4, 'Batch with actions not equal to sequential.'
+    t4.learner.learn(batchsize=4)
+
+    # Test 2: Repeated pairs in update_many are the same as sequential updates
+    qmatrix = np.copy(t1.learner.qmatrix)
+    states, actions = np.array([1, 2, 1, 1]), np.array([0, 1, 0, 0])
+    targets = np.array([1., 2., 3., 4.])
+    t1.learner.update_many(states, actions, qmatrix[states, actions] - targets)
+    for s, a, g in zip(states, actions, targets):
+        t2.learner.update(s, a, t2.learner.qvalue(s, a) - g)
+    assert np.allclose(t1.learner.qmatrix, t2.learner.qmatrix), \
+        'Repeated batch updates not equal to sequential.'
+
+    # Test 3: Batches of episodes for all policies/modes
+    for policy, mode in [(QLearner.UNIFORM, QLearner.OFFLINE),
+                         (QLearner.GREEDY, QLearner.OFFLINE),
+                         (QLearner.SOFTMAX, QLearner.OFFLINE),
+                         (QLearner.GREEDY, QLearner.ONLINE),
+                         (QLearner.SOFTMAX, QLearner.ONLINE)]:
+        t1.learner.set_action_selection_policy(policy, mode, max_prob=0.5)
+        t1.learner.reset()
+        histories, actions = t1.learner.learn(batchsize=8, history=True)
+        assert len(histories) == t1.num_states, 'Missing batch episodes.'
+        assert all(len(h) + 1 == len(a) for h, a in zip(histories, actions)),\
+            'State and action histories mismatched.'
+        assert all(t1.learner.goal(h[-1]) for h in histories \
+                   if len(h) < t1.learner.depth), 'Episode ended before goal.'
+        assert np.any(t1.learner.qmatrix != 0), 'Q-matrix not updated.'
+
+
+@test
+def test_sparse_matrix():
+    """
+    Testing sparse q/r matrix storage.
+    """
+    # Test 1: Indexing
+    mat = SparseMatrix((10, 3), fill=-1, rows={2: [1, 2, 3]})
+    assert np.array_equal(mat[2], [1, 2, 3]) and np.array_equal(mat[0], [-1]*3),\
+        'Row indexing incorrect.'
+    mat[5, 1] -= 1
+    mat.add_at(([5, 5, 7], [0, 0, 2]), [1, 1, 1])
+    assert mat[5, 1] == -2 and mat[5, 0] == 1 and mat[7, 2] == 0, \
+        'Element assignment incorrect.'
+    assert np.array_equal(mat[[0, 5, 2], [0, 1, 2]], [-1, -2, 3]), \
+        'Fancy indexing incorrect.'
+    assert np.array_equal(sorted(mat.rows()), [2, 5, 7]), \
+        'Unwritten rows materialized.'
+    assert np.array_equal(np.array(mat)[5], mat[5]), 'Dense conversion incorrect.'
+
+    # Test 2: Sparse learning is the same as dense learning
+    t1 = TestBench(size=5, seed=0, steps=2)
+    t2 = TestBench(size=5, seed=0, steps=2, sparse=True)
+    t1.learner.learn(coverage=0.5)
+    t2.learner.learn(coverage=0.5)
+    assert isinstance(t2.learner.qmatrix, SparseMatrix), 'Q-matrix not sparse.'
+    assert np.allclose(t1.learner.qmatrix, t2.learner.qmatrix.toarray()), \
+        'Sparse q-matrix not equal to dense.'
+    t2.learner.learn(coverage=0.5, batchsize=4)
+    t2.learner.reset()
+    assert len(t2.learner.qmatrix.rows()) == 0, 'Sparse q-matrix not reset.'
+
+    # Test 3: OFFLINE policy caches only keep rows of materialized states
+    t1 = TestBench(size=6, seed=0, steps=2, policy=QLearner.SOFTMAX)
+    t2 = TestBench(size=6, seed=0, steps=2, policy=QLearner.SOFTMAX, sparse=True)
+    h1, _ = t1.learner.learn(coverage=0.5, history=True)
+    h2, _ = t2.learner.learn(coverage=0.5, history=True)
+    probs = t2.learner._action_param['alias_probs']
+    assert isinstance(probs, SparseMatrix) and \
+           len(probs.rows()) <= len(t2.learner.qmatrix.rows()) < t2.num_states, \
+        'Sparse policy cache rows not limited to materialized states.'
+    assert h1 == h2 and np.allclose(t1.learner._action_param['alias_probs'], probs), \
+        'Sparse policy cache not equal to dense.'
+    t2.learner.checkpoint('test_sparse')
+    t3 = TestBench(size=6, seed=0, steps=2, sparse=True)
+    t3.learner.restore('test_sparse.npz')
+    os.remove('test_sparse.npz')
+    assert isinstance(t3.learner._action_param['alias_indices'], SparseMatrix) and \
+           np.array_equal(t2.learner._action_param['alias_indices'],
+                          t3.learner._action_param['alias_indices']), \
+        'Sparse policy cache not restored.'
+
+
+@test
+def test_policy_cache():
+    """
+    Testing incremental OFFLINE policy cache updates.
+    """
+    t = TestBench(size=6, seed=0, steps=2)
+    for policy, key in [(QLearner.GREEDY, 'max_util_indices'),
+                        (QLearner.SOFTMAX, 'alias_probs')]:
+        t.learner.set_action_selection_policy(policy, max_prob=0.8)
+        t.learner.reset()
+        t.learner.learn(coverage=0.5)
+        t.learner.learn(episodes=[0, 1, 2], mode=QLearner.ONLINE)
+        assert len(t.learner._dirty) == 0, 'ONLINE updated states tracked.'
+        t.learner.learn(coverage=0.5, batchsize=4, mode=QLearner.OFFLINE)
+        assert len(t.learner._dirty) > 0, 'Updated states not tracked.'
+        t.learner._update_policy()
+        cache = np.copy(t.learner._action_param[key])
+        assert len(t.learner._dirty) == 0, 'Updated states not cleared.'
+        t.learner._policy_stale = True
+        t.learner._update_policy()
+        assert np.allclose(cache, t.learner._action_param[key]), \
+            'Incremental policy not equal to full update.'
+
+
+@test
+def test_parallel_learning():
+    """
+    Testing shared-memory multi-process learning.
+    """
+    t = TestBench(size=6, seed=0, steps=2, policy=QLearner.GREEDY, max_prob=0.8)
+    qmatrix = t.learner.qmatrix
+    episodes = list(t.learner.episodes())
+    histories, actions = t.learner.learn(episodes=episodes, processes=3,
+                                         history=True)
+    assert t.learner.qmatrix is qmatrix, 'Q-matrix not restored.'
+    assert np.any(qmatrix != 0), 'Q-matrix not updated by workers.'
+    assert len(histories) == len(episodes), 'Missing parallel episodes.'
+    assert all(t.learner.next_state(s, a[0]) == h[0] for s, h, a in \
+               zip(episodes, histories, actions) if len(h)), \
+        'Histories not in order of episodes.'
+    histories, _ = t.learner.learn(episodes=episodes, processes=2, batchsize=4)
+    assert len(histories) == len(episodes), 'Missing parallel batch episodes.'
+
+    # Test 2: A failing worker stops the others
+    def failing(learner, state, action, history=False):
+        if state == episodes[0]:
+            raise RuntimeError('Worker failed.')
+        time.sleep(60)
+        return 0, state
+    start = time.time()
+    try:
+        t.learner.learn(episodes=episodes[:2], processes=2, algorithm=failing)
+        raise AssertionError('Worker error not raised.')
+    except RuntimeError:
+        pass
+    assert time.time() - start < 30 and len(multiprocessing.active_children()) == 0,\
+        'Workers not stopped after an error.'
+    assert t.learner.qmatrix is qmatrix, 'Q-matrix not restored after an error.'
+
+
+@test
+def test_dtype():
+    """
+    Testing reduced precision value tables and weights.
+    """
+    # Test 1: dtype is carried through tables and caches
+    t64 = TestBench(size=8, seed=0, steps=2, policy=QLearner.GREEDY, max_prob=0.8)
+    t32 = TestBench(size=8, seed=0, steps=2, policy=QLearner.GREEDY, max_prob=0.8,
+                    dtype=np.float32)
+    t16 = TestBench(size=8, seed=0, steps=2, policy=QLearner.SOFTMAX,
+                    dtype=np.float16, sparse=True)
+    t64.learner.learn()
+    t32.learner.learn()
+    t16.learner.learn(batchsize=8)
+    assert t32.learner.qmatrix.dtype == np.float32, 'Q-matrix dtype not set.'
+    assert t16.learner.qmatrix.dtype == np.float16 and \
+           t16.learner._action_param['alias_probs'].dtype == np.float16, \
+        'Sparse q-matrix or policy cache dtype not set.'
+
+    # Test 2: float32 learning is close to float64
+    assert np.allclose(t64.learner.qmatrix, t32.learner.qmatrix, atol=1e-4), \
+        'float32 q-matrix not close to float64.'
+    t32.learner.reset()
+    assert t32.learner.qmatrix.dtype == np.float32, 'Reset q-matrix dtype not set.'
+
+    # Test 3: Function approximation weights
+    def dfunc(s, a, w):
+        return np.array([s[0]*a[0], s[1]*a[1], 1])
+    t = TestBench(size=5, seed=0, learner=FLearner, func=lambda s, a, w: \
+                  np.dot(w, dfunc(s, a, w)), dfunc=dfunc, funcdim=3,
+                  lrate=0.01, dtype=np.float32)
+    t.learner.learn(coverage=0.5)
+    assert t.learner.weights.dtype == np.float32, 'Weights dtype not set.'
+
+
+@test
+def test_sweep():
+    """
+    Testing prioritized sweeping on the transition/reward model.
+    """
+    # Test 1: Converges to the Bellman optimality equation
+    t = TestBench(size=8, seed=0)
+    backups = t.learner.sweep(tolerance=1e-8)
+    learner = t.learner
+    terminal = np.isin(np.arange(learner.num_states), list(learner._goals))
+    values = np.where(terminal, 0, np.max(learner.qmatrix, axis=1))
+    error = learner.rmatrix + learner.discount * values[learner.tmatrix] \
+            - learner.qmatrix
+    assert np.max(np.abs(error)) <= 1e-8, 'Q-matrix did not converge.'
+    assert backups < learner.num_states * learner.num_actions * 10, \
+        'Too many backups.'
+
+    # Test 2: Greedy recommendations reach a goal from every state
+    for state in range(learner.num_states):
+        for _ in range(learner.num_states):
+            if learner.goal(state):
+                break
+            state = learner.next_state(state, learner.recommend(state))
+        assert learner.goal(state), 'Goal not reached after sweeping.'
+
+    # Test 3: Sparse q-matrix and warm start
+    t = TestBench(size=8, seed=0, sparse=True)
+    t.learner.learn(coverage=0.5)
+    t.learner.sweep(tolerance=1e-8)
+    assert np.allclose(t.learner.qmatrix.toarray(), learner.qmatrix), \
+        'Sparse sweep not equal to dense.'
+    assert t.learner.sweep(tolerance=1e-8) == 0, 'Converged q-matrix backed up.'
+
+
+@test
+def test_solve():
+    """
+    Testing value and policy iteration on the transition/reward model.
+    """
+    t = TestBench(size=8, seed=0)
+    t.learner.sweep(tolerance=1e-10)
+    qmatrix = np.copy(t.learner.qmatrix)
+    for method in ('value', 'policy'):
+        t.learner.reset()
+        t.learner.solve(method=method, tolerance=1e-10)
+        assert np.allclose(t.learner.qmatrix, qmatrix), \
+            method + ' iteration not equal to sweeping.'
+    # Warm start for learning and recommendations
+    t.learner.set_action_selection_policy(QLearner.GREEDY, max_prob=0.9)
+    t.learner.learn(coverage=0.5)
+    assert t.learner.solve(tolerance=1e-10) < 8, 'Solution not warm-started.'
+    assert t.learner.recommend(0) == np.argmax(qmatrix[0]), \
+        'Recommendation not from solution.'
+
+
+@test
+def test_batched_queries():
+    """
+    Testing vectorized value/qvalue/recommend over arrays of states.
+    """
+    # Test 1: Tabular learner
+    t = TestBench(size=6, seed=0)
+    t.learner.learn(coverage=0.5)
+    states = np.arange(t.num_states)
+    values, actions = t.learner.value_many(states)
+    assert np.array_equal(values, [t.learner.value(s)[0] for s in states]) and \
+           np.array_equal(actions, [t.learner.value(s)[1] for s in states]), \
+        'Batched values not equal.'
+    assert np.array_equal(t.learner.recommend_many(states),
+                          [t.learner.recommend(s) for s in states]), \
+        'Batched recommendations not equal.'
+
+    # Test 2: Function approximation with state indices and vectors
+    def dfunc(s, a, w):
+        return np.array([s[0]*a[0], s[1]*a[1], s[0]*a[1], 1])
+    t = TestBench(size=5, seed=0, learner=FLearner, func=lambda s, a, w: \
+                  np.dot(w, dfunc(s, a, w)), dfunc=dfunc, funcdim=4, lrate=0.01)
+    t.learner.learn(coverage=0.5)
+    states = np.arange(t.num_states)
+    svecs = t.learner.stateconverter.decode_many(states)
+    qvals = np.array([t.learner.qvalue(s) for s in states])
+    assert np.allclose(t.learner.qvalue_many(states), qvals) and \
+           np.allclose(t.learner.qvalue_many(svecs), qvals), \
+        'Batched function q-values not equal.'
+    assert np.allclose(t.learner.qvalue_many(states, states % 4),
+                       qvals[states, states % 4]), \
+        'Batched function state-action q-values not equal.'
+    assert np.array_equal(t.learner.recommend_many(states),
+                          [t.learner.recommend(s) for s in states]), \
+        'Batched function recommendations not equal.'
+
+
+@test
+def test_episode_schedulers():
+    """
+    Testing episode start state schedulers.
+    """
+    t = TestBench(size=8, seed=0)
+    learner = t.learner
+    # Test 1: All states once, in the right order
+    for mode in (None, 'bfs', 'reverse', 'stratified'):
+        states = list(learner.episodes(mode=mode))
+        assert sorted(states) == list(range(learner.num_states)), \
+            str(mode) + ' schedule does not cover states once.'
+        assert len(list(learner.episodes(coverage=0.3, mode=mode))) == \
+               int(learner.num_states * 0.3), str(mode) + ' coverage incorrect.'
+    states = list(learner.episodes(mode='reverse'))
+    assert set(states[:len(learner._goals)]) == learner._goals, \
+        'Reverse schedule does not start at goal states.'
+    # Each state is one action away from a state earlier in the schedule
+    order = np.argsort(states)
+    assert all(np.min(order[learner.tmatrix[s]]) < order[s] \
+               for s in states[len(learner._goals):]), \
+        'Reverse schedule not in order of distance to goal.'
+    assert len(list(learner.episodes(coverage=0.5, mode='replace'))) == \
+           learner.num_states // 2, 'Schedule with replacement incorrect.'
+    # A small coverage of many states is drawn without shuffling all states
+    big = QLearner(SparseMatrix((10**6, 2)), goal=[0], seed=0,
+                   tmatrix=np.zeros((10**6, 2), dtype=np.int8))
+    states = list(big.episodes(coverage=1e-3))
+    big.random.seed(0)
+    assert len(set(states)) == 1000 and 0 <= min(states) and \
+           max(states) < big.num_states and states == list(big.episodes(coverage=1e-3)),\
+        'Small random schedule incorrect.'
+
+    # Test 2: Custom scheduler
+    histories, _ = learner.learn(coverage=0.1,
+                                 ep_mode=lambda l, num: iter(range(num)))
+    assert len(histories) == 6, 'Custom scheduler not used.'
+
+
+@test
+def test_convergence():
+    """
+    Testing early stopping of learning and per-episode metrics.
+    """
+    t = TestBench(size=6, seed=0, steps=2, policy=QLearner.GREEDY, max_prob=0.8)
+    learner = t.learner
+    # Test 1: Metrics
+    histories, _ = learner.learn(coverage=0.5, metrics=True, history=True)
+    assert len(learner.metrics) == len(histories), 'Metrics not per episode.'
+    assert all(m['length'] == len(h) for m, h in zip(learner.metrics, histories)),\
+        'Episode lengths incorrect.'
+    assert all(m['max_delta'] >= m['mean_delta'] >= 0 for m in learner.metrics),\
+        'Update sizes incorrect.'
+    learner.learn(coverage=0.5)
+    assert len(learner.metrics) == 0, 'Metrics recorded when not asked.'
+
+    # Test 2: Stopping criteria
+    for converge, tolerance in (('max', 0.05), ('mean', 0.01), ('policy', 0)):
+        learner.reset()
+        histories, _ = learner.learn(converge=converge, tolerance=tolerance,
+                                     window=5, max_episodes=5000)
+        assert len(histories) < 5000, converge + ' criterion did not stop.'
+        recent = learner.metrics[-5:]
+        assert converge != 'max' or \
+               all(m['max_delta'] <= tolerance for m in recent), \
+            'Stopped before max criterion met.'
+        assert converge != 'policy' or \
+               all(m['policy_changes'] == 0 for m in recent), \
+            'Stopped before policy criterion met.'
+    learner.reset()
+    histories, _ = learner.learn(converge='max', tolerance=0.05, window=5,
+                                 batchsize=4)
+    assert all(m['episodes'] == 4 for m in learner.metrics[:-1]), \
+        'Batch metrics incorrect.'
+
+    # Test 3: Policy of function approximation checked every interval
+    def dfunc(s, a, w):
+        return np.array([s[0]*a[0], s[1]*a[1], 1])
+    t = TestBench(size=5, seed=0, learner=FLearner, func=lambda s, a, w: \
+                  np.dot(w, dfunc(s, a, w)), dfunc=dfunc, funcdim=3, lrate=0.01)
+    histories, _ = t.learner.learn(converge='policy', window=6, interval=3,
+                                   max_episodes=2000)
+    checked = [i for i, m in enumerate(t.learner.metrics) if 'policy_changes' in m]
+    assert checked == list(range(2, len(t.learner.metrics), 3)), \
+        'Policy not checked every interval.'
+    assert len(histories) < 2000 and \
+           all(t.learner.metrics[i]['policy_changes'] == 0 for i in checked[-2:]), \
+        'Policy criterion with interval did not stop.'
+
+
+@test
+def test_checkpoint():
+    """
+    Testing checkpoint/restore of learning state.
+    """
+    # Test 1: Full and incremental checkpoints resume the same learning
+    for sparse in (False, True):
+        t = TestBench(size=6, seed=0, steps=2, policy=QLearner.GREEDY,
+                      max_prob=0.8, sparse=sparse)
+        t.learner.learn(coverage=0.5)
+        t.learner.checkpoint('test_full')
+        t.learner.learn(coverage=0.2)
+        t.learner.checkpoint('test_delta.npz', incremental=True)
+        with np.load('test_delta.npz') as archive:
+            assert len(archive['rows']) < t.num_states, 'Delta not incremental.'
+        h1, _ = t.learner.learn(coverage=0.5, history=True)
+        r = TestBench(size=6, seed=0, policy=QLearner.SOFTMAX, lrate=0.5,
+                      sparse=sparse)
+        r.learner.restore('test_delta.npz')
+        h2, _ = r.learner.learn(coverage=0.5, history=True)
+        assert h1 == h2, 'Restored learning not equal.'
+        assert np.array_equal(np.asarray(t.learner.qmatrix),
+                              np.asarray(r.learner.qmatrix)), \
+            'Restored q-matrix not equal.'
+        assert r.learner.lrate == 0.25 and r.learner.policy == QLearner.GREEDY,\
+            'Learning parameters not restored.'
+    # Test 2: Changing the whole table makes a full checkpoint
+    t.learner.solve()
+    t.learner.checkpoint('test_delta', incremental=True)
+    with np.load('test_delta.npz') as archive:
+        assert len(archive['rows']) == t.num_states, 'Delta after solve().'
+
+    # Test 3: An ONLINE delta only contains the states of episodes since the
+    # last checkpoint
+    t = TestBench(size=10, seed=0, steps=2, policy=QLearner.GREEDY,
+                  max_prob=0.8, mode=QLearner.ONLINE)
+    t.learner.learn(coverage=0.5)
+    t.learner.checkpoint('test_full')
+    states, _ = t.learner.learn(episodes=[0], depth=20, history=True)
+    t.learner.checkpoint('test_delta', incremental=True)
+    with np.load('test_delta.npz') as archive:
+        assert set(archive['rows'].tolist()) <= set(states[0]), \
+            'ONLINE delta contains states of earlier episodes.'
+
+    # Test 4: A restored checkpoint with OFFLINE policy caches is the parent of
+    # the next delta
+    t = TestBench(size=6, seed=0, steps=2, policy=QLearner.SOFTMAX)
+    t.learner.learn(coverage=0.5)
+    t.learner.checkpoint('test_full')
+    r = TestBench(size=6, seed=0, steps=2)
+    r.learner.restore('test_full.npz')
+    r.learner.learn(episodes=[0, 1])
+    r.learner.checkpoint('test_delta', incremental=True)
+    with np.load('test_delta.npz') as archive:
+        assert json.loads(str(archive['params']))['kind'] == 'delta', \
+            'Checkpoint after restore not incremental.'
+    d = TestBench(size=6, seed=0, steps=2)
+    d.learner.restore('test_delta.npz')
+    assert np.array_equal(r.learner.qmatrix, d.learner.qmatrix) and \
+           np.array_equal(r.learner._action_param['alias_probs'],
+                          d.learner._action_param['alias_probs']), \
+        'Delta after restore not restored.'
+
+    # Test 5: Weights
+    def dfunc(s, a, w):
+        return np.array([s[0]*a[0], s[1]*a[1], 1])
+    t = TestBench(size=5, seed=0, learner=FLearner, func=lambda s, a, w: \
+                  np.dot(w, dfunc(s, a, w)), dfunc=dfunc, funcdim=3, lrate=0.01)
+    t.learner.learn(coverage=0.5)
+    t.learner.checkpoint('test_full', incremental=True)
+    weights = np.copy(t.learner.weights)
+    t.learner.reset()
+    t.learner.restore('test_full.npz')
+    assert np.array_equal(weights, t.learner.weights), 'Weights not restored.'
+    os.remove('test_full.npz')
+    os.remove('test_delta.npz')
+
+
+@test
+def test_goal_masks():
+    """
+    Testing boolean goal masks and batched goal checks.
+    """
+    # Test 1: Tabular goals as lists, masks, and scalar/vectorized functions
+    rmatrix = np.zeros((10, 10))
+    mask = np.arange(10) % 3 == 0
+    for goal in ([0, 3, 6, 9], mask, lambda x: x % 3 == 0,
+                 lambda x: x in (0, 3, 6, 9)):
+        temp = QLearner(rmatrix, goal)
+        assert np.array_equal(temp.goal_many(np.arange(10)), mask), \
+            'Goal mask incorrect.'
+        assert temp.goal(3) and not temp.goal(4), 'Goal check incorrect.'
+        assert not temp.goal(-1) and not temp.goal(10) and \
+               not np.any(temp.goal_many(np.array([-1, 10]))), \
+            'States out of range are goals.'
+        assert temp._goals == {0, 3, 6, 9}, 'Goal states incorrect.'
+    try:
+        QLearner(rmatrix, mask[:5])
+        assert False, 'Wrong sized goal mask accepted.'
+    except ValueError:
+        pass
+
+    # Test 2: Goal predicates over batches of state vectors
+    t = TestBench(size=5, seed=0, learner=SLearner, func=lambda s, a, w: 0,
+                  dfunc=lambda s, a, w: np.zeros(1), funcdim=1)
+    svecs = t.learner.stateconverter.decode_many(np.arange(t.num_states))
+    goals = t.learner.goal_many(svecs)
+    assert np.array_equal(np.flatnonzero(goals), np.sort(t.goals)), \
+        'Batched goal predicate incorrect.'
+    assert all(t.learner.goal(s) == g for s, g in zip(svecs, goals)), \
+        'Single goal check not equal to batched.'
+    temp = SLearner(None, None, t.learner.stateconverter,
+                    t.learner.actionconverter, [svecs[1], svecs[7]],
+                    func=lambda s, a, w: 0, funcdim=1, dfunc=None)
+    assert np.array_equal(np.flatnonzero(temp.goal_many(svecs)), [1, 7]) and \
+           temp.goal(svecs[7]) and not temp.goal(svecs[0]), \
+        'Goal state vectors incorrect.'
+
+
+@test
+def test_treebackup():
+    """
+    Testing tree backup(lambda) with eligibility traces.
+    """
+    # Test 1: Traces spread each error over previously visited pairs
+    t = TestBench(size=6, seed=0, policy=QLearner.GREEDY, max_prob=0.8)
+    for trace in (0, 0.9):
+        t.learner.reset()
+        histories, _ = t.learner.learn(coverage=0.5, algorithm='treebackup',
+                                       trace=trace, metrics=True, history=True)
+        assert all(t.learner.goal(h[-1]) for h in histories \
+                   if len(h) < t.learner.depth), 'Episode ended before goal.'
+        steps = sum(m['length'] for m in t.learner.metrics)
+        updates = sum(m['updates'] for m in t.learner.metrics)
+        assert (trace == 0) == (updates == steps), 'Traces incorrect.'
+    assert np.any(t.learner.qmatrix != 0), 'Q-matrix not updated.'
+
+    # Test 2: Function approximation and errors
+    def dfunc(s, a, w):
+        return np.array([s[0]*a[0], s[1]*a[1], 1])
+    f = TestBench(size=6, seed=0, learner=FLearner, func=lambda s, a, w: \
+                  np.dot(w, dfunc(s, a, w)), dfunc=dfunc, funcdim=3, lrate=0.01)
+    f.learner.learn(coverage=0.5, algorithm='treebackup')
+    assert np.any(f.learner.weights != 0), 'Weights not updated.'
+    for kwargs in ({'algorithm': 'none'},
+                   {'algorithm': 'treebackup', 'batchsize': 2}):
+        try:
+            t.learner.learn(coverage=0.1, **kwargs)
+            assert False, 'Invalid algorithm arguments accepted.'
+        except ValueError:
+            pass
+
+
+@test
+def test_history():
+    """
+    Testing learning without keeping episode histories.
+    """
+    # Test 1: Same learning with and without histories (the default)
+    for kwargs in ({'steps': 3}, {'steps': 1, 'algorithm': 'treebackup'},
+                   {'steps': 2, 'batchsize': 4}):
+        steps = kwargs.pop('steps')
+        t1 = TestBench(size=6, seed=0, steps=steps)
+        t2 = TestBench(size=6, seed=0, steps=steps)
+        histories, _ = t1.learner.learn(coverage=0.5, history=True, **kwargs)
+        lengths, finals = t2.learner.learn(coverage=0.5, metrics=True, **kwargs)
+        assert lengths == [len(h) for h in histories] and \
+               finals == [h[-1] for h in histories], \
+            'Episode lengths/final states incorrect.'
+        assert np.array_equal(t1.learner.qmatrix, t2.learner.qmatrix), \
+            'Learning without histories not equal.'
+        assert sum(m['length'] for m in t2.learner.metrics) == sum(lengths), \
+            'Metrics without histories incorrect.'
+
+
+@test
+def test_softmax_sampling():
+    """
+    Testing alias table sampling and temperature of SOFTMAX policy.
+    """
+    # Test 1: Alias tables represent the weights exactly
+    weights = np.array([[1., 2., 3., 4.], [0., 0., 0., 0.], [0., 5., 0., 0.]])
+    probs, aliases = utils.alias_tables(weights)
+    exact = np.zeros_like(weights)
+    for row in range(len(weights)):
+        for col in range(weights.shape[1]):
+            exact[row, col] += probs[row, col] / weights.shape[1]
+            exact[row, aliases[row, col]] += (1 - probs[row, col]) / weights.shape[1]
+    assert np.allclose(exact, [[.1, .2, .3, .4], [.25] * 4, [0, 1, 0, 0]]), \
+        'Alias tables incorrect.'
+
+    # Test 2: Sampled actions follow the action weights in all modes
+    t = TestBench(size=6, seed=0, policy=QLearner.SOFTMAX)
+    t.learner.learn(coverage=0.5)
+    state = np.argmax(np.ptp(t.learner.qmatrix, axis=1))
+    expected = t.learner._softmax_weights(t.learner.qvalue(state))
+    expected = expected / np.sum(expected)
+    for mode in (QLearner.OFFLINE, QLearner.ONLINE):
+        t.learner.set_action_selection_policy(QLearner.SOFTMAX, mode)
+        t.learner._update_policy()
+        single = [t.learner.next_action(state) for _ in range(5000)]
+        batch = t.learner._next_actions(np.full(5000, state))
+        for actions in (single, batch):
+            freqs = np.bincount(actions, minlength=t.learner.num_actions) / 5000
+            assert np.allclose(freqs, expected, atol=0.03), \
+                mode + ' softmax sampling incorrect.'
+
+    # Test 3: Temperature
+    t.learner.set_action_selection_policy(QLearner.SOFTMAX, temperature=1e-3)
+    t.learner.qmatrix[state] = [1e4, 2e4, 0, -1e4]
+    assert np.allclose(t.learner.a_probs(state), [0, 1, 0, 0]), \
+        'Softmax temperature not stable.'
+    t.learner.set_action_selection_policy(QLearner.SOFTMAX, temperature=1e6)
+    assert np.allclose(t.learner._a_probs_many([state])[0], 0.25, atol=1e-2), \
+        'Softmax temperature incorrect.'
+
+
+@test
+def test_buffered_random():
+    """
+    Testing random numbers drawn in blocks.
+    """
+    # Test 1: Same numbers for same seed, across blocks
+    r1 = BufferedRandom(np.random.RandomState(0), block=16)
+    r2 = BufferedRandom(np.random.RandomState(0), block=16)
+    draws = [r1.uniform() for _ in range(40)]
+    assert draws == [r2.uniform() for _ in range(40)], \
+        'Buffered numbers not reproducible.'
+    assert all(0 <= x < 1 for x in draws), 'Buffered numbers out of range.'
+    assert all(0 <= r1.randint(3) < 3 for _ in range(40)), \
+        'Buffered integers out of range.'
+
+    # Test 2: State round trip
+    state, rstate = r1.get_state(), r1.random.get_state()
+    expected = [r1.uniform() for _ in range(40)]
+    r3 = BufferedRandom(np.random.RandomState(), block=16)
+    r3.random.set_state(rstate)
+    r3.set_state(state)
+    assert [r3.uniform() for _ in range(40)] == expected, \
+        'Buffered state not restored.'
+
+    # Test 3: Learning reproducible for a seed
+    t1 = TestBench(size=5, seed=0, policy=QLearner.GREEDY, max_prob=0.5)
+    t2 = TestBench(size=5, seed=0, policy=QLearner.GREEDY, max_prob=0.5)
+    t1.learner.learn(coverage=0.5)
+    t2.learner.learn(coverage=0.5)
+    assert np.array_equal(t1.learner.qmatrix, t2.learner.qmatrix), \
+        'Learning not reproducible.'
+
+
+@test
+def test_profiling():
+    """
+    Testing per-phase profiling of learning.
+    """
+    # Test 1: Phases recorded per episode
+    t = TestBench(size=5, seed=0)
+    profiler = t.learner.set_profiling()
+    starts = [3, 7, 20]
+    histories, _ = t.learner.learn(episodes=starts, history=True)
+    records = profiler.as_dict()
+    assert len(records['episodes']) == len(starts), 'Episodes not recorded.'
+    steps = sum(len(h) for h in histories)
+    assert records['phases']['reward']['calls'] == steps, \
+        'Phase calls incorrect.'
+    assert sum(e['phases']['reward']['calls'] for e in records['episodes']) \
+           == steps, 'Episode phase calls incorrect.'
+    for stats in records['phases'].values():
+        assert 0 <= stats['self_time'] <= stats['time'] + 1e-9, \
+            'Phase times incorrect.'
+    assert json.loads(profiler.to_json()) == records, 'JSON export incorrect.'
+
+    # Test 2: Vectorized phases of batched learning
+    profiler.clear()
+    t.learner.learn(episodes=starts, batchsize=3)
+    records = profiler.as_dict()
+    assert len(records['episodes']) == 1 and \
+           all(records['episodes'][0]['phases'][phase]['calls'] > 0 \
+               for phase in ('next_state', 'reward', 'update', 'next_action')),\
+        'Batched phases not recorded.'
+
+    # Test 3: Disabling restores methods and stops recording
+    assert t.learner.set_profiling(False) is profiler, 'Profiler not returned.'
+    assert 'next_state' not in t.learner.__dict__ and \
+           'update_many' not in t.learner.__dict__, 'Methods not restored.'
+    t.learner.learn(episodes=starts)
+    assert len(profiler.episodes) == 1, 'Recorded when disabled.'
+
+
+@test
+def test_feature_matrix():
+    """
+    Testing vectorized feature matrices of function approximation.
+    """
+    avecs = np.array(list(FlagGenerator(2, 2)), dtype=float)
+    def dfunc(s, a, w):
+        return np.array([s[0]*a[0]/20, s[1]*a[1]/20, s[0]**2/100, s[1]**2/100,
+                         a[0]**2/4, a[1]**2/4, 1])
+    def func(s, a, w):
+        return np.dot(w, dfunc(s, a, w))
+    def features(svecs):
+        s, a = np.broadcast_arrays(np.asarray(svecs)[..., None, :], avecs)
+        return np.stack([s[..., 0]*a[..., 0]/20, s[..., 1]*a[..., 1]/20,
+                         s[..., 0]**2/100, s[..., 1]**2/100, a[..., 0]**2/4,
+                         a[..., 1]**2/4, np.ones(s.shape[:-1])], axis=-1)
+    t1 = TestBench(size=6, seed=0, learner=FLearner, funcdim=7, func=func,
+                   dfunc=dfunc, lrate=0.1)
+    t2 = TestBench(size=6, seed=0, learner=FLearner, funcdim=7, func=None,
+                   dfunc=None, features=features, lrate=0.1)
+    l1, l2 = t1.learner, t2.learner
+    states = np.arange(l1.num_states)
+    actions = states % l1.num_actions
+
+    # Test 1: Values same as per-action function
+    l1.weights = l2.weights = np.linspace(-1, 1, 7)
+    assert np.allclose(l1.qvalue(7), l2.qvalue(7)), 'qvalue() incorrect.'
+    assert np.isclose(l1.qvalue(7, 2), l2.qvalue(7, 2)), 'qvalue(action) incorrect.'
+    assert np.allclose(l1.qvalue_many(states), l2.qvalue_many(states)), \
+        'qvalue_many() incorrect.'
+    assert np.allclose(l1.qvalue_many(states, actions),
+                       l2.qvalue_many(states, actions)), \
+        'qvalue_many(actions) incorrect.'
+    assert l1.value(7)[1] == l2.value(7)[1], 'value() incorrect.'
+    assert np.isclose(l2.func(l2.stateconverter.decode(7), avecs[2], l2.weights),
+                      l1.qvalue(7, 2)), 'Derived func incorrect.'
+
+    # Test 2: Updates same as per-action gradient
+    l1.update(7, 2, 0.5)
+    l2.update(7, 2, 0.5)
+    l1.update_many(states, actions, np.linspace(-1, 1, len(states)))
+    l2.update_many(states, actions, np.linspace(-1, 1, len(states)))
+    assert np.allclose(l1.weights, l2.weights), 'Updates incorrect.'
+
+    # Test 3: Learning same as per-action function
+    l1.reset()
+    l2.reset()
+    l1.learn(coverage=0.5)
+    l2.learn(coverage=0.5)
+    assert np.allclose(l1.weights, l2.weights), 'Learning incorrect.'
+
+
+@test
+def test_feature_cache():
+    """
+    Testing decoded state table and cached features of FLearner.
+    """
+    def dfunc(s, a, w):
+        return np.array([s[0]*a[0]/20, s[1]*a[1]/20, s[0]**2/100, s[1]**2/100,
+                         a[0]**2/4, a[1]**2/4, 1])
+    def func(s, a, w):
+        return np.dot(w, dfunc(s, a, w))
+    module = sys.modules[FLearner.__module__]
+    table_size = module.TABLE_SIZE
+    weights = []
+    try:
+        # Test 1: Same learning with tables, memoization and no cache
+        for size, cache in ((table_size, False), (table_size, True), (0, True)):
+            module.TABLE_SIZE = size
+            t = TestBench(size=6, seed=0, learner=FLearner, funcdim=7, func=func,
+                          dfunc=dfunc, lrate=0.1, cache=cache)
+            assert (t.learner._svecs is None) == (size == 0), 'State table incorrect.'
+            assert np.array_equal(t.learner._decode(7),
+                                  t.learner.stateconverter.decode(7)), \
+                'Decoded state incorrect.'
+            t.learner.learn(coverage=0.5)
+            states = np.arange(t.learner.num_states)
+            assert np.allclose(t.learner.qvalue_many(states),
+                               [t.learner.qvalue(s) for s in states]), \
+                'Cached values incorrect.'
+            weights.append(t.learner.weights)
+    finally:
+        module.TABLE_SIZE = table_size
+    assert np.allclose(weights[0], weights[1]) and \
+           np.allclose(weights[0], weights[2]), 'Learning with cache incorrect.'
+
+
+@test
+def test_feature_maps():
+    """
+    Testing polynomial, RBF and tile coding feature maps.
+    """
+    sconv, aconv = FlagGenerator(6, 6), FlagGenerator(2, 2)
+    num_states, num_actions = 36, 4
+    svecs = sconv.decode_many(np.arange(num_states))
+
+    # Test 1: Polynomial terms over scaled state and action variables
+    poly = Polynomial(sconv, aconv, degree=2)
+    phi = poly(svecs)
+    assert poly.dim == 15, 'Number of polynomial terms incorrect.'
+    s, a = svecs[7] / 5, np.array(aconv.decode(3), dtype=float)
+    x = np.concatenate((s, a))
+    assert np.allclose(sorted(phi[7, 3]),
+                       sorted([1, *x] + [x[i]*x[j] for i in range(4) \
+                                         for j in range(i, 4)])), \
+        'Polynomial features incorrect.'
+
+    # Test 2: Sparse maps' dense features are their scattered active features
+    for fmap in (RBF(sconv, aconv, centers=3), TileCoding(sconv, aconv, tilings=4)):
+        indices, values = fmap.active(svecs)
+        dense = fmap(svecs)
+        assert dense.shape == (num_states, num_actions, fmap.dim), \
+            'Dense shape incorrect.'
+        assert np.allclose(np.take_along_axis(dense, indices, -1), values) and \
+               np.allclose(dense.sum(axis=-1), values.sum(axis=-1)), \
+            'Active features incorrect.'
+    tiles = TileCoding(sconv, aconv, tilings=4)
+    assert np.all(tiles.active(svecs)[0][..., 0] != tiles.active(svecs)[0][..., 1]) \
+        and np.all(np.count_nonzero(tiles(svecs), axis=-1) == 4), \
+        'Tiles not active once per tiling.'
+
+    # Test 3: Sparse values and updates equal dense ones, touching active weights
+    def dense(svecs):
+        return tiles(svecs)
+    learners = [TestBench(size=6, seed=0, learner=FLearner, funcdim=tiles.dim,
+                          func=None, dfunc=None, features=f, lrate=0.1/4,
+                          cache=c).learner \
+                for f, c in ((dense, False), (tiles, False), (tiles, True))]
+    for learner in learners:
+        learner.weights = np.random.RandomState(0).rand(tiles.dim)
+    states = np.arange(num_states)
+    for learner in learners[1:]:
+        assert np.allclose(learner.qvalue_many(states),
+                           learners[0].qvalue_many(states)) and \
+               np.allclose(learner.qvalue(7, 2), learners[0].qvalue(7, 2)), \
+            'Sparse values incorrect.'
+    before = learners[1].weights.copy()
+    for learner in learners:
+        learner.update(7, 2, 1.)
+    changed = np.flatnonzero(learners[1].weights != before)
+    assert np.array_equal(changed, np.sort(tiles.active(svecs[7])[0][2])), \
+        'Update changed inactive weights.'
+    for learner in learners:
+        learner.update_many(states[:10], np.arange(10) % num_actions, np.ones(10))
+        learner.update(3, 1, -0.5)
+    assert np.allclose(learners[1].weights, learners[0].weights) and \
+           np.allclose(learners[2].weights, learners[0].weights), \
+        'Sparse updates incorrect.'
+
+    # Test 4: Learning with tile coding
+    for learner in learners[1:]:
+        learner.weights = np.zeros(tiles.dim)
+        learner.learn(episodes=[s for s in range(num_states) if s % 5 == 1])
+    assert np.any(learners[1].weights != 0) and \
+           np.allclose(learners[1].weights, learners[2].weights), \
+        'Learning with cached sparse features incorrect.'
+
+
+@test
+def test_linear():
+    """
+    Testing linear approximations declared by func=None.
+    """
+    calls = [0]
+    def dfunc(s, a, w):
+        calls[0] += 1
+        return np.array([s[0]*a[0]/6, s[1]*a[1]/6, s[0]**2/36, s[1]**2/36,
+                         a[0]**2/4, a[1]**2/4, 1])
+    def func(s, a, w):
+        return np.dot(w, dfunc(s, a, w))
+
+    # Test 1: Same learning as func = dfunc . weights with fewer features
+    counts, weights = [], []
+    for f in (func, None):
+        t = TestBench(size=6, seed=0, learner=FLearner, funcdim=7, func=f,
+                      dfunc=dfunc, lrate=0.1)
+        calls[0] = 0
+        t.learner.learn(episodes=[s for s in range(t.num_states) if s % 5 == 1])
+        counts.append(calls[0])
+        weights.append(t.learner.weights)
+    assert t.learner.features is not None, 'Linear approximation not declared.'
+    assert np.allclose(weights[0], weights[1]), 'Linear learning incorrect.'
+    assert counts[1] < counts[0] / 2, 'Features not reused.'
+
+    # Test 2: Same for SLearner over state vectors
+    weights = []
+    for f in (func, None):
+        t = TestBench(size=5, seed=0, learner=SLearner, funcdim=7, func=f,
+                      dfunc=dfunc, lrate=0.1, stepsize=lambda x: 1e-2)
+        t.learner.learn(episodes=[[1., 1.], [3., 2.]])
+        assert np.allclose(t.learner.qvalue([2., 1.]),
+                           [func([2., 1.], a, t.learner.weights) \
+                            for a in t.learner.actionconverter]), \
+            'Linear values incorrect.'
+        weights.append(t.learner.weights)
+    assert np.allclose(weights[0], weights[1]), 'Linear SLearner learning incorrect.'
+
+
+@test
+def test_lstdq():
+    """
+    Testing least-squares solving of weights (LSTD-Q/LSPI).
+    """
+    tiles = TileCoding(FlagGenerator(6, 6), FlagGenerator(2, 2), tilings=4, tiles=3)
+    def dense(svecs):
+        return tiles(svecs)
+    t = TestBench(size=6, seed=0, discount=0.9)
+    t.learner.solve()
+    states = np.arange(t.num_states)
+    optimal = t.learner.qvalue_many(states)
+    learners = [TestBench(size=6, seed=0, learner=FLearner, funcdim=tiles.dim,
+                          func=None, dfunc=None, features=f, lrate=0.1/4,
+                          discount=0.9, memory=ReplayBuffer(10000)).learner \
+                for f in (tiles, dense)]
+
+    # Test 1: LSTD-Q weights are the fixed point of the greedy policy
+    learner = learners[0]
+    learner.learn(coverage=1.)
+    sgd = np.mean(np.abs(learner.qvalue_many(states) - optimal))
+    size = len(learner.memory)
+    S, A, R, N, T = learner.memory.states[:size], learner.memory.actions[:size], \
+                    learner.memory.rewards[:size], learner.memory.nstates[:size], \
+                    learner.memory.terminals[:size]
+    policy = np.argmax(learner.qvalue_many(N), axis=1)
+    assert learner.solve(method='lstdq') == 1, \
+        'LSTD-Q iterations incorrect.'
+    phi = tiles(learner.stateconverter.decode_many(S))[np.arange(size), A]
+    targets = R + np.where(T, 0, 0.9 * learner.qvalue_many(N, policy))
+    assert np.allclose(np.dot(phi.T, learner.qvalue_many(S, A) - targets), 0,
+                       atol=1e-4), \
+        'LSTD-Q fixed point incorrect.'
+
+    # Test 2: LSPI from stored transitions improves on gradient descent
+    iterations = learner.solve(iterations=30)
+    assert 1 <= iterations <= 30, 'LSPI iterations incorrect.'
+    assert np.mean(np.abs(learner.qvalue_many(states) - optimal)) < sgd / 2, \
+        'LSPI values incorrect.'
+
+    # Test 3: Same weights from explicit transitions and dense features
+    learners[1].solve(transitions=(S, A, R, N, T), iterations=30)
+    assert np.allclose(learners[0].weights, learners[1].weights), \
+        'Dense and sparse solutions differ.'
+
+    # Test 4: Only for linear approximations with transitions
+    try:
+        TestBench(size=6, seed=0, learner=FLearner, funcdim=1, func=lambda s, a, w: w[0],
+                  dfunc=lambda s, a, w: np.ones(1)).learner.solve()
+        assert False, 'Non-linear approximation solved.'
+    except TypeError:
+        pass
+    try:
+        TestBench(size=6, seed=0, learner=FLearner, funcdim=tiles.dim, func=None,
+                  dfunc=None, features=tiles).learner.solve()
+        assert False, 'Solved without transitions.'
+    except ValueError:
+        pass
+
+
+@test
+def test_replay():
+    """
+    Testing experience replay.
+    """
+    # Test 1: Ring buffer
+    memory = ReplayBuffer(5)
+    memory.add_many(np.arange(4), np.zeros(4, dtype=int), np.ones(4),
+                    np.arange(1, 5), np.zeros(4, dtype=bool))
+    memory.add(4, 1, 0., 5, True)
+    memory.add_many(np.arange(5, 8), np.ones(3, dtype=int), np.ones(3),
+                    np.arange(6, 9), np.zeros(3, dtype=bool))
+    assert len(memory) == 5, 'Buffer size incorrect.'
+    assert sorted(memory.states) == [3, 4, 5, 6, 7], 'Oldest not overwritten.'
+    memory.add_many(np.arange(12), np.zeros(12, dtype=int), np.ones(12),
+                    np.arange(12), np.zeros(12, dtype=bool))
+    assert sorted(memory.states) == [7, 8, 9, 10, 11], 'Overflow not handled.'
+
+    # Test 2: Prioritized sampling
+    memory = ReplayBuffer(10, prioritized=True, alpha=1)
+    memory.add_many(np.arange(10), np.zeros(10, dtype=int), np.ones(10),
+                    np.arange(10), np.zeros(10, dtype=bool))
+    memory.update_priorities(np.arange(10), [0] * 9 + [1])
+    indices, states, *_, weights = memory.sample(100, np.random.RandomState(0))
+    assert np.all(states == 9) and np.allclose(weights, 1), \
+        'Prioritized sampling incorrect.'
+
+    # Test 3: Sampling frequencies follow priorities after wrapping, updates
+    # and a change of alpha
+    memory = ReplayBuffer(7, prioritized=True, alpha=0.5)
+    memory.add_many(np.arange(12), np.zeros(12, dtype=int), np.ones(12),
+                    np.arange(12), np.zeros(12, dtype=bool))
+    memory.update_priorities([1, 3, 3, 6], [2., 0.5, 5., 1.])
+    for alpha in (0.5, 1):
+        memory.alpha = alpha
+        indices, *_ = memory.sample(20000, np.random.RandomState(0))
+        probs = memory.priorities ** alpha / np.sum(memory.priorities ** alpha)
+        assert np.allclose(np.bincount(indices, minlength=7) / 20000, probs,
+                           atol=0.02), 'Sum-tree sampling incorrect.'
+
+    # Test 4: Learning from tabular and function learners sharing a buffer
+    memory = ReplayBuffer(1000)
+    t = TestBench(size=6, seed=0, memory=memory)
+    histories, _ = t.learner.learn(coverage=0.5, history=True)
+    assert len(memory) == sum(len(h) for h in histories), \
+        'Transitions not stored.'
+    t.learner.learn(coverage=0.5, batchsize=4)
+    assert len(memory) > sum(len(h) for h in histories), \
+        'Batch transitions not stored.'
+    qmatrix = np.copy(t.learner.qmatrix)
+    errors = t.learner.replay(64)
+    assert len(errors) == 64 and not np.array_equal(qmatrix, t.learner.qmatrix),\
+        'Q-matrix not updated from replay.'
+    def dfunc(s, a, w):
+        return np.array([s[0]*a[0], s[1]*a[1], 1])
+    f = TestBench(size=6, seed=0, learner=FLearner, func=lambda s, a, w: \
+                  np.dot(w, dfunc(s, a, w)), dfunc=dfunc, funcdim=3,
+                  lrate=0.01, memory=memory)
+    weights = np.copy(f.learner.weights)
+    f.learner.replay(64)
+    assert not np.array_equal(weights, f.learner.weights), \
+        'Weights not updated from replay.'
+
+
 # @test
 def qlearner_testbench():
     """
@@ -290,6 +1337,29 @@ if __name__ == '__main__':
     test_instantiation()
     test_offline_learning()
     test_online_learning()
+    test_batch_learning()
+    test_sparse_matrix()
+    test_policy_cache()
+    test_parallel_learning()
+    test_dtype()
+    test_sweep()
+    test_solve()
+    test_batched_queries()
+    test_episode_schedulers()
+    test_convergence()
+    test_checkpoint()
+    test_replay()
+    test_goal_masks()
+    test_treebackup()
+    test_history()
+    test_softmax_sampling()
+    test_buffered_random()
+    test_profiling()
+    test_feature_matrix()
+    test_feature_cache()
+    test_feature_maps()
+    test_linear()
+    test_lstdq()
     qlearner_testbench()
     flearner_testbench()
     slearner_testbench()
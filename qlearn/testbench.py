@@ -143,11 +143,16 @@ class TestBench:
                 action = aflags.encode(avec)
                 state = sflags.encode((round(svec[0]), round(svec[1])))
                 return self.rmatrix[state, action]
-            def goal(svec):
-                return self.coord2state((round(svec[0]), round(svec[1]))) in self.goals
+            mask = np.zeros(self.num_states, dtype=bool)
+            mask[self.goals] = True
+            def goal(svecs):
+                coords = np.round(svecs).astype(int)
+                inside = np.all((coords >= 0) & (coords < self.size), axis=1)
+                states = self.size * coords[:, 0] + coords[:, 1]
+                return inside & mask[np.where(inside, states, 0)]
             self.learner = SLearner(reward=reward, simulator=sim, goal=goal,
                                     stateconverter=sflags, actionconverter=aflags,
-                                    seed=self.seed, **kwargs)
+                                    seed=self.seed, batchgoal=True, **kwargs)
         elif learner is None:
             self.learner = None
         else:
@@ -180,14 +185,14 @@ class TestBench:
         self.path = [tuple(start)]
         limit = self.size**2 if limit <= 0 else limit
         iteration = 0
-        try:                # for integer state representation
+        if not isinstance(self.learner, SLearner):   # integer state representation
             current = self.coord2state(start)
             while not self.learner.goal(current) and iteration < limit:
                 iteration += 1
                 action = self.learner.recommend(current)
                 current = self.learner.next_state(current, action)
                 self.path.append(self.state2coord(current))
-        except TypeError:   # for vector state representation
+        else:               # for vector state representation
             current = start
             while not self.learner.goal(current) and iteration < limit:
                 iteration += 1
@@ -290,16 +295,14 @@ class TestBench:
         topo_ax.plot_surface(x, y, z, cmap='gist_earth')
         # Plot optimal action field
         if showfield:
-            vals, inds = list(zip(*[self.learner.value(s) for s in range(self.num_states)]))
-            inds = np.array(inds, dtype=int)
+            vals, inds = self.learner.value_many(np.arange(self.num_states))
             vals = np.array(vals, dtype=float)
             vals = vals - min(vals) + 0.1       # adding small value in case all vals are same and reduce to 0
             vals = vals / max(vals)
+            # action vectors (SLearner) are encoded into action indices
+            if np.ndim(inds) > 1:
+                inds = self.learner.actionconverter.encode_many(inds)
             # action_y multiplied by negative val since y-axes are inverted (bug)
-            try:
-                inds = [self.learner.actionconverter.encode(i) for i in inds]
-            except (TypeError, AttributeError):
-                pass
             action_y = self.actions[inds][:, 0] * -vals
             action_x = self.actions[inds][:, 1] * vals
             field_ax.quiver(np.ravel(x), np.ravel(y),
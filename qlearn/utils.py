@@ -4,25 +4,112 @@ Contains common utility functions.
 
 import numpy as np
 
-def read_matrix(fname):
+NPY_MAGIC = b'\x93NUMPY'    # first bytes of a .npy file
+NPZ_MAGIC = b'PK\x03\x04'   # first bytes of a .npz (zip) file
+
+
+def read_matrix(fname, mmap_mode=None, dtype=float):
     """
-    Reads a file of whitespace separated floats into an array.
+    Reads a matrix from a file. The format is detected from the file contents:
+    * Binary numpy .npy files are loaded (memory-mapped if mmap_mode is given),
+    * Binary numpy .npz archives are loaded. The first array in the archive is
+        returned. Archives cannot be memory-mapped.
+    * Otherwise the file is read as whitespace separated numbers.
 
     Args:
         fname (str): Filepath of matrix.
+        mmap_mode (str): One of None, 'r', 'r+', 'c'. See numpy.load. A memory-
+            mapped matrix is read from disk as needed and is shared with other
+            processes through the page cache. Default None (read into memory).
+        dtype (type): Data type of elements for text files. Default float.
+            Values that are not whole numbers are kept as floats if dtype is
+            an integer type.
 
     Returns:
-        A np.ndarray containing a matrix.
+        A np.ndarray (or np.memmap) containing a matrix.
     """
-    return np.loadtxt(fname)
+    with open(fname, 'rb') as f:
+        magic = f.read(len(NPY_MAGIC))
+    if magic.startswith(NPY_MAGIC):
+        return np.load(fname, mmap_mode=mmap_mode)
+    elif magic.startswith(NPZ_MAGIC):
+        with np.load(fname) as archive:
+            return archive[archive.files[0]]
+    # Text files written by save_matrix are float-formatted. They are cast to
+    # an integer dtype only if all values are whole numbers.
+    mat = np.loadtxt(fname)
+    if np.issubdtype(dtype, np.integer) and not np.array_equal(mat, np.round(mat)):
+        return mat
+    return mat.astype(dtype)
 
 
 def save_matrix(mat, fname):
     """
-    Saves a ndarray into a text file of whitespace separated numbers.
+    Saves a ndarray into a file. The format depends on the file extension:
+    * .npy: Binary numpy file which can be memory-mapped by read_matrix,
+    * .npz: Binary numpy archive,
+    * Otherwise a text file of whitespace separated numbers.
 
     Args:
         mat (ndarray): Array to save to file.
         fname (str): Filepath where to save.
     """
-    np.savetxt(fname, mat)
+    if fname.endswith('.npy'):
+        np.save(fname, np.asarray(mat))
+    elif fname.endswith('.npz'):
+        np.savez(fname, matrix=np.asarray(mat))
+    else:
+        np.savetxt(fname, mat)
+
+
+def alias_tables(weights):
+    """
+    Builds alias tables (Walker's alias method) for sampling from discrete
+    distributions in constant time. Each row of weights is split into as many
+    equal-probability columns as there are elements. Column i is element i
+    with probability probs[i], else element aliases[i]. To sample, pick a
+    column uniformly and then choose between it and its alias.
+
+    Elements of each row are sorted once. The smallest remaining element is
+    then topped up from the largest, until the largest falls below its share
+    and is topped up from the next largest. All rows are built together, one
+    element of each row at a time.
+
+    Args:
+        weights (ndarray): A [rows x elements] array of non-negative weights
+            (or a 1D array). Rows summing to zero are sampled uniformly.
+
+    Returns:
+        A tuple of [rows x elements] arrays of probabilities (float) and alias
+        element indices (smallest unsigned integer type).
+    """
+    weights = np.array(weights, dtype=float, ndmin=2)
+    rows, num = weights.shape
+    totals = np.sum(weights, axis=1, keepdims=True)
+    valid = totals > 0
+    scaled = np.where(valid, weights * num / np.where(valid, totals, 1), 1.)
+    order = np.argsort(scaled, axis=1)
+    # Tables are built over the sorted positions of elements, flattened.
+    values = np.take_along_axis(scaled, order, axis=1).ravel()
+    probs = np.ones(rows * num)
+    aliases = np.tile(np.arange(num), rows)
+    base = np.arange(rows) * num
+    low = np.zeros(rows, dtype=int)         # smallest remaining position
+    high = np.full(rows, num - 1)           # largest remaining position
+    for _ in range(num - 1):
+        donor = base + high
+        spent = values[donor] < 1
+        taker = np.where(spent, donor, base + low)
+        donor = np.where(spent, donor - 1, donor)
+        probs[taker] = values[taker]
+        aliases[taker] = donor - base
+        values[donor] -= 1 - values[taker]
+        low += ~spent
+        high -= spent
+    probs = probs.reshape(rows, num)
+    aliases = np.take_along_axis(order, aliases.reshape(rows, num), axis=1)
+    table_probs = np.empty((rows, num))
+    table_aliases = np.empty((rows, num), dtype=np.min_scalar_type(num))
+    np.put_along_axis(table_probs, order, np.minimum(probs, 1.), axis=1)
+    np.put_along_axis(table_aliases, order, aliases, axis=1)
+    return table_probs, table_aliases
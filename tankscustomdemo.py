@@ -324,10 +324,6 @@ def dfunc(state, action, weights):
 
 
 
-def func(state, action, weights):
-    return np.dot(dfunc(state, action, weights), weights)
-
-
 # The sampling grid over the state space. A total of 1,000,000 states.
 STATES = FlagGenerator((20, 5, 100), (20, 5, 100), (20, 5, 100), (20, 5, 100),
                        (20, 5, 100), (20, 5, 100), 2, 2, 2, 2, 2, 2)
@@ -341,7 +337,7 @@ SIM = SixTankModel(fault=ARGS.fault[0])
 if not ARGS.usempc:
 # Create the SLearner instance
     LEARNER = SLearner(reward=reward, simulator=SIM, stateconverter=STATES,
-                    actionconverter=ACTIONS, goal=goal, func=func, funcdim=FUNCDIM,
+                    actionconverter=ACTIONS, goal=goal, func=None, funcdim=FUNCDIM,
                     dfunc=dfunc, lrate=ARGS.rate, discount=ARGS.discount,
                     policy=ARGS.policy, depth=ARGS.maxdepth,
                     steps=ARGS.steps, seed=ARGS.seed,
@@ -174,12 +174,6 @@ def dfunc(svec, avec, weights):
     return np.concatenate((svec[:-1] / ARGS.num_levels, valves, [1]))
 
 
-# Returns the value of a state/action given weights. The policy function.
-# Used to compute the optimal action from each state when exploiting a policy.
-def func(svec, avec, weights):
-    return np.dot(dfunc(svec, avec, weights), weights)
-
-
 # Number of weights to learn in functional approximation, in this case:
 # 1 weight for each tank, 1 weight for each valve, and a bias term
 FUNCDIM = NUM_TANKS + NUM_VALVES + 1
@@ -210,7 +204,7 @@ SIM = Simulator(env=NET, timestep=MAX_SIM_TSTEP, state_mux=state_mux,
 
 # Create the SLearner instance
 LEARNER = SLearner(reward=reward, simulator=SIM, stateconverter=STATES,
-                   actionconverter=ACTIONS, goal=goal, func=func, funcdim=FUNCDIM,
+                   actionconverter=ACTIONS, goal=goal, func=None, funcdim=FUNCDIM,
                    dfunc=dfunc, lrate=ARGS.rate, discount=ARGS.discount,
                    policy=ARGS.policy, depth=ARGS.maxdepth,
                    steps=ARGS.steps, seed=ARGS.seed, stepsize=DELTA_T)
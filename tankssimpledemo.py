@@ -170,9 +170,6 @@ def create_system(num_tanks=4, tank_levels=5, lrate=1e-2, discount=0.75, explora
                                pumpvec,
                                [1]))
 
-    def func(svec, avec, weights):
-        return np.dot(weights, dfunc(svec, avec, weights))
-
     funcdim = 2*num_tanks + num_pumps + 1
 
     def goal(svec):
@@ -180,7 +177,7 @@ def create_system(num_tanks=4, tank_levels=5, lrate=1e-2, discount=0.75, explora
 
     # Creating the SLearner instance
     learner = SLearner(reward=reward, simulator=sim, stateconverter=fstate,
-                       actionconverter=faction, func=func, funcdim=funcdim,
+                       actionconverter=faction, func=None, funcdim=funcdim,
                        dfunc=dfunc, goal=goal, steps=steps, lrate=lrate,
                        discount=discount, exploration=exploration, stepsize=deltat)
     return learner